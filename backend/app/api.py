@@ -1,97 +1,43 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from fastapi.responses import FileResponse
-from typing import Optional
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 import os
-import time
-import random
-import pandas as pd
+import json
+import zipfile
 from app.models.schemas import ProcessResponse
-from app.core.gatekeeper import gatekeeper
+from app.core.document import ParsedDocument
+from app.core.executors import executors
+from app.clients.llm_cache import llm_cache, llm_cache_bypass
+from app.clients.azure_client import azure_client
 from app.streams.stream_a import stream_a
 from app.streams.stream_b import stream_b
 from app.streams.stream_c import stream_c
 from app.streams.stream_d import stream_d
+from app.streams.retrievers import RETRIEVAL_MODES
+from app.services.transaction_log import transaction_logger
+from app.services.orchestrator import orchestrate_document
+from app.services.batch import expand_uploads, run_batch
+from app.services.result_store import DOWNLOAD_FORMATS, MEDIA_TYPES, result_store
 
 router = APIRouter()
 
-def log_transaction(filename: str, stream_type: str, elapsed_time: float, cost: float):
-    """
-    Appends the orchestrator transaction to the results CSV.
-    Maintains a rolling limit of exactly 10,000 records to prevent infinite scaling.
-    """
-    results_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "datasources", "Test", "Results", "rq1_data.csv")
-    
-    # Map the letter to the actual logic group for the dashboard
-    group_map = {
-        "A": "Baseline A (LLM)", 
-        "B": "Hybrid", 
-        "C": "Hybrid", 
-        "D": "Hybrid"
-    }
-    group = group_map.get(stream_type, "Hybrid")
-    
-    # Generate generic mock accuracy based on stream for logging purposes
-    accuracy = random.randint(90, 100)
-    
-    new_row = {
-        "document_id": filename,
-        "group": group,
-        "accuracy": accuracy,
-        "cost": cost,
-        "time": elapsed_time
-    }
-    
-    try:
-        if os.path.exists(results_path):
-            df = pd.read_csv(results_path)
-        else:
-            df = pd.DataFrame(columns=["document_id", "group", "accuracy", "cost", "time"])
-            
-        df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-        
-        # Enforce 10,000 record cap rule
-        if len(df) > 10000:
-            df = df.tail(10000)
-            
-        df.to_csv(results_path, index=False)
-    except Exception as e:
-        print(f"Non-fatal error logging transaction: {e}")
-
 @router.post("/process/orchestrate", response_model=ProcessResponse)
 async def orchestrate(
     file: UploadFile = File(...),
     instruction: Optional[str] = Form(None),
     query: Optional[str] = Form(None),
-    extraction_schema: Optional[str] = Form(None)
+    extraction_schema: Optional[str] = Form(None),
+    no_cache: bool = Form(False)
 ):
     """
     Intelligent Orchestrator: Autonomous routing via Cascade Classification.
+    Set `no_cache` to force fresh LLM responses for this request.
     """
     try:
-        start_time = time.time()
         content = await file.read()
-        stream_type = await gatekeeper.route(content, file.filename)
-        
-        # In a real system, we'd calculate real token costs. For this simulation log, we assign standard hybrid vs baseline costs.
-        mock_cost = 0.25 if stream_type == "A" else 0.005 
-
-        if stream_type == "A":
-            # Pass schema as instruction if present
-            payload = extraction_schema or instruction or "Summarize data"
-            result = await stream_a.process(content, file.filename, payload)
-        elif stream_type == "B":
-            result = await stream_b.process(content, file.filename)
-        elif stream_type == "C":
-            payload = extraction_schema or query
-            result = await stream_c.process(content, file.filename, payload)
-        else:
-            payload = extraction_schema or query or "What is this document?"
-            result = await stream_d.process(content, file.filename, payload)
-            
-        elapsed_time = time.time() - start_time
-        
-        # Log to the 10,000 cap CSV
-        log_transaction(file.filename, stream_type, elapsed_time, mock_cost)
+        # Parse once; the Gatekeeper and the selected stream share the same document
+        with ParsedDocument(content, file.filename) as document, llm_cache_bypass(no_cache):
+            stream_type, result = await orchestrate_document(document, instruction, query, extraction_schema)
             
         return ProcessResponse(
             status="success",
@@ -102,14 +48,41 @@ async def orchestrate(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/process/batch")
+async def orchestrate_batch(
+    files: List[UploadFile] = File(...),
+    instruction: Optional[str] = Form(None),
+    query: Optional[str] = Form(None),
+    extraction_schema: Optional[str] = Form(None),
+    concurrency: int = Form(8),
+    no_cache: bool = Form(False)
+):
+    """
+    Batch Orchestrator: accepts many files and/or zip archives, routes each through the
+    Gatekeeper and streams one NDJSON line per document as it finishes, then a summary line.
+    """
+    try:
+        uploads = await executors.run_io(expand_uploads, [(file.filename, await file.read()) for file in files])
+    except (ValueError, OSError, zipfile.BadZipFile) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def ndjson():
+        with llm_cache_bypass(no_cache):
+            async for record in run_batch(uploads, instruction, query, extraction_schema, concurrency):
+                yield json.dumps(record, default=str) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
 @router.post("/process/stream-a", response_model=ProcessResponse)
 async def process_stream_a(
     instruction: str = Form(...),
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    no_cache: bool = Form(False)
 ):
     try:
         content = await file.read()
-        result = await stream_a.process(content, file.filename, instruction)
+        with ParsedDocument(content, file.filename) as document, llm_cache_bypass(no_cache):
+            result = await stream_a.process(document, instruction)
         return ProcessResponse(status="success", message="Stream A processing complete", data=result, stream_used="A")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -118,11 +91,13 @@ async def process_stream_a(
 
 @router.post("/process/stream-b", response_model=ProcessResponse)
 async def process_stream_b(
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    no_cache: bool = Form(False)
 ):
     try:
         content = await file.read()
-        result = await stream_b.process(content, file.filename)
+        with ParsedDocument(content, file.filename) as document, llm_cache_bypass(no_cache):
+            result = await stream_b.process(document)
         return ProcessResponse(status="success", message="Stream B processing complete", data=result, stream_used="B")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -130,11 +105,13 @@ async def process_stream_b(
 @router.post("/process/stream-c", response_model=ProcessResponse)
 async def process_stream_c(
     file: UploadFile = File(...),
-    query: Optional[str] = Form(None)
+    query: Optional[str] = Form(None),
+    no_cache: bool = Form(False)
 ):
     try:
         content = await file.read()
-        result = await stream_c.process(content, file.filename, query)
+        with ParsedDocument(content, file.filename) as document, llm_cache_bypass(no_cache):
+            result = await stream_c.process(document, query)
         return ProcessResponse(status="success", message="Stream C processing complete", data=result, stream_used="C")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -142,28 +119,138 @@ async def process_stream_c(
 @router.post("/process/stream-d", response_model=ProcessResponse)
 async def process_stream_d(
     query: str = Form(...),
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    retrieval_mode: str = Form("hybrid"),
+    no_cache: bool = Form(False)
+):
+    """
+    Semantic Q&A. `retrieval_mode` is "vector", "bm25" or "hybrid" (default).
+    """
+    if retrieval_mode not in RETRIEVAL_MODES:
+        raise HTTPException(status_code=400, detail=f"retrieval_mode must be one of {', '.join(RETRIEVAL_MODES)}")
+    try:
+        content = await file.read()
+        with ParsedDocument(content, file.filename) as document, llm_cache_bypass(no_cache):
+            result = await stream_d.process(document, query, retrieval_mode)
+        return ProcessResponse(status="success", message="Stream D processing complete", data=result, stream_used="D")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/process/stream-d/multi", response_model=ProcessResponse)
+async def process_stream_d_multi(
+    queries: List[str] = Form(...),
+    file: UploadFile = File(...),
+    retrieval_mode: str = Form("hybrid"),
+    no_cache: bool = Form(False)
 ):
+    """
+    Several questions about one document (repeat the `queries` field once per question).
+    The document is extracted and indexed once; one answer is returned per question, in order.
+    """
+    if retrieval_mode not in RETRIEVAL_MODES:
+        raise HTTPException(status_code=400, detail=f"retrieval_mode must be one of {', '.join(RETRIEVAL_MODES)}")
+    queries = [q for q in queries if q.strip()]
+    if not queries:
+        raise HTTPException(status_code=400, detail="At least one query is required")
     try:
         content = await file.read()
-        result = await stream_d.process(content, file.filename, query)
+        with ParsedDocument(content, file.filename) as document, llm_cache_bypass(no_cache):
+            result = await stream_d.process_many(document, queries, retrieval_mode)
         return ProcessResponse(status="success", message="Stream D processing complete", data=result, stream_used="D")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def _event_stream(content: bytes, filename: str, no_cache: bool, events):
+    """
+    Wraps a stream's (event, data) generator as a Server-Sent Events response.
+    """
+    async def body():
+        with ParsedDocument(content, filename) as document, llm_cache_bypass(no_cache):
+            try:
+                async for event, data in events(document):
+                    yield _sse(event, data)
+            except Exception as e:
+                yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(body(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.post("/process/stream-c/stream")
+async def stream_stream_c(
+    file: UploadFile = File(...),
+    query: Optional[str] = Form(None),
+    no_cache: bool = Form(False)
+):
+    """
+    Stream C over SSE: a `context` event once the layout is extracted, `token` events
+    as the LLM writes, then a `done` event with the parsed result.
+    """
+    content = await file.read()
+    return _event_stream(content, file.filename, no_cache, lambda document: stream_c.stream(document, query))
+
+@router.post("/process/stream-d/stream")
+async def stream_stream_d(
+    query: str = Form(...),
+    file: UploadFile = File(...),
+    retrieval_mode: str = Form("hybrid"),
+    no_cache: bool = Form(False)
+):
+    """
+    Stream D over SSE: a `context` event with the retrieved snippets, `token` events
+    as the LLM writes the answer, then a `done` event with the full answer.
+    """
+    if retrieval_mode not in RETRIEVAL_MODES:
+        raise HTTPException(status_code=400, detail=f"retrieval_mode must be one of {', '.join(RETRIEVAL_MODES)}")
+    content = await file.read()
+    return _event_stream(content, file.filename, no_cache,
+                         lambda document: stream_d.stream(document, query, retrieval_mode))
+
+@router.get("/transactions")
+async def list_transactions(limit: int = 10000):
+    """
+    Most recent orchestrator transactions (same columns as rq1_data.csv).
+    """
+    return await transaction_logger.read_records(limit)
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """
+    Hit/miss counters for the LLM response cache and size of the Azure layout cache.
+    """
+    layout_cache = await executors.run_io(lambda: azure_client.layout_cache)
+    return {
+        "llm": llm_cache.stats(),
+        "azure_layout": await executors.run_io(layout_cache.stats) if layout_cache else None
+    }
+
+@router.get("/results/{result_id}")
+async def result_info(result_id: str):
+    """
+    Metadata for a Stream A result: format, size, row count, columns and a preview.
+    """
+    result = await executors.run_io(result_store.get, result_id, False)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Result not found or expired.")
+    return result
+
 @router.get("/download/{result_id}")
-async def download_result(result_id: str):
+async def download_result(result_id: str, format: str = Query("csv"), gzip: bool = Query(False)):
     """
-    Serves the transformed CSV file for download.
+    Streams a transformed result as CSV, XLSX, JSON or Parquet, optionally gzip-compressed.
     """
-    # Note: results are stored in app/streams/results relative to stream_a.py
-    # but api.py is in app/
-    file_path = os.path.join(os.path.dirname(__file__), "streams", "results", f"{result_id}.csv")
-    if not os.path.exists(file_path):
+    if format not in DOWNLOAD_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format '{format}'. Use one of {', '.join(DOWNLOAD_FORMATS)}.")
+    result = await executors.run_io(result_store.get, result_id)
+    if result is None:
         raise HTTPException(status_code=404, detail="Result not found or expired.")
-    
-    return FileResponse(
-        path=file_path,
-        filename=f"transformed_data_{result_id[:8]}.csv",
-        media_type="text/csv"
-    )
\ No newline at end of file
+
+    filename = f"transformed_data_{result_id[:8]}.{format}" + (".gz" if gzip else "")
+    # A sync generator: Starlette iterates it in the thread pool
+    return StreamingResponse(
+        result_store.iter_download(result, format, gzip),
+        media_type="application/gzip" if gzip else MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
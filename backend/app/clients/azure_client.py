@@ -1,7 +1,14 @@
 import os
 import io
-from azure.ai.formrecognizer import DocumentAnalysisClient
+import asyncio
+import hashlib
+from typing import Dict, Optional
+from azure.ai.formrecognizer import AnalyzeResult, DocumentAnalysisClient, DocumentAnalysisApiVersion
 from azure.core.credentials import AzureKeyCredential
+from app.clients.layout_cache import LayoutCache
+from app.core.executors import executors
+
+LAYOUT_MODEL_ID = "prebuilt-layout"
 
 class AzureClient:
     def __init__(self):
@@ -17,6 +24,26 @@ class AzureClient:
                 credential=AzureKeyCredential(self.key)
             )
 
+        # Built on first use (it scans its directory), never at import
+        self.layout_cache_enabled = os.getenv("AZURE_LAYOUT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+        self._layout_cache: Optional[LayoutCache] = None
+        # Concurrent requests for the same document share a single Azure call
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @property
+    def layout_cache(self) -> Optional[LayoutCache]:
+        """
+        Blocking on first access: the disk cache of layout results, or None when disabled.
+        """
+        if self._layout_cache is None and self.layout_cache_enabled:
+            self._layout_cache = LayoutCache.from_env(LAYOUT_MODEL_ID, DocumentAnalysisApiVersion.V2023_07_31.value)
+        return self._layout_cache
+
+    @layout_cache.setter
+    def layout_cache(self, cache: Optional[LayoutCache]):
+        self._layout_cache = cache
+        self.layout_cache_enabled = cache is not None
+
     def analyze_layout(self, file_content: bytes):
         """
         Analyzes a document stream using the 'prebuilt-layout' model.
@@ -29,8 +56,51 @@ class AzureClient:
         file_stream = io.BytesIO(file_content)
         
         poller = self.client.begin_analyze_document(
-            "prebuilt-layout", document=file_stream
+            LAYOUT_MODEL_ID, document=file_stream
         )
         return poller
 
+    def analyze_layout_result(self, file_content: bytes):
+        """
+        Blocking: submits the document and waits for the 'prebuilt-layout' result.
+        Call through executors.run_io so the poll never blocks the event loop.
+        """
+        return self.analyze_layout(file_content).result()
+
+    async def analyze_layout_cached(self, file_content: bytes, sha256: Optional[str] = None):
+        """
+        Returns the 'prebuilt-layout' result, served from the disk cache when the same
+        bytes were analyzed before. Misses poll Azure in the I/O pool and populate the cache.
+        """
+        layout_cache = self._layout_cache or await executors.run_io(lambda: self.layout_cache)
+        if layout_cache is None:
+            return await executors.run_io(self.analyze_layout_result, file_content)
+
+        key = sha256 or hashlib.sha256(file_content).hexdigest()
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            cached = await executors.run_io(layout_cache.get, key)
+            if cached is not None:
+                result = AnalyzeResult.from_dict(cached)
+            else:
+                result = await executors.run_io(self.analyze_layout_result, file_content)
+                await executors.run_io(layout_cache.put, key, result.to_dict())
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters re-raise it; mark retrieved so an unshared failure is not logged as unhandled
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
 azure_client = AzureClient()
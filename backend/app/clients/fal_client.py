@@ -1,7 +1,10 @@
 import os
+import json
 import httpx
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 import hashlib
+import numpy as np
+from app.clients.llm_cache import CachedLLMClient, StreamError, llm_cache
 
 class FalClient:
     def __init__(self):
@@ -10,6 +13,48 @@ class FalClient:
         api_key = os.getenv("FAL_KEY")
         if not api_key:
             print("Warning: FAL_KEY not found in environment variables.")
+        self.base_url = os.getenv("FAL_BASE_URL", "https://fal.run")
+        # One pooled client per process; opened in the FastAPI lifespan (or lazily for scripts)
+        self._http: Optional[httpx.AsyncClient] = None
+
+    def _build_http_client(self) -> httpx.AsyncClient:
+        """
+        Long-lived client with keep-alive pooling. Tunable via FAL_MAX_CONNECTIONS,
+        FAL_MAX_KEEPALIVE, FAL_KEEPALIVE_EXPIRY and FAL_HTTP2.
+        """
+        limits = httpx.Limits(
+            max_connections=int(os.getenv("FAL_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("FAL_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=float(os.getenv("FAL_KEEPALIVE_EXPIRY", "30")),
+        )
+        http2 = os.getenv("FAL_HTTP2", "false").lower() in ("1", "true", "yes")
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                print("Warning: FAL_HTTP2 is enabled but 'h2' is not installed (pip install httpx[http2]). Using HTTP/1.1.")
+                http2 = False
+        return httpx.AsyncClient(base_url=self.base_url, limits=limits, http2=http2, timeout=30.0)
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None or self._http.is_closed:
+            self._http = self._build_http_client()
+        return self._http
+
+    async def startup(self):
+        """
+        Opens the shared HTTP client. Called from the FastAPI lifespan.
+        """
+        self.http
+
+    async def aclose(self):
+        """
+        Closes pooled connections. Called from the FastAPI lifespan on shutdown.
+        """
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
 
     async def generate_completion(self, system_prompt: str, user_prompt: str, model: str = ""):
         """
@@ -33,15 +78,14 @@ class FalClient:
                 "prompt": prompt
             }
             
-            async with httpx.AsyncClient() as client:
-                # Using fal.run for synchronous response instead of queue.fal.run which requires polling
-                resp = await client.post("https://fal.run/fal-ai/any-llm", headers=headers, json=payload, timeout=30.0)
-                
-                if resp.status_code != 200:
-                    print(f"Error calling Fal.ai any-llm HTTP ({resp.status_code}): {resp.text}")
-                    return f"Error: Fal API returned {resp.status_code}: {resp.text[:200]}"
-                
-                return resp.json().get("output", "")
+            # Using fal.run for synchronous response instead of queue.fal.run which requires polling
+            resp = await self.http.post("/fal-ai/any-llm", headers=headers, json=payload, timeout=30.0)
+            
+            if resp.status_code != 200:
+                print(f"Error calling Fal.ai any-llm HTTP ({resp.status_code}): {resp.text}")
+                return f"Error: Fal API returned {resp.status_code}: {resp.text[:200]}"
+            
+            return resp.json().get("output", "")
         except httpx.TimeoutException:
             err = "Error: Fal.ai API timed out after 30 seconds."
             print(err)
@@ -51,19 +95,89 @@ class FalClient:
             print(err)
             return err
 
-    async def get_embedding(self, text: str, model: str = "text-embedding-3-small") -> List[float]:
+    async def stream_completion(self, system_prompt: str, user_prompt: str, model: str = "") -> AsyncIterator[str]:
+        """
+        Streams the any-llm completion as text deltas from the SSE endpoint.
+        Fal sends the cumulative output in each event; only the new suffix is yielded.
+        Errors are yielded as a single "Error: ..." StreamError chunk, mirroring
+        generate_completion, possibly after some text has already been streamed.
+        """
+        api_key = os.getenv("FAL_KEY")
+        if not api_key:
+            print("DEBUG: FAL_KEY missing. Using safe mock generation.")
+            yield "Mocked API Response (Missing Key)"
+            return
+
+        headers = {
+            "Authorization": f"Key {api_key}",
+            "Content-Type": "application/json",
+            "Accept": "text/event-stream"
+        }
+        payload = {
+            "prompt": f"{system_prompt}\n\n{user_prompt}"
+        }
+        emitted = ""
+        try:
+            async with self.http.stream("POST", "/fal-ai/any-llm/stream", headers=headers, json=payload, timeout=30.0) as resp:
+                if resp.status_code != 200:
+                    body = (await resp.aread()).decode(errors="replace")
+                    print(f"Error calling Fal.ai any-llm stream HTTP ({resp.status_code}): {body}")
+                    yield StreamError(f"Error: Fal API returned {resp.status_code}: {body[:200]}")
+                    return
+                async for line in resp.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if not data or data == "[DONE]":
+                        continue
+                    try:
+                        output = json.loads(data).get("output", "")
+                    except ValueError:
+                        continue
+                    if output.startswith(emitted):
+                        delta, emitted = output[len(emitted):], output
+                    else:
+                        delta, emitted = output, emitted + output
+                    if delta:
+                        yield delta
+        except httpx.TimeoutException:
+            err = "Error: Fal.ai API timed out after 30 seconds."
+            print(err)
+            yield StreamError(err)
+        except Exception as e:
+            err = f"Error: Generation Exception: {str(e)}"
+            print(err)
+            yield StreamError(err)
+
+    @staticmethod
+    def _synthetic_embeddings(texts: List[str], dim: int = 1536) -> np.ndarray:
+        """
+        Vectorized form of the MD5-derived synthetic embedding: component i is
+        byte (hash >> (i % 32)) & 0xFF scaled to [-1, 1], then L2-normalized.
+        Only the low 40 bits of the hash are ever shifted in, so the low 64 bits suffice.
+        """
+        low_bits = np.array(
+            [int.from_bytes(hashlib.md5(text.encode()).digest()[-8:], "big") for text in texts],
+            dtype=np.uint64,
+        ).reshape(-1, 1)
+        shifts = np.arange(32, dtype=np.uint64)
+        pattern = ((low_bits >> shifts) & np.uint64(0xFF)).astype(np.float32) / 255.0 * 2 - 1
+        embeddings = np.tile(pattern, (1, -(-dim // 32)))[:, :dim]
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return np.divide(embeddings, norms, out=embeddings, where=norms > 0)
+
+    async def get_embeddings(self, texts: List[str], model: str = "text-embedding-3-small") -> np.ndarray:
         """
-        Fallback deterministic synthetic embedding to keep pipeline alive
+        Batch embedding: returns a (len(texts), 1536) float32 matrix.
+        Fallback deterministic synthetic embeddings to keep pipeline alive
         since the provided URL is purely for chat completions.
         """
-        hash_val = int(hashlib.md5(text.encode()).hexdigest(), 16)
-        embedding = []
-        for i in range(1536):
-            val = ((hash_val >> (i % 32)) & 0xFF) / 255.0 * 2 - 1 
-            embedding.append(val)
-        magnitude = sum(x**2 for x in embedding) ** 0.5
-        if magnitude > 0:
-            embedding = [x / magnitude for x in embedding]
-        return embedding
+        return self._synthetic_embeddings(list(texts))
+
+    async def get_embedding(self, text: str, model: str = "text-embedding-3-small") -> List[float]:
+        return (await self.get_embeddings([text], model))[0].tolist()
 
 fal_client_instance = FalClient()
+
+# Streams use the cached wrapper; prompts are fully determined by document + instruction
+cached_fal_client = CachedLLMClient(fal_client_instance, llm_cache)
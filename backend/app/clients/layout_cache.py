@@ -0,0 +1,118 @@
+import os
+import gzip
+import json
+import shutil
+import threading
+from typing import Optional
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "cache", "azure_layout")
+
+# Bump when the on-disk format changes
+CACHE_FORMAT = 1
+# Version directories are "layout-<version>" and carry this marker file; only directories
+# with both are ever purged, so a cache dir shared with other data is left alone
+VERSION_PREFIX = "layout-"
+MARKER_FILE = ".layout_cache"
+
+
+class LayoutCache:
+    """
+    Disk-backed cache of serialized Azure 'prebuilt-layout' results, keyed by the
+    SHA-256 of the document bytes. Entries live under a version directory
+    (model id + API version + format), so a model change invalidates old entries;
+    only this cache's own version directories are removed.
+    Total size is bounded; the least recently used files are evicted first.
+    """
+
+    def __init__(self, cache_dir: str, version: str, max_bytes: int):
+        self.version = version
+        self.root = cache_dir
+        self.cache_dir = os.path.join(cache_dir, f"{VERSION_PREFIX}{version}")
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        open(os.path.join(self.cache_dir, MARKER_FILE), "a").close()
+        self._purge_other_versions()
+        self._total_bytes = sum(os.path.getsize(path) for path in self._entries())
+
+    @classmethod
+    def from_env(cls, model_id: str, api_version: str) -> "LayoutCache":
+        version = os.getenv("AZURE_LAYOUT_CACHE_VERSION") or f"{model_id}-{api_version}-f{CACHE_FORMAT}"
+        return cls(
+            cache_dir=os.getenv("AZURE_LAYOUT_CACHE_DIR", DEFAULT_CACHE_DIR),
+            version=version,
+            max_bytes=int(float(os.getenv("AZURE_LAYOUT_CACHE_MAX_MB", "2048")) * 1024 * 1024),
+        )
+
+    def _purge_other_versions(self):
+        current = os.path.basename(self.cache_dir)
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name != current and name.startswith(VERSION_PREFIX) and os.path.isfile(os.path.join(path, MARKER_FILE)):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _entries(self):
+        for dirpath, _, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                if filename.endswith(".json.gz"):
+                    yield os.path.join(dirpath, filename)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json.gz")
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Blocking: returns the cached result dict, refreshing its LRU timestamp.
+        """
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+            os.utime(path)
+            return data
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Discarding unreadable layout cache entry {key}: {e}")
+            with self._lock:
+                self._remove(path)
+            return None
+
+    def put(self, key: str, result: dict):
+        """
+        Blocking: writes the result atomically, then evicts down to the size cap.
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(result, f)
+        with self._lock:
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self._total_bytes += os.path.getsize(path) - previous
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _remove(self, path: str):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            self._total_bytes -= size
+        except OSError:
+            pass
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda path: os.path.getmtime(path))
+        for path in entries:
+            if self._total_bytes <= self.max_bytes:
+                break
+            self._remove(path)
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "entries": sum(1 for _ in self._entries()),
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+        }
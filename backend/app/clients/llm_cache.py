@@ -0,0 +1,240 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Optional
+
+from app.core.executors import executors
+
+# Per-request opt-out; set by the API when a caller asks for a fresh response
+bypass_llm_cache: ContextVar[bool] = ContextVar("bypass_llm_cache", default=False)
+
+
+@contextmanager
+def llm_cache_bypass(enabled: bool = True):
+    """
+    Skips cache reads and writes for every LLM call made inside the block.
+    """
+    token = bypass_llm_cache.set(enabled)
+    try:
+        yield
+    finally:
+        bypass_llm_cache.reset(token)
+
+
+class StreamError(str):
+    """
+    An "Error: ..." chunk yielded by a streaming client. It is still text for the
+    caller to show, but marks the streamed response as failed so it is never cached.
+    """
+
+
+class ResponseCache:
+    """
+    Content-addressed cache with an in-memory LRU tier and an optional SQLite tier.
+    Entries expire after `ttl_seconds`; each tier is capped by entry count.
+    Values must be JSON-serializable to be written to the SQLite tier.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 86400,
+                 db_path: Optional[str] = None, max_disk_entries: int = 100000, namespace: str = "llm"):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+        self.namespace = namespace
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "namespace TEXT, key TEXT, value TEXT, expires_at REAL, last_access REAL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_cache_access ON cache (namespace, last_access)")
+            self._db.commit()
+
+    @classmethod
+    def from_env(cls, prefix: str = "LLM_CACHE", namespace: str = "llm") -> "ResponseCache":
+        """
+        Builds a cache from <PREFIX>_MAX_ENTRIES, <PREFIX>_TTL, <PREFIX>_DB and <PREFIX>_MAX_DISK_ENTRIES.
+        """
+        return cls(
+            max_entries=int(os.getenv(f"{prefix}_MAX_ENTRIES", "1024")),
+            ttl_seconds=float(os.getenv(f"{prefix}_TTL", "86400")),
+            db_path=os.getenv(f"{prefix}_DB") or None,
+            max_disk_entries=int(os.getenv(f"{prefix}_MAX_DISK_ENTRIES", "100000")),
+            namespace=namespace,
+        )
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, value: Any, expires_at: float):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _disk_get(self, key: str, now: float):
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._db.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+                self._db.commit()
+                return None
+            self._db.execute(
+                "UPDATE cache SET last_access = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key),
+            )
+            self._db.commit()
+            return json.loads(row[0]), row[1]
+
+    def _disk_set(self, key: str, value: Any, expires_at: float, now: float):
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), expires_at, now),
+            )
+            self._db.execute("DELETE FROM cache WHERE namespace = ? AND expires_at <= ?", (self.namespace, now))
+            # Trim the least recently used rows beyond the disk cap
+            self._db.execute(
+                "DELETE FROM cache WHERE namespace = ? AND key IN ("
+                "SELECT key FROM cache WHERE namespace = ? ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.namespace, self.namespace, self.max_disk_entries),
+            )
+            self._db.commit()
+
+    async def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._memory[key]
+
+        if self._db is not None:
+            found = await executors.run_io(self._disk_get, key, now)
+            if found is not None:
+                value, expires_at = found
+                self._remember(key, value, expires_at)
+                self.hits += 1
+                self.disk_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Any):
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        self._remember(key, value, expires_at)
+        if self._db is not None:
+            await executors.run_io(self._disk_set, key, value, expires_at, now)
+
+    def clear(self):
+        self._memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+                self._db.commit()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "ttl_seconds": self.ttl_seconds,
+            "disk_enabled": self._db is not None,
+        }
+
+
+class CachedLLMClient:
+    """
+    Wraps FalClient / OpenAIClient so identical (model, system prompt, user prompt)
+    requests are answered from the ResponseCache. Error strings are never cached.
+    Every other attribute is delegated to the wrapped client.
+    """
+
+    def __init__(self, client, cache: ResponseCache):
+        self.client = client
+        self.cache = cache
+        self.enabled = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+    def cache_key(self, system_prompt: str, user_prompt: str, model: str = "") -> str:
+        return self.cache.make_key(type(self.client).__name__, model, system_prompt, user_prompt)
+
+    @staticmethod
+    def _is_cacheable(response) -> bool:
+        return isinstance(response, str) and bool(response) \
+            and not response.startswith("Error") and not response.startswith("Mocked API Response")
+
+    async def generate_completion(self, system_prompt: str, user_prompt: str, model: str = "", bypass_cache: bool = False):
+        kwargs = {"model": model} if model else {}
+        if not self.enabled or bypass_cache or bypass_llm_cache.get():
+            return await self.client.generate_completion(system_prompt, user_prompt, **kwargs)
+
+        key = self.cache_key(system_prompt, user_prompt, model)
+        cached = await self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        response = await self.client.generate_completion(system_prompt, user_prompt, **kwargs)
+        if self._is_cacheable(response):
+            await self.cache.set(key, response)
+        return response
+
+    async def stream_completion(self, system_prompt: str, user_prompt: str, model: str = "", bypass_cache: bool = False):
+        """
+        Streams from the wrapped client. A cache hit is replayed as a single chunk;
+        a miss is cached once the full response has streamed without a StreamError
+        chunk (a client that raises mid-stream never reaches the write).
+        """
+        kwargs = {"model": model} if model else {}
+        use_cache = self.enabled and not bypass_cache and not bypass_llm_cache.get()
+        key = self.cache_key(system_prompt, user_prompt, model)
+        if use_cache:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        parts, failed = [], False
+        async for delta in self.client.stream_completion(system_prompt, user_prompt, **kwargs):
+            failed = failed or isinstance(delta, StreamError)
+            parts.append(delta)
+            yield delta
+        response = "".join(parts)
+        if use_cache and not failed and self._is_cacheable(response):
+            await self.cache.set(key, response)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+llm_cache = ResponseCache.from_env()
@@ -0,0 +1,99 @@
+import os
+import re
+import math
+import zlib
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, List
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from chromadb.utils.embedding_functions import register_embedding_function
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("a an and are as at be by for from in is it of on or that the this to was were with".split())
+
+# Relative weight of each feature family: word unigrams, word bigrams, character n-grams
+FAMILY_WEIGHTS = {"w": 1.0, "b": 0.5, "c": 0.25}
+
+
+@lru_cache(maxsize=200000)
+def _bucket(feature: str, dim: int):
+    # crc32 is stable across processes (unlike hash()), so vectors can be persisted
+    h = zlib.crc32(feature.encode())
+    return h % dim, 1.0 if (h >> 31) & 1 else -1.0
+
+
+class HashingEmbedder:
+    """
+    Deterministic, download-free text embeddings for CPU-only or air-gapped nodes.
+    Word unigrams, word bigrams and character trigrams are hashed into `dim` signed
+    buckets with sublinear term frequency, then L2-normalized, so cosine similarity
+    approximates TF overlap. There is no fitted IDF: a vector depends only on its own
+    text, never on what else has been indexed.
+    """
+
+    def __init__(self, dim: int = 1536, char_ngram: int = 3):
+        self.dim = dim
+        self.char_ngram = char_ngram
+
+    def features(self, text: str) -> Counter:
+        words = [w for w in WORD_PATTERN.findall(text.lower()) if w not in STOPWORDS]
+        features = Counter()
+        for word in words:
+            features["w:" + word] += 1
+            padded = f"<{word}>"
+            for i in range(len(padded) - self.char_ngram + 1):
+                features["c:" + padded[i:i + self.char_ngram]] += 1
+        for first, second in zip(words, words[1:]):
+            features[f"b:{first} {second}"] += 1
+        return features
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Returns a (len(texts), dim) float32 matrix.
+        """
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, count in self.features(text).items():
+                bucket, sign = _bucket(feature, self.dim)
+                matrix[row, bucket] += sign * FAMILY_WEIGHTS[feature[0]] * (1 + math.log(count))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return np.divide(matrix, norms, out=matrix, where=norms > 0)
+
+
+class LocalEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Chroma embedding function backed by HashingEmbedder, so collections can embed
+    documents and query texts without Chroma downloading its default model.
+    """
+
+    def __init__(self, dim: int = 1536):
+        self.dim = dim
+        self.embedder = HashingEmbedder(dim)
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return list(self.embedder.embed(list(input)))
+
+    @staticmethod
+    def name() -> str:
+        return "documind_hashing"
+
+    def default_space(self) -> str:
+        return "cosine"
+
+    def get_config(self) -> Dict[str, Any]:
+        return {"dim": self.dim}
+
+    @staticmethod
+    def build_from_config(config: Dict[str, Any]) -> "LocalEmbeddingFunction":
+        return LocalEmbeddingFunction(dim=config.get("dim", 1536))
+
+    @classmethod
+    def from_env(cls) -> "LocalEmbeddingFunction":
+        return cls(dim=int(os.getenv("LOCAL_EMBEDDING_DIM", "1536")))
+
+
+# Lets Chroma rebuild the function from a persisted collection's config. Called directly
+# rather than as a decorator: chromadb 1.0.0's version registers but returns None.
+register_embedding_function(LocalEmbeddingFunction)
@@ -1,6 +1,9 @@
 import os
+import numpy as np
+from typing import AsyncIterator, List
 from openai import AsyncOpenAI
 from tenacity import retry, stop_after_attempt, wait_exponential
+from app.clients.llm_cache import CachedLLMClient, llm_cache
 
 class OpenAIClient:
     def __init__(self):
@@ -28,6 +31,27 @@ class OpenAIClient:
             print(f"Error calling OpenAI: {e}")
             raise
 
+    async def stream_completion(self, system_prompt: str, user_prompt: str, model: str = "gpt-4o-mini") -> AsyncIterator[str]:
+        """
+        Streams the completion as text deltas.
+        """
+        try:
+            stream = await self.client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=0.1,
+                stream=True
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            print(f"Error calling OpenAI: {e}")
+            raise
+
     async def get_embedding(self, text: str):
         """
         Generates an embedding for the given text.
@@ -42,4 +66,23 @@ class OpenAIClient:
             print(f"Error getting embedding: {e}")
             raise
 
+    async def get_embeddings(self, texts: List[str], model: str = "text-embedding-3-small", batch_size: int = 512) -> np.ndarray:
+        """
+        Embeds many texts with one request per `batch_size` inputs.
+        Returns a (len(texts), dim) float32 matrix in input order.
+        """
+        rows = []
+        try:
+            for start in range(0, len(texts), batch_size):
+                response = await self.client.embeddings.create(
+                    model=model,
+                    input=texts[start:start + batch_size]
+                )
+                rows.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        except Exception as e:
+            print(f"Error getting embeddings: {e}")
+            raise
+        return np.asarray(rows, dtype=np.float32)
+
 openai_client = OpenAIClient()
+cached_openai_client = CachedLLMClient(openai_client, llm_cache)
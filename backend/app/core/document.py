@@ -0,0 +1,198 @@
+import os
+import hashlib
+from typing import Iterator, List, Optional, Tuple
+
+
+def extract_page_texts(content: bytes, start_page: int = 0, max_chars: Optional[int] = None) -> Tuple[int, List[str], Optional[str]]:
+    """
+    Opens the PDF and extracts page text from `start_page` onwards, stopping once
+    `max_chars` characters have been collected. Module-level so it can run in the
+    CPU process pool. Returns (page_count, texts, open_error).
+    """
+    import fitz
+    try:
+        doc = fitz.open(stream=content, filetype="pdf")
+    except Exception as e:
+        try:
+            doc = fitz.open(stream=content)
+        except Exception as inner_e:
+            return 0, [], f"{str(e)} | Inner: {str(inner_e)}"
+
+    texts = []
+    total = 0
+    with doc:
+        page_count = len(doc)
+        for page_num in range(start_page, page_count):
+            text = doc.load_page(page_num).get_text("text")
+            texts.append(text)
+            total += len(text)
+            if max_chars is not None and total >= max_chars:
+                break
+    return page_count, texts, None
+
+
+class ParsedDocument:
+    """
+    Per-request view of an uploaded file.
+    Opens the PDF with PyMuPDF at most once and caches per-page text, so the
+    Gatekeeper and every stream share the same parse instead of re-opening the bytes.
+    """
+
+    def __init__(self, content: bytes, filename: str):
+        self.content = content
+        self.filename = filename
+        self.extension = os.path.splitext(filename)[1].lower()
+        self._sha256: Optional[str] = None
+        self._fitz_doc = None
+        self._open_error: Optional[str] = None
+        self._page_texts: List[Optional[str]] = []
+        # Set once load_text() has run: page count and open errors are then known without PyMuPDF
+        self._loaded = False
+
+    @property
+    def is_pdf(self) -> bool:
+        return self.extension == ".pdf"
+
+    @property
+    def sha256(self) -> str:
+        """
+        Content hash of the raw bytes, used as a cache / index key.
+        """
+        if self._sha256 is None:
+            self._sha256 = hashlib.sha256(self.content).hexdigest()
+        return self._sha256
+
+    @property
+    def fitz_doc(self):
+        """
+        The opened PyMuPDF document, or None if the bytes cannot be parsed.
+        """
+        if self._fitz_doc is None and self._open_error is None:
+            import fitz
+            try:
+                self._fitz_doc = fitz.open(stream=self.content, filetype="pdf")
+            except Exception as e:
+                try:
+                    self._fitz_doc = fitz.open(stream=self.content)
+                except Exception as inner_e:
+                    self._open_error = f"{str(e)} | Inner: {str(inner_e)}"
+                    return None
+            if not self._page_texts:
+                self._page_texts = [None] * len(self._fitz_doc)
+        return self._fitz_doc
+
+    @property
+    def open_error(self) -> Optional[str]:
+        """
+        Why the bytes could not be parsed, or None. After load_text() this comes from the
+        executor's parse; only documents never loaded are opened here.
+        """
+        if not self._loaded:
+            self.fitz_doc
+        return self._open_error
+
+    @property
+    def page_count(self) -> int:
+        if self._page_texts or self._loaded:
+            return len(self._page_texts)
+        doc = self.fitz_doc
+        return len(doc) if doc is not None else 0
+
+    async def load_text(self, max_chars: Optional[int] = None):
+        """
+        Extracts page text in the CPU process pool so PyMuPDF never blocks the event loop.
+        With `max_chars`, stops after enough pages to cover that many characters;
+        a later call picks up from the first page not yet extracted.
+        """
+        from app.core.executors import executors
+
+        if self._open_error is not None:
+            return
+        if self._loaded and not self._page_texts:
+            return
+        start_page = 0
+        while start_page < len(self._page_texts) and self._page_texts[start_page] is not None:
+            start_page += 1
+        if self._page_texts and start_page == len(self._page_texts):
+            return
+        if max_chars is not None:
+            max_chars -= sum(len(text) for text in self._page_texts[:start_page])
+            if max_chars <= 0:
+                return
+
+        page_count, texts, error = await executors.run_cpu(extract_page_texts, self.content, start_page, max_chars)
+        self._loaded = True
+        if error is not None:
+            self._open_error = error
+            return
+        if not self._page_texts:
+            self._page_texts = [None] * page_count
+        for offset, text in enumerate(texts):
+            self._page_texts[start_page + offset] = text
+
+    def page_text(self, page_num: int) -> str:
+        """
+        Text of a single page, extracted on first access.
+        """
+        if self._page_texts and self._page_texts[page_num] is not None:
+            return self._page_texts[page_num]
+        doc = self.fitz_doc
+        if doc is None:
+            return ""
+        self._page_texts[page_num] = doc.load_page(page_num).get_text("text")
+        return self._page_texts[page_num]
+
+    def iter_page_texts(self) -> Iterator[str]:
+        for page_num in range(self.page_count):
+            yield self.page_text(page_num)
+
+    @property
+    def page_texts(self) -> List[str]:
+        return list(self.iter_page_texts())
+
+    @property
+    def full_text(self) -> str:
+        return "".join(text + "\n" for text in self.iter_page_texts())
+
+    def text_prefix(self, max_chars: int = 3000) -> str:
+        """
+        First `max_chars` characters of text, only touching as many pages as needed.
+        Falls back to raw bytes decoding for non-PDFs.
+        """
+        if not self.is_pdf or self.open_error is not None:
+            return self.content[:max_chars].decode('utf-8', errors='ignore')
+
+        text = ""
+        for page_text in self.iter_page_texts():
+            text += page_text
+            if len(text) >= max_chars:
+                break
+        return text[:max_chars]
+
+    @property
+    def page_stats(self) -> List[dict]:
+        """
+        Per-page character counts (raw and stripped) for density / native-text checks.
+        """
+        return [
+            {"page_num": i + 1, "chars": len(text), "text_chars": len(text.strip())}
+            for i, text in enumerate(self.iter_page_texts())
+        ]
+
+    @property
+    def text_length(self) -> int:
+        """
+        Total stripped text length across all pages.
+        """
+        return sum(stat["text_chars"] for stat in self.page_stats)
+
+    def close(self):
+        if self._fitz_doc is not None:
+            self._fitz_doc.close()
+            self._fitz_doc = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
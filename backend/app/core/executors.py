@@ -0,0 +1,61 @@
+import os
+import asyncio
+import functools
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Callable, Optional
+
+
+class Executors:
+    """
+    Keeps blocking work off the asyncio event loop.
+    - I/O pool (threads): Azure SDK calls and poller.result(), file and SQLite access.
+    - CPU pool (processes): PyMuPDF parsing and other GIL-bound work.
+    Sizes come from DOCUMIND_IO_WORKERS / DOCUMIND_CPU_WORKERS. Setting
+    DOCUMIND_CPU_WORKERS=0 routes CPU work to the thread pool instead (e.g. for tests).
+    """
+
+    def __init__(self, io_workers: Optional[int] = None, cpu_workers: Optional[int] = None):
+        self.io_workers = io_workers if io_workers is not None else int(os.getenv("DOCUMIND_IO_WORKERS", "16"))
+        self.cpu_workers = cpu_workers if cpu_workers is not None else int(os.getenv("DOCUMIND_CPU_WORKERS", str(min(4, os.cpu_count() or 1))))
+        self._io_pool: Optional[ThreadPoolExecutor] = None
+        self._cpu_pool: Optional[Executor] = None
+
+    @property
+    def io_pool(self) -> ThreadPoolExecutor:
+        if self._io_pool is None:
+            self._io_pool = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="documind-io")
+        return self._io_pool
+
+    @property
+    def cpu_pool(self) -> Executor:
+        if self._cpu_pool is None:
+            if self.cpu_workers > 0:
+                self._cpu_pool = ProcessPoolExecutor(max_workers=self.cpu_workers)
+            else:
+                self._cpu_pool = self.io_pool
+        return self._cpu_pool
+
+    async def run_io(self, fn: Callable, *args, **kwargs):
+        """
+        Runs a blocking I/O-bound call in the thread pool.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.io_pool, functools.partial(fn, *args, **kwargs))
+
+    async def run_cpu(self, fn: Callable, *args, **kwargs):
+        """
+        Runs a CPU-bound call in the process pool.
+        `fn` and its arguments must be picklable (module-level functions, bytes, etc.).
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.cpu_pool, functools.partial(fn, *args, **kwargs))
+
+    def shutdown(self, wait: bool = True):
+        if self._cpu_pool is not None and self._cpu_pool is not self._io_pool:
+            self._cpu_pool.shutdown(wait=wait, cancel_futures=True)
+        if self._io_pool is not None:
+            self._io_pool.shutdown(wait=wait, cancel_futures=True)
+        self._cpu_pool = None
+        self._io_pool = None
+
+executors = Executors()
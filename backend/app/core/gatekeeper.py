@@ -2,6 +2,8 @@ import os
 import json
 from typing import Tuple, Optional
 from app.models.schemas import *
+from app.core.document import ParsedDocument
+from app.streams import ingestion
 from app.streams.stream_a import stream_a
 from app.streams.stream_b import stream_b
 from app.streams.stream_c import stream_c
@@ -13,40 +15,20 @@ class Gatekeeper:
     """
     
     @staticmethod
-    def _extract_pdf_text(file_content: bytes, max_chars: int = 3000) -> str:
-        """
-        Uses PyMuPDF to extract readable text from a PDF for keyword analysis.
-        Falls back to raw bytes decoding for non-PDFs.
-        """
-        try:
-            import fitz
-            doc = fitz.open(stream=file_content, filetype="pdf")
-            text = ""
-            for page in doc:
-                text += page.get_text("text")
-                if len(text) >= max_chars:
-                    break
-            doc.close()
-            return text[:max_chars]
-        except Exception:
-            # Not a PDF or PyMuPDF failed, fall back to raw decode
-            return file_content[:max_chars].decode('utf-8', errors='ignore')
-
-    @staticmethod
-    async def route(file_content: bytes, filename: str) -> str:
+    async def route(document: ParsedDocument) -> str:
         """
         Autonomous Mode: Fail-fast logic applying lightweight checks first.
         """
-        # Layer 1: Metadata (Deterministic) — tabular files go straight to Stream A
-        ext = os.path.splitext(filename)[1].lower()
-        if ext in ['.csv', '.xlsx', '.json', '.xml']:
+        # Layer 1: Metadata (Deterministic) — every format Stream A has a reader for
+        # (.csv, .xlsx, .json, .ndjson, .jsonl, .xml, ...) goes straight to Stream A
+        if document.extension in ingestion.READERS:
             return "A"
             
-        # Layer 2: Heuristics (Keywords) — extract real text from PDFs first
-        if ext == '.pdf':
-            content_text = Gatekeeper._extract_pdf_text(file_content)
-        else:
-            content_text = file_content[:3000].decode('utf-8', errors='ignore')
+        # Layer 2: Heuristics (Keywords) — PDF text comes from the shared parse,
+        # only as many pages as needed; other files fall back to raw decoding
+        if document.is_pdf:
+            await document.load_text(max_chars=3000)
+        content_text = document.text_prefix(3000)
 
         tax_keywords = ["Form 1040", "Tax Return", "IRS", "W-2", "Schedule", "Adjusted Gross Income", "Taxable Income"]
         if any(kw in content_text for kw in tax_keywords):
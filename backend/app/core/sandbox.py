@@ -0,0 +1,277 @@
+import io
+import os
+import asyncio
+import pickle
+import resource
+import traceback
+import multiprocessing
+from contextlib import redirect_stdout
+from typing import Any, Callable, List, Optional, Tuple
+
+import pandas as pd
+
+from app.core.executors import executors
+
+# Captured print output returned per run is truncated to this many characters
+MAX_STDOUT_CHARS = 10000
+
+
+def encode_frame(df: pd.DataFrame) -> Tuple[str, bytes]:
+    """
+    Serializes a DataFrame as Arrow IPC (columnar buffers, no per-object pickling).
+    Frames Arrow cannot represent (e.g. mixed-type object columns) fall back to pickle.
+    """
+    import pyarrow as pa
+    try:
+        table = pa.Table.from_pandas(df)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return "arrow", sink.getvalue().to_pybytes()
+    except (pa.ArrowException, TypeError, ValueError):
+        return "pickle", pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def decode_frame(encoded: Tuple[str, bytes]) -> pd.DataFrame:
+    import pyarrow as pa
+    kind, payload = encoded
+    if kind == "arrow":
+        return pa.ipc.open_stream(payload).read_all().to_pandas()
+    return pickle.loads(payload)
+
+
+def run_transformation(df: pd.DataFrame, code: str, copy: bool = True):
+    """
+    Executes generated code against `df` (a copy unless `copy` is False, for frames
+    nobody else holds) and coerces the result to a DataFrame. Returns (result_df, error).
+    """
+    local_vars = {"df": df.copy() if copy else df, "pd": pd}
+    try:
+        exec(code, {}, local_vars)
+
+        # Use result_df if available, otherwise fallback to modified df
+        result_df = local_vars.get("result_df", local_vars.get("df"))
+
+        if result_df is None:
+            return None, "The generated code did not produce a valid result."
+
+        # ENSURE result_df is a DataFrame
+        # If it's a Series (e.g. from groupby or simple aggregation)
+        if isinstance(result_df, pd.Series):
+            result_df = result_df.to_frame()
+
+        # If it's a scalar (int, float, str, bool, numpy scalar)
+        elif not isinstance(result_df, pd.DataFrame):
+            # Check for numpy scalars
+            if hasattr(result_df, 'item'):
+                result_df = result_df.item()
+
+            result_df = pd.DataFrame([{"Result": result_df}])
+
+        return result_df, None
+    except MemoryError:
+        return None, "Execution Error: the transformation ran out of memory."
+    except Exception as e:
+        tb = traceback.format_exc()
+        return None, f"Execution Error: {str(e)}\n\nTraceback:\n{tb}"
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def _vm_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def _transform_task(code: str, encoded: Tuple[str, bytes]):
+    result_df, error = run_transformation(decode_frame(encoded), code)
+    return encode_frame(result_df) if result_df is not None else None, error
+
+
+def _worker_main(conn, memory_mb: int, max_tasks: int):
+    """
+    Sandbox worker loop: runs (task, args) requests, where task is a module-level function
+    returning (result, error). pandas and pyarrow are imported before the first task.
+    The address space is capped at the warm baseline plus `memory_mb`, so runaway
+    allocations raise MemoryError inside the task; the worker also exits (and is
+    replaced) once its resident memory exceeds `memory_mb` or after `max_tasks` runs.
+    """
+    import pyarrow  # noqa: F401 - pre-warm
+    if memory_mb > 0:
+        limit = int((_vm_mb() + memory_mb) * 2**20)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    for _ in range(max_tasks):
+        try:
+            task, args = conn.recv()
+        except EOFError:
+            return
+        stdout = io.StringIO()
+        try:
+            with redirect_stdout(stdout):
+                response = task(*args)
+        except MemoryError:
+            response = (None, f"Execution Error: the transformation exceeded the {memory_mb} MB memory limit.")
+        except Exception as e:
+            response = (None, f"Execution Error: {str(e)}")
+        conn.send((*response, stdout.getvalue()[-MAX_STDOUT_CHARS:]))
+        if memory_mb > 0 and _rss_mb() > memory_mb:
+            return
+
+
+class _Worker:
+    def __init__(self, context, memory_mb: int, max_tasks: int):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, memory_mb, max_tasks), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.tasks = 0
+        self.max_tasks = max_tasks
+
+    @property
+    def usable(self) -> bool:
+        return self.process.is_alive() and self.tasks < self.max_tasks
+
+    def call(self, request, timeout: float):
+        """
+        Blocking: sends one task and waits up to `timeout` seconds for its reply.
+        """
+        self.tasks += 1
+        self.conn.send(request)
+        if not self.conn.poll(timeout):
+            raise TimeoutError
+        return self.conn.recv()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+class SandboxPool:
+    """
+    Pool of pre-warmed worker processes that run Stream A's generated code.
+    A worker runs one task at a time, so a slow or runaway transform never blocks the
+    event loop or other requests, print() output is captured per task, and a task that
+    exceeds the wall-clock timeout is killed and its worker replaced. DataFrames cross
+    the process boundary as Arrow IPC buffers.
+    This isolates resource usage; it is not a security boundary for hostile code.
+    With workers=0, code runs in the I/O thread pool without limits (tests / dev).
+    """
+
+    def __init__(self, workers: int = 2, timeout_seconds: float = 60, memory_mb: int = 2048, max_tasks: int = 100):
+        self.workers = workers
+        self.timeout_seconds = timeout_seconds
+        self.memory_mb = memory_mb
+        self.max_tasks = max(1, max_tasks)
+        self._idle: Optional[asyncio.Queue] = None
+        self._all: List[_Worker] = []
+        self._start_lock: Optional[asyncio.Lock] = None
+        self.timeouts = 0
+        self.restarts = 0
+
+    @classmethod
+    def from_env(cls) -> "SandboxPool":
+        return cls(
+            workers=int(os.getenv("STREAM_A_SANDBOX_WORKERS", "2")),
+            timeout_seconds=float(os.getenv("STREAM_A_EXEC_TIMEOUT", "60")),
+            memory_mb=int(os.getenv("STREAM_A_EXEC_MEMORY_MB", "2048")),
+            max_tasks=int(os.getenv("STREAM_A_SANDBOX_MAX_TASKS", "100")),
+        )
+
+    @staticmethod
+    def _context():
+        # The forkserver forks workers from a clean single-threaded process with pandas
+        # already imported, instead of forking this multi-threaded server
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(["pandas", "pyarrow", __name__])
+            return context
+        return multiprocessing.get_context("spawn")
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._context(), self.memory_mb, self.max_tasks)
+        self._all.append(worker)
+        return worker
+
+    def _retire(self, worker: _Worker):
+        worker.kill()
+        if worker in self._all:
+            self._all.remove(worker)
+
+    async def start(self):
+        if self.workers <= 0:
+            return
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._idle is not None:
+                return
+            idle = asyncio.Queue()
+            for _ in range(self.workers):
+                idle.put_nowait(await executors.run_io(self._spawn))
+            self._idle = idle
+
+    async def stop(self):
+        workers, self._all, self._idle = list(self._all), [], None
+        for worker in workers:
+            await executors.run_io(worker.kill)
+
+    async def _replace(self, worker: _Worker) -> _Worker:
+        await executors.run_io(self._retire, worker)
+        self.restarts += 1
+        return await executors.run_io(self._spawn)
+
+    async def call(self, task: Callable, *args, timeout: Optional[float] = None) -> Tuple[Any, Optional[str], str]:
+        """
+        Runs a module-level `task(*args) -> (result, error)` in a worker.
+        Returns (result, error, captured stdout); time-outs and worker deaths come back as errors.
+        """
+        if self.workers <= 0:
+            result, error = await executors.run_io(task, *args)
+            return result, error, ""
+        await self.start()
+        timeout = timeout or self.timeout_seconds
+        worker = await self._idle.get()
+        try:
+            if not worker.usable:
+                worker = await self._replace(worker)
+            try:
+                return await executors.run_io(worker.call, (task, args), timeout)
+            except TimeoutError:
+                self.timeouts += 1
+                worker = await self._replace(worker)
+                return None, f"Execution Error: the transformation exceeded the {timeout:g}s time limit.", ""
+            except (EOFError, OSError):
+                # The worker died mid-task (e.g. killed by the OS for memory)
+                worker = await self._replace(worker)
+                return None, "Execution Error: the sandbox worker exited while running the transformation.", ""
+            except asyncio.CancelledError:
+                # Nobody will read the reply; kill the worker so it stops computing
+                worker = await asyncio.shield(self._replace(worker))
+                raise
+        finally:
+            if self._idle is not None:
+                self._idle.put_nowait(worker)
+
+    async def run(self, df: pd.DataFrame, code: str) -> Tuple[Optional[pd.DataFrame], Optional[str], str]:
+        """
+        Runs `code` against `df` in a worker. Returns (result_df, error, captured stdout).
+        """
+        if self.workers <= 0:
+            result_df, error = await executors.run_io(run_transformation, df, code)
+            return result_df, error, ""
+        encoded = await executors.run_io(encode_frame, df)
+        encoded_result, error, stdout = await self.call(_transform_task, code, encoded)
+        result_df = await executors.run_io(decode_frame, encoded_result) if encoded_result is not None else None
+        return result_df, error, stdout
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "alive": sum(1 for w in self._all if w.process.is_alive()),
+                "idle": self._idle.qsize() if self._idle is not None else 0, "timeouts": self.timeouts,
+                "restarts": self.restarts, "timeout_seconds": self.timeout_seconds, "memory_mb": self.memory_mb}
+
+sandbox_pool = SandboxPool.from_env()
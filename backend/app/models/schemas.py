@@ -28,3 +28,15 @@ class StreamCRequest(BaseModel):
 class StreamDRequest(BaseModel):
     query: str
     filename: str
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: str  # "queued", "running", "succeeded", "failed" or "cancelled"
+    filename: Optional[str] = None
+    stream_used: Optional[str] = None
+    priority: Optional[int] = None
+    created_at: Optional[float] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    data: Optional[Any] = None
+    error: Optional[str] = None
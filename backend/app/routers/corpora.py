@@ -0,0 +1,94 @@
+import json
+import asyncio
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from typing import List, Optional
+from app.services.corpus import corpus_indexer
+
+router = APIRouter()
+
+def _parse_json_object(value: Optional[str], field: str) -> Optional[dict]:
+    if not value:
+        return None
+    try:
+        parsed = json.loads(value)
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON in '{field}': {e}")
+    if not isinstance(parsed, dict):
+        raise HTTPException(status_code=400, detail=f"'{field}' must be a JSON object.")
+    return parsed
+
+@router.get("")
+async def list_corpora():
+    return {"stats": corpus_indexer.stats(), "corpora": await corpus_indexer.list_corpora()}
+
+@router.post("/{name}/documents", status_code=202)
+async def add_documents(
+    name: str,
+    files: List[UploadFile] = File(...),
+    metadata: Optional[str] = Form(None),
+    document_id: Optional[str] = Form(None)
+):
+    """
+    Adds or replaces documents in a corpus (created on first use). Returns immediately;
+    indexing runs in the background, so poll GET /corpora/{name}/documents for status.
+    `metadata` is a JSON object attached to every chunk and usable in query filters.
+    `document_id` defaults to the filename and can only be set for single-file uploads.
+    """
+    metadata = _parse_json_object(metadata, "metadata")
+    if document_id and len(files) > 1:
+        raise HTTPException(status_code=400, detail="document_id can only be set when uploading a single file.")
+    documents = []
+    for file in files:
+        content = await file.read()
+        try:
+            documents.append(await corpus_indexer.add_document(name, file.filename, content, document_id, metadata))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except asyncio.QueueFull:
+            raise HTTPException(status_code=429, detail="Corpus indexing queue is full.")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    return {"corpus": name, "documents": documents}
+
+@router.get("/{name}/documents")
+async def list_documents(name: str):
+    corpus = await corpus_indexer.get_corpus(name)
+    if corpus is None:
+        raise HTTPException(status_code=404, detail="Corpus not found.")
+    return {"corpus": corpus, "documents": await corpus_indexer.list_documents(name)}
+
+@router.delete("/{name}/documents/{document_id}")
+async def remove_document(name: str, document_id: str):
+    if not await corpus_indexer.remove_document(name, document_id):
+        raise HTTPException(status_code=404, detail="Document not found.")
+    return {"status": "deleted", "corpus": name, "document_id": document_id}
+
+@router.delete("/{name}")
+async def drop_corpus(name: str):
+    if not await corpus_indexer.drop_corpus(name):
+        raise HTTPException(status_code=404, detail="Corpus not found.")
+    return {"status": "deleted", "corpus": name}
+
+@router.post("/{name}/query")
+async def query_corpus(
+    name: str,
+    query: str = Form(...),
+    where: Optional[str] = Form(None),
+    n_results: int = Form(5),
+    answer: bool = Form(True)
+):
+    """
+    Answers a query from the closest chunks across every document in the corpus.
+    `where` is a JSON metadata filter, e.g. {"domain": "lease"} or {"year": {"$gte": 2023}}.
+    """
+    where = _parse_json_object(where, "where")
+    if not 1 <= n_results <= 50:
+        raise HTTPException(status_code=400, detail="n_results must be between 1 and 50.")
+    try:
+        return await corpus_indexer.query(name, query, where, n_results, answer)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Corpus not found.")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
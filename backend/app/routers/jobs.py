@@ -0,0 +1,53 @@
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Query
+from typing import Optional
+from app.models.schemas import JobResponse
+from app.core.document import ParsedDocument
+from app.services.jobs import job_manager, QueueFullError
+
+router = APIRouter()
+
+@router.post("/orchestrate", response_model=JobResponse, status_code=202)
+async def submit_orchestrate_job(
+    file: UploadFile = File(...),
+    instruction: Optional[str] = Form(None),
+    query: Optional[str] = Form(None),
+    extraction_schema: Optional[str] = Form(None),
+    no_cache: bool = Form(False),
+    priority: Optional[int] = Form(None)
+):
+    """
+    Job mode for /process/orchestrate: returns a job id immediately.
+    Poll GET /jobs/{job_id} (optionally with ?wait=seconds) for status and result.
+    """
+    content = await file.read()
+    document = ParsedDocument(content, file.filename)
+    try:
+        job = await job_manager.submit(document, instruction, query, extraction_schema, no_cache, priority)
+    except QueueFullError as e:
+        document.close()
+        raise HTTPException(status_code=429, detail=str(e))
+    except Exception as e:
+        document.close()
+        raise HTTPException(status_code=500, detail=str(e))
+    return job.to_dict()
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, wait: float = Query(0, ge=0, le=60)):
+    """
+    Job status and result. With `wait`, long-polls up to that many seconds for completion.
+    """
+    job = await job_manager.wait(job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired.")
+    return job.to_dict()
+
+@router.delete("/{job_id}", response_model=JobResponse)
+async def cancel_job(job_id: str):
+    job = await job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired.")
+    return job.to_dict()
+
+@router.get("")
+async def list_jobs():
+    return {"stats": job_manager.stats(), "jobs": job_manager.list_jobs()}
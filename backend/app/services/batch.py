@@ -0,0 +1,147 @@
+import io
+import os
+import time
+import asyncio
+import zipfile
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from app.core.document import ParsedDocument
+from app.core.gatekeeper import gatekeeper
+from app.services.orchestrator import run_stream, log_orchestration
+
+MAX_BATCH_FILES = int(os.getenv("BATCH_MAX_FILES", "1000"))
+# Upper bound on the decompressed size of every archive member in one batch
+MAX_UNCOMPRESSED_BYTES = int(float(os.getenv("BATCH_MAX_UNCOMPRESSED_MB", "1024")) * 1024 * 1024)
+
+
+def _parse_limits(spec: str) -> Dict[str, int]:
+    # e.g. "A:4,B:8,C:4,D:4"
+    return {stream.strip(): int(value) for stream, value in (item.split(":") for item in spec.split(",") if item)}
+
+# Per-stream caps inside a batch; Azure-bound streams (C/D) are kept lower than PyMuPDF-only Stream B
+STREAM_CONCURRENCY = _parse_limits(os.getenv("BATCH_STREAM_CONCURRENCY", "A:4,B:8,C:4,D:4"))
+
+
+def expand_uploads(uploads: Iterable[Tuple[str, bytes]]) -> List[Tuple[str, bytes]]:
+    """
+    Blocking: flattens uploaded files, expanding .zip archives into their member files.
+    File count and total uncompressed size are checked from the archive directory before
+    any member is decompressed, so a zip bomb is rejected without being inflated.
+    """
+    files = []
+    uncompressed = 0
+    for filename, content in uploads:
+        if not filename.lower().endswith(".zip"):
+            files.append((filename, content))
+            if len(files) > MAX_BATCH_FILES:
+                raise ValueError(f"Batch exceeds the limit of {MAX_BATCH_FILES} documents.")
+            continue
+        try:
+            archive = zipfile.ZipFile(io.BytesIO(content))
+        except zipfile.BadZipFile as e:
+            raise ValueError(f"{filename} is not a valid zip archive: {e}")
+        with archive:
+            members = []
+            for member in archive.infolist():
+                name = member.filename
+                if member.is_dir() or name.startswith("__MACOSX/") or os.path.basename(name).startswith("."):
+                    continue
+                members.append(member)
+                uncompressed += member.file_size
+                if len(files) + len(members) > MAX_BATCH_FILES:
+                    raise ValueError(f"Batch exceeds the limit of {MAX_BATCH_FILES} documents.")
+                if uncompressed > MAX_UNCOMPRESSED_BYTES:
+                    raise ValueError(f"Archive contents exceed the limit of {MAX_UNCOMPRESSED_BYTES // 2**20} MB uncompressed.")
+            for member in members:
+                # Never inflate past the size the directory declared
+                with archive.open(member) as f:
+                    data = f.read(member.file_size + 1)
+                if len(data) > member.file_size:
+                    raise ValueError(f"{member.filename} is larger than its declared size.")
+                files.append((member.filename, data))
+    return files
+
+
+async def run_batch(uploads: List[Tuple[str, bytes]], instruction: Optional[str] = None, query: Optional[str] = None,
+                    extraction_schema: Optional[str] = None, concurrency: int = 8) -> AsyncIterator[dict]:
+    """
+    Routes every document, groups them by stream and processes them with bounded
+    concurrency (overall and per stream). Yields one record per document as soon
+    as it finishes, then a summary with throughput stats.
+    Identical files in the batch share one parse and one stream run.
+    """
+    start_time = time.time()
+
+    # Parse each distinct payload once, however many times it appears in the batch
+    documents: Dict[str, ParsedDocument] = {}
+    entries = []
+    for filename, content in uploads:
+        document = ParsedDocument(content, filename)
+        key = f"{os.path.splitext(filename)[1].lower()}:{document.sha256}"
+        entries.append((filename, key))
+        documents.setdefault(key, document)
+
+    routes = await asyncio.gather(*(gatekeeper.route(document) for document in documents.values()))
+    stream_of = dict(zip(documents.keys(), routes))
+
+    overall = asyncio.Semaphore(max(1, concurrency))
+    per_stream = {stream: asyncio.Semaphore(STREAM_CONCURRENCY.get(stream, concurrency)) for stream in set(routes)}
+
+    async def process(key: str):
+        stream_type = stream_of[key]
+        async with per_stream[stream_type], overall:
+            started = time.time()
+            try:
+                result = await run_stream(stream_type, documents[key], instruction, query, extraction_schema)
+                status = "success" if not (isinstance(result, dict) and result.get("status") == "error") else "error"
+                return key, status, result, None, started
+            except Exception as e:
+                return key, "error", None, str(e), started
+
+    # Schedule stream by stream so documents of one stream run together
+    keys_by_stream: Dict[str, List[str]] = {}
+    for key, stream_type in stream_of.items():
+        keys_by_stream.setdefault(stream_type, []).append(key)
+    tasks = [asyncio.create_task(process(key)) for stream in sorted(keys_by_stream) for key in keys_by_stream[stream]]
+
+    filenames_by_key: Dict[str, List[str]] = {}
+    for filename, key in entries:
+        filenames_by_key.setdefault(key, []).append(filename)
+
+    counts = {"success": 0, "error": 0}
+    by_stream: Dict[str, int] = {}
+    try:
+        for finished in asyncio.as_completed(tasks):
+            key, status, result, error, started = await finished
+            stream_type = stream_of[key]
+            elapsed = time.time() - started
+            for filename in filenames_by_key[key]:
+                counts[status] += 1
+                by_stream[stream_type] = by_stream.get(stream_type, 0) + 1
+                log_orchestration(filename, stream_type, started)
+                yield {
+                    "type": "result",
+                    "filename": filename,
+                    "stream_used": stream_type,
+                    "status": status,
+                    "elapsed_seconds": round(elapsed, 3),
+                    "data": result,
+                    "error": error,
+                }
+    finally:
+        for task in tasks:
+            task.cancel()
+        for document in documents.values():
+            document.close()
+
+    total_elapsed = time.time() - start_time
+    yield {
+        "type": "summary",
+        "documents": len(entries),
+        "unique_documents": len(documents),
+        "succeeded": counts["success"],
+        "failed": counts["error"],
+        "by_stream": by_stream,
+        "elapsed_seconds": round(total_elapsed, 3),
+        "documents_per_second": round(len(entries) / total_elapsed, 3) if total_elapsed > 0 else None,
+    }
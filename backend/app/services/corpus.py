@@ -0,0 +1,239 @@
+import os
+import uuid
+import asyncio
+import hashlib
+from typing import Dict, List, Optional
+
+from app.core.document import ParsedDocument
+from app.core.executors import executors
+from app.streams import stream_d as stream_d_module
+from app.streams.chunking import batched, iter_chunks
+from app.streams.corpus import RESERVED_KEYS, CorpusStore
+from app.streams.stream_d import stream_d
+
+QUEUED = "queued"
+INDEXING = "indexing"
+INDEXED = "indexed"
+FAILED = "failed"
+
+
+class CorpusIndexer:
+    """
+    Background indexing and querying for named Stream D corpora.
+    add_document() records the upload and returns at once; worker tasks then extract,
+    chunk and reconcile it against the chunks already stored for that document id:
+    only chunks with new text are embedded, stale ones are deleted, and unchanged
+    ones only get their metadata refreshed.
+    """
+
+    def __init__(self, workers: int = 2, max_queue: int = 1000):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._store: Optional[CorpusStore] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # One reconcile at a time per (corpus, document id)
+        self._document_locks: Dict[tuple, asyncio.Lock] = {}
+
+    @classmethod
+    def from_env(cls) -> "CorpusIndexer":
+        return cls(
+            workers=int(os.getenv("CORPUS_WORKERS", "2")),
+            max_queue=int(os.getenv("CORPUS_MAX_QUEUE", "1000")),
+        )
+
+    @property
+    def store(self) -> CorpusStore:
+        """
+        Blocking on first access (opens SQLite and Chroma); async code uses get_store().
+        """
+        if self._store is None:
+            self._store = CorpusStore.from_env()
+        return self._store
+
+    async def get_store(self) -> CorpusStore:
+        return self._store or await executors.run_io(lambda: self.store)
+
+    # --- lifecycle ---
+
+    async def start(self):
+        self._ensure_started()
+
+    def _ensure_started(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+        if not self._tasks:
+            self._tasks = [asyncio.get_running_loop().create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def join(self):
+        """
+        Waits until every queued document has been processed.
+        """
+        if self._queue is not None:
+            await self._queue.join()
+
+    # --- public API ---
+
+    async def add_document(self, corpus: str, filename: str, content: bytes, document_id: Optional[str] = None,
+                           metadata: Optional[dict] = None) -> dict:
+        """
+        Queues a document for (re)indexing. Re-adding identical bytes with identical metadata is a no-op.
+        Raises ValueError for invalid names or metadata and asyncio.QueueFull when the queue is at capacity.
+        """
+        self._ensure_started()
+        metadata = self._clean_metadata(metadata or {})
+        document_id = document_id or filename
+        store = await self.get_store()
+        if await executors.run_io(store.get, corpus) is None:
+            await executors.run_io(store.create, corpus, stream_d_module.EMBEDDING_BACKEND == "local")
+
+        sha256 = hashlib.sha256(content).hexdigest()
+        existing = await executors.run_io(store.document, corpus, document_id)
+        if existing and existing["status"] in (QUEUED, INDEXING, INDEXED) \
+                and existing["sha256"] == sha256 and existing["metadata"] == metadata:
+            return existing
+
+        # The row goes first: a worker that picks the job up must already see its revision
+        revision = uuid.uuid4().hex
+        await executors.run_io(store.set_document, corpus, document_id, filename=filename, sha256=sha256,
+                               metadata=metadata, revision=revision, status=QUEUED, error=None)
+        try:
+            self._queue.put_nowait((corpus, document_id, filename, content, metadata, revision))
+        except asyncio.QueueFull:
+            if existing is None:
+                await executors.run_io(store.delete_document, corpus, document_id)
+            else:
+                await executors.run_io(store.set_document, corpus, document_id,
+                                       **{key: existing[key] for key in ("filename", "sha256", "metadata", "revision",
+                                                                         "status", "error")})
+            raise
+        return await executors.run_io(store.document, corpus, document_id)
+
+    async def list_corpora(self) -> List[dict]:
+        return await executors.run_io((await self.get_store()).list_corpora)
+
+    async def get_corpus(self, corpus: str) -> Optional[dict]:
+        return await executors.run_io((await self.get_store()).get, corpus)
+
+    async def list_documents(self, corpus: str) -> List[dict]:
+        return await executors.run_io((await self.get_store()).list_documents, corpus)
+
+    async def drop_corpus(self, corpus: str) -> bool:
+        store = await self.get_store()
+        if await executors.run_io(store.get, corpus) is None:
+            return False
+        await executors.run_io(store.drop, corpus)
+        return True
+
+    async def remove_document(self, corpus: str, document_id: str) -> bool:
+        store = await self.get_store()
+        if await executors.run_io(store.document, corpus, document_id) is None:
+            return False
+        async with self._lock_for(corpus, document_id):
+            await executors.run_io(store.delete_document, corpus, document_id)
+        return True
+
+    async def query(self, corpus: str, query: str, where: Optional[dict] = None, n_results: int = 5,
+                    answer: bool = True) -> dict:
+        """
+        Retrieves the closest chunks across the corpus (optionally filtered by metadata)
+        and answers from them with the Stream D prompt.
+        """
+        store = await self.get_store()
+        info = await executors.run_io(store.get, corpus)
+        if info is None:
+            raise KeyError(f"Corpus '{corpus}' does not exist.")
+        query_embeddings = None
+        if info["embeddings"] == "external":
+            query_embeddings = await stream_d.openai.get_embeddings([query])
+        matches = (await executors.run_io(store.query, corpus, [query], query_embeddings, n_results, where))[0]
+        result = {"status": "success", "matches": matches}
+        if answer:
+            result["answer"] = await stream_d.answer(query, [match["text"] for match in matches]) if matches else None
+        return result
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "queue_depth": self._queue.qsize() if self._queue is not None else 0}
+
+    # --- workers ---
+
+    @staticmethod
+    def _clean_metadata(metadata: dict) -> dict:
+        cleaned = {}
+        for key, value in metadata.items():
+            if key in RESERVED_KEYS:
+                raise ValueError(f"Metadata key '{key}' is reserved.")
+            if not isinstance(value, (str, int, float, bool)):
+                raise ValueError(f"Metadata value for '{key}' must be a string, number or boolean.")
+            cleaned[str(key)] = value
+        return cleaned
+
+    def _lock_for(self, corpus: str, document_id: str) -> asyncio.Lock:
+        return self._document_locks.setdefault((corpus, document_id), asyncio.Lock())
+
+    async def _worker(self):
+        while True:
+            item = await self._queue.get()
+            corpus, document_id = item[0], item[1]
+            try:
+                async with self._lock_for(corpus, document_id):
+                    await self._index(*item)
+            except Exception as e:
+                print(f"Corpus indexing failed for {corpus}/{document_id}: {e}")
+                await self._set_if_current(corpus, document_id, item[5], status=FAILED, error=str(e))
+            finally:
+                self._queue.task_done()
+
+    async def _is_current(self, corpus: str, document_id: str, revision: str) -> bool:
+        current = await executors.run_io(self.store.document, corpus, document_id)
+        return current is not None and current["revision"] == revision
+
+    async def _set_if_current(self, corpus: str, document_id: str, revision: str, **fields):
+        if await self._is_current(corpus, document_id, revision):
+            await executors.run_io(self.store.set_document, corpus, document_id, **fields)
+
+    async def _index(self, corpus: str, document_id: str, filename: str, content: bytes, metadata: dict, revision: str):
+        # Superseded by a newer upload or removed while queued
+        if not await self._is_current(corpus, document_id, revision):
+            return
+        await executors.run_io(self.store.set_document, corpus, document_id, status=INDEXING)
+        local = (await executors.run_io(self.store.get, corpus))["embeddings"] == "local"
+
+        with ParsedDocument(content, filename) as document:
+            text = await stream_d.extract_markdown(document.content, filename, document.sha256)
+        if text.startswith("Error: Could not extract"):
+            raise ValueError(text)
+
+        # Chunk ids come from the chunk text, so unchanged chunks map onto the stored ones
+        ids, chunks, metadatas, seen = [], [], [], {}
+        for position, chunk in enumerate(iter_chunks(text, stream_d_module.CHUNK_TOKENS, stream_d_module.CHUNK_OVERLAP)):
+            chunk_hash = hashlib.sha256(chunk.encode()).hexdigest()[:16]
+            seen[chunk_hash] = seen.get(chunk_hash, -1) + 1
+            suffix = f"-{seen[chunk_hash]}" if seen[chunk_hash] else ""
+            ids.append(f"{document_id}:{chunk_hash}{suffix}")
+            chunks.append(chunk)
+            metadatas.append({**metadata, "document_id": document_id, "filename": filename,
+                              "chunk": position, "chunk_hash": chunk_hash})
+
+        existing = set(await executors.run_io(self.store.existing_chunks, corpus, document_id))
+        new = [i for i, chunk_id in enumerate(ids) if chunk_id not in existing]
+        for batch in batched(new, stream_d_module.INDEX_BATCH_SIZE):
+            batch_chunks = [chunks[i] for i in batch]
+            embeddings = None if local else await stream_d.openai.get_embeddings(batch_chunks)
+            await executors.run_io(self.store.upsert_chunks, corpus, [ids[i] for i in batch], batch_chunks,
+                                   [metadatas[i] for i in batch], embeddings)
+        reused = [i for i, chunk_id in enumerate(ids) if chunk_id in existing]
+        await executors.run_io(self.store.update_metadatas, corpus, [ids[i] for i in reused], [metadatas[i] for i in reused])
+        stale = list(existing - set(ids))
+        await executors.run_io(self.store.delete_chunks, corpus, stale)
+
+        await self._set_if_current(corpus, document_id, revision, status=INDEXED, error=None, chunk_count=len(ids))
+        print(f"Corpus {corpus}: indexed {document_id} ({len(new)} new, {len(reused)} reused, {len(stale)} removed chunks)")
+
+corpus_indexer = CorpusIndexer.from_env()
@@ -0,0 +1,324 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import threading
+import itertools
+from typing import Dict, List, Optional
+
+from app.core.document import ParsedDocument
+from app.core.executors import executors
+from app.core.gatekeeper import gatekeeper
+from app.clients.llm_cache import llm_cache_bypass
+from app.services.orchestrator import run_stream, log_orchestration
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, job_id: str, filename: str, stream_type: str, priority: int, params: dict,
+                 no_cache: bool = False, created_at: Optional[float] = None):
+        self.id = job_id
+        self.filename = filename
+        self.stream_type = stream_type
+        self.priority = priority
+        self.params = params
+        self.no_cache = no_cache
+        self.status = QUEUED
+        self.result = None
+        self.error: Optional[str] = None
+        self.created_at = created_at or time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.done = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def to_dict(self, include_result: bool = True) -> dict:
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "filename": self.filename,
+            "stream_used": self.stream_type,
+            "priority": self.priority,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+        if include_result:
+            data["data"] = self.result
+        return data
+
+
+class JobManager:
+    """
+    In-process job queue for /process/orchestrate.
+    Documents are routed at submission so each job gets its stream's priority
+    (lower runs first), then wait in a bounded priority queue for one of
+    `workers` worker tasks. With a `db_path`, jobs and their documents are also
+    kept in SQLite so queued work and results survive a restart; no external
+    broker is needed.
+    """
+
+    def __init__(self, workers: int = 4, max_queue: int = 100, priorities: Optional[Dict[str, int]] = None,
+                 ttl_seconds: float = 3600, db_path: Optional[str] = None):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.priorities = priorities or {"B": 0, "C": 1, "D": 1, "A": 2}
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._jobs: Dict[str, Job] = {}
+        self._documents: Dict[str, ParsedDocument] = {}
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._workers: List[asyncio.Task] = []
+        self._started = False
+        self._seq = itertools.count()
+        # Slots held by submissions still being routed, so concurrent submits cannot overshoot max_queue
+        self._reserved = 0
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "JobManager":
+        priorities = None
+        if os.getenv("JOB_STREAM_PRIORITY"):
+            # e.g. "B:0,C:1,D:1,A:2"
+            priorities = {
+                stream.strip(): int(value)
+                for stream, value in (item.split(":") for item in os.getenv("JOB_STREAM_PRIORITY").split(","))
+            }
+        return cls(
+            workers=int(os.getenv("JOB_WORKERS", "4")),
+            max_queue=int(os.getenv("JOB_MAX_QUEUE", "100")),
+            priorities=priorities,
+            ttl_seconds=float(os.getenv("JOB_RESULT_TTL", "3600")),
+            db_path=os.getenv("JOB_DB") or None,
+        )
+
+    # --- lifecycle ---
+
+    async def start(self):
+        if self._started:
+            return
+        self._started = True
+        self._queue = asyncio.PriorityQueue()
+        if self.db_path:
+            await executors.run_io(self._connect)
+            await self._recover()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._started = False
+
+    @property
+    def queue_depth(self) -> int:
+        # Jobs still waiting to run; cancelled ones linger in the PriorityQueue until dequeued
+        return sum(1 for job in self._jobs.values() if job.status == QUEUED)
+
+    # --- public API ---
+
+    async def submit(self, document: ParsedDocument, instruction: Optional[str] = None, query: Optional[str] = None,
+                     extraction_schema: Optional[str] = None, no_cache: bool = False,
+                     priority: Optional[int] = None) -> Job:
+        """
+        Routes the document and enqueues it. Raises QueueFullError when the queue is at capacity.
+        """
+        await self.start()
+        self._prune()
+        if self.queue_depth + self._reserved >= self.max_queue:
+            raise QueueFullError(f"Job queue is full ({self.max_queue} pending jobs).")
+
+        self._reserved += 1
+        try:
+            stream_type = await gatekeeper.route(document)
+        finally:
+            self._reserved -= 1
+        # No await until the job is registered, so the slot passes straight to queue_depth
+        job = Job(
+            job_id=str(uuid.uuid4()),
+            filename=document.filename,
+            stream_type=stream_type,
+            priority=priority if priority is not None else self.priorities.get(stream_type, 1),
+            params={"instruction": instruction, "query": query, "extraction_schema": extraction_schema},
+            no_cache=no_cache,
+        )
+        self._jobs[job.id] = job
+        self._documents[job.id] = document
+        if self._db is not None:
+            await executors.run_io(self._persist, job, document.content)
+        self._queue.put_nowait((job.priority, next(self._seq), job.id))
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is None and self._db is not None:
+            job = await executors.run_io(self._load, job_id)
+        return job
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Job]:
+        """
+        Long-poll: returns once the job finishes or `timeout` seconds pass.
+        """
+        job = await self.get(job_id)
+        if job is not None and job.status not in FINISHED and timeout > 0:
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    async def cancel(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is None or job.status in FINISHED:
+            return job or await self.get(job_id)
+        if job.status == RUNNING and job.task is not None:
+            job.task.cancel()
+            await job.done.wait()
+        else:
+            # Still queued: the worker skips it when it is dequeued
+            await self._finish(job, CANCELLED)
+        return job
+
+    def list_jobs(self) -> List[dict]:
+        return [job.to_dict(include_result=False) for job in self._jobs.values()]
+
+    def stats(self) -> dict:
+        counts = {status: 0 for status in (QUEUED, RUNNING) + FINISHED}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return {"workers": self.workers, "queue_depth": self.queue_depth, "max_queue": self.max_queue, "jobs": counts}
+
+    # --- workers ---
+
+    async def _worker(self):
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            if job is None or job.status != QUEUED:
+                continue
+            job.status = RUNNING
+            job.started_at = time.time()
+            job.task = asyncio.create_task(self._execute(job))
+            try:
+                job.result = await asyncio.shield(job.task)
+                await self._finish(job, SUCCEEDED)
+                log_orchestration(job.filename, job.stream_type, job.started_at)
+            except asyncio.CancelledError:
+                if not job.task.cancelled():
+                    # The worker itself is shutting down; leave the job for recovery
+                    job.task.cancel()
+                    raise
+                await self._finish(job, CANCELLED)
+            except Exception as e:
+                job.error = str(e)
+                await self._finish(job, FAILED)
+
+    async def _execute(self, job: Job):
+        document = self._documents[job.id]
+        with llm_cache_bypass(job.no_cache):
+            return await run_stream(job.stream_type, document, **job.params)
+
+    async def _finish(self, job: Job, status: str):
+        job.status = status
+        job.finished_at = time.time()
+        job.done.set()
+        document = self._documents.pop(job.id, None)
+        if document is not None:
+            document.close()
+        if self._db is not None:
+            try:
+                await executors.run_io(self._update, job)
+            except Exception as e:
+                print(f"Non-fatal error persisting job {job.id}: {e}")
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl_seconds
+        for job_id in [j.id for j in self._jobs.values() if j.status in FINISHED and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    # --- optional SQLite persistence ---
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT, filename TEXT, stream TEXT, priority INTEGER, params TEXT, "
+            "no_cache INTEGER, content BLOB, result TEXT, error TEXT, "
+            "created_at REAL, started_at REAL, finished_at REAL)"
+        )
+        self._db.execute("DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                         (time.time() - self.ttl_seconds,))
+        self._db.commit()
+
+    def _persist(self, job: Job, content: bytes):
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO jobs (id, status, filename, stream, priority, params, no_cache, content, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.id, job.status, job.filename, job.stream_type, job.priority, json.dumps(job.params),
+                 int(job.no_cache), content, job.created_at),
+            )
+            self._db.commit()
+
+    def _update(self, job: Job):
+        with self._db_lock:
+            # The document is dropped once the job is finished
+            self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, started_at = ?, finished_at = ?, content = NULL "
+                "WHERE id = ?",
+                (job.status, json.dumps(job.result, default=str), job.error, job.started_at, job.finished_at, job.id),
+            )
+            self._db.commit()
+
+    def _load(self, job_id: str) -> Optional[Job]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT id, status, filename, stream, priority, params, no_cache, result, error, "
+                "created_at, started_at, finished_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job = Job(row[0], row[2], row[3], row[4], json.loads(row[5]), bool(row[6]), row[9])
+        job.status, job.error, job.started_at, job.finished_at = row[1], row[8], row[10], row[11]
+        job.result = json.loads(row[7]) if row[7] else None
+        if job.status in FINISHED:
+            job.done.set()
+        return job
+
+    def _pending(self) -> List[tuple]:
+        with self._db_lock:
+            return self._db.execute(
+                "SELECT id, content FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+            ).fetchall()
+
+    async def _recover(self):
+        """
+        Re-enqueues jobs that were queued or running when the process stopped.
+        """
+        for job_id, content in await executors.run_io(self._pending):
+            job = await executors.run_io(self._load, job_id)
+            job.status = QUEUED
+            job.started_at = None
+            self._jobs[job.id] = job
+            self._documents[job.id] = ParsedDocument(content, job.filename)
+            self._queue.put_nowait((job.priority, next(self._seq), job.id))
+
+job_manager = JobManager.from_env()
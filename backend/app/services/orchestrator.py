@@ -0,0 +1,48 @@
+import time
+from typing import Optional, Tuple
+from app.core.document import ParsedDocument
+from app.core.gatekeeper import gatekeeper
+from app.streams.stream_a import stream_a
+from app.streams.stream_b import stream_b
+from app.streams.stream_c import stream_c
+from app.streams.stream_d import stream_d
+from app.services.transaction_log import transaction_logger
+
+
+async def run_stream(stream_type: str, document: ParsedDocument, instruction: Optional[str] = None,
+                     query: Optional[str] = None, extraction_schema: Optional[str] = None) -> dict:
+    """
+    Dispatches an already-routed document to its stream.
+    """
+    if stream_type == "A":
+        # Pass schema as instruction if present
+        payload = extraction_schema or instruction or "Summarize data"
+        return await stream_a.process(document, payload)
+    elif stream_type == "B":
+        return await stream_b.process(document)
+    elif stream_type == "C":
+        payload = extraction_schema or query
+        return await stream_c.process(document, payload)
+    else:
+        payload = extraction_schema or query or "What is this document?"
+        return await stream_d.process(document, payload)
+
+
+def log_orchestration(filename: str, stream_type: str, start_time: float):
+    # In a real system, we'd calculate real token costs. For this simulation log, we assign standard hybrid vs baseline costs.
+    mock_cost = 0.25 if stream_type == "A" else 0.005
+    elapsed_time = time.time() - start_time
+    # Queue for the append-only transaction log (10,000 record cap)
+    transaction_logger.log(filename, stream_type, elapsed_time, mock_cost)
+
+
+async def orchestrate_document(document: ParsedDocument, instruction: Optional[str] = None,
+                               query: Optional[str] = None, extraction_schema: Optional[str] = None) -> Tuple[str, dict]:
+    """
+    Intelligent Orchestrator: routes via the Gatekeeper, runs the stream and logs the transaction.
+    """
+    start_time = time.time()
+    stream_type = await gatekeeper.route(document)
+    result = await run_stream(stream_type, document, instruction, query, extraction_schema)
+    log_orchestration(document.filename, stream_type, start_time)
+    return stream_type, result
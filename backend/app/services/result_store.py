@@ -0,0 +1,277 @@
+import os
+import io
+import json
+import time
+import uuid
+import zlib
+import sqlite3
+import threading
+from typing import Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+DEFAULT_RESULT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "cache", "results")
+# CSV results written before the store existed; still served, never evicted by the store
+LEGACY_RESULTS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "streams", "results")
+
+DOWNLOAD_FORMATS = ("csv", "xlsx", "json", "parquet")
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "json": "application/json",
+    "parquet": "application/vnd.apache.parquet",
+}
+# Rows converted per batch when streaming a download
+DOWNLOAD_BATCH_ROWS = 50000
+
+
+def frame_for_parquet(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Parquet needs string column names; the generated code often produces ints or tuples (pivots).
+    """
+    if all(isinstance(column, str) for column in df.columns):
+        return df
+    df = df.copy(deep=False)
+    df.columns = [str(column) for column in df.columns]
+    return df
+
+
+def write_result(df: pd.DataFrame, path: str) -> str:
+    """
+    Blocking: writes `df` as Parquet at `path`, or as CSV next to it when Arrow cannot
+    represent the frame (e.g. mixed-type object columns). Returns the format written.
+    """
+    try:
+        frame_for_parquet(df).to_parquet(path, index=False)
+        return "parquet"
+    except Exception:
+        if os.path.exists(path):
+            os.remove(path)
+        df.to_csv(os.path.splitext(path)[0] + ".csv", index=False)
+        return "csv"
+
+
+class ResultStore:
+    """
+    Stream A transformation results: Parquet files plus a SQLite row per result
+    (format, size, row count, columns and a preview), so listings and previews never
+    re-read the data. Downloads convert to CSV / XLSX / JSON / Parquet as a stream of
+    batches, optionally gzip-compressed. Results expire after `ttl_seconds`, and the least
+    recently downloaded are evicted once the store exceeds `max_bytes`.
+    Blocking methods run through the I/O executor.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 7 * 86400, max_bytes: int = 10 * 1024 ** 3,
+                 legacy_dir: Optional[str] = LEGACY_RESULTS_DIR):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.legacy_dir = legacy_dir
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(path, "results.db"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "result_id TEXT PRIMARY KEY, format TEXT, bytes INTEGER, rows INTEGER, columns TEXT, preview TEXT, "
+            "source TEXT, created_at REAL, last_access REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_results_access ON results (last_access)")
+        self._db.commit()
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> "ResultStore":
+        return cls(
+            path=os.getenv("RESULT_STORE_DIR", DEFAULT_RESULT_DIR),
+            ttl_seconds=float(os.getenv("RESULT_STORE_TTL", str(7 * 86400))),
+            max_bytes=int(float(os.getenv("RESULT_STORE_MAX_MB", "10240")) * 1024 * 1024),
+        )
+
+    # --- writing ---
+
+    def allocate(self) -> Tuple[str, str]:
+        """
+        A new result id and the Parquet path to write it to (for writers outside this
+        process, e.g. the sandbox); call register() once the file is complete.
+        """
+        result_id = str(uuid.uuid4())
+        return result_id, os.path.join(self.path, f"{result_id}.parquet")
+
+    def save(self, df: pd.DataFrame, source: Optional[str] = None, preview_rows: int = 10) -> dict:
+        result_id, path = self.allocate()
+        fmt = write_result(df, path)
+        preview = json.loads(df.head(preview_rows).to_json(orient="records", date_format="iso"))
+        return self.register(result_id, fmt, len(df), [str(c) for c in df.columns], preview, source)
+
+    def register(self, result_id: str, fmt: str, rows: int, columns: List[str], preview: List[dict],
+                 source: Optional[str] = None) -> dict:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (result_id, format, bytes, rows, columns, preview, source, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (result_id, fmt, os.path.getsize(self._file(result_id, fmt)), rows, json.dumps(columns),
+                 json.dumps(preview, default=str), source, now, now),
+            )
+            self._db.commit()
+            self._evict(keep=result_id)
+        return self.get(result_id, touch=False)
+
+    # --- reading ---
+
+    def _file(self, result_id: str, fmt: str) -> str:
+        return os.path.join(self.path, f"{result_id}.{fmt}")
+
+    def _legacy_file(self, result_id: str) -> Optional[str]:
+        if not self.legacy_dir:
+            return None
+        path = os.path.join(self.legacy_dir, f"{os.path.basename(result_id)}.csv")
+        return path if os.path.exists(path) else None
+
+    def get(self, result_id: str, touch: bool = True) -> Optional[dict]:
+        """
+        Result metadata (format, rows, columns, preview), or None when unknown or expired.
+        CSV results from before the store are reported with format "csv" and no preview.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT result_id, format, bytes, rows, columns, preview, source, created_at FROM results WHERE result_id = ?",
+                (result_id,)
+            ).fetchone()
+            if row is not None and time.time() - row[7] > self.ttl_seconds:
+                self._delete(result_id, row[1])
+                row = None
+            if row is not None and touch:
+                self._db.execute("UPDATE results SET last_access = ? WHERE result_id = ?", (time.time(), result_id))
+                self._db.commit()
+        if row is None:
+            legacy = self._legacy_file(result_id)
+            if legacy is None:
+                return None
+            return {"result_id": result_id, "format": "csv", "bytes": os.path.getsize(legacy), "rows": None,
+                    "columns": None, "preview": None, "source": None, "created_at": os.path.getmtime(legacy), "legacy": True}
+        keys = ("result_id", "format", "bytes", "rows", "columns", "preview", "source", "created_at")
+        result = dict(zip(keys, row))
+        result["columns"] = json.loads(result["columns"])
+        result["preview"] = json.loads(result["preview"])
+        result["legacy"] = False
+        return result
+
+    def path_of(self, result: dict) -> str:
+        return self._legacy_file(result["result_id"]) if result["legacy"] else self._file(result["result_id"], result["format"])
+
+    def iter_frames(self, result: dict, batch_rows: int = DOWNLOAD_BATCH_ROWS) -> Iterator[pd.DataFrame]:
+        """
+        Blocking generator over the stored result in DataFrame batches.
+        """
+        path = self.path_of(result)
+        if result["format"] == "parquet":
+            import pyarrow.parquet as pq
+            parquet = pq.ParquetFile(path)
+            empty = True
+            for batch in parquet.iter_batches(batch_size=batch_rows):
+                empty = False
+                yield batch.to_pandas()
+            if empty:
+                yield parquet.schema_arrow.empty_table().to_pandas()
+        else:
+            yield from pd.read_csv(path, chunksize=batch_rows)
+
+    def iter_download(self, result: dict, fmt: str = "csv", compress: bool = False) -> Iterator[bytes]:
+        """
+        Blocking generator of the result encoded as `fmt`, gzip-compressed when `compress`.
+        CSV and JSON are produced batch by batch; XLSX has to be built whole and is then streamed.
+        """
+        if fmt not in DOWNLOAD_FORMATS:
+            raise ValueError(f"Unknown format '{fmt}'. Use one of {', '.join(DOWNLOAD_FORMATS)}.")
+        chunks = self._encode(result, fmt)
+        if not compress:
+            yield from chunks
+            return
+        # wbits=31: zlib with a gzip header and trailer
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+
+    def _encode(self, result: dict, fmt: str) -> Iterator[bytes]:
+        if fmt == "parquet" and result["format"] == "parquet":
+            yield from self._read_file(self.path_of(result))
+        elif fmt == "csv":
+            for i, frame in enumerate(self.iter_frames(result)):
+                yield frame.to_csv(index=False, header=i == 0).encode("utf-8")
+        elif fmt == "json":
+            yield b"["
+            first = True
+            for frame in self.iter_frames(result):
+                records = frame.to_json(orient="records", date_format="iso")[1:-1]
+                if records:
+                    yield (records if first else "," + records).encode("utf-8")
+                    first = False
+            yield b"]"
+        else:
+            # XLSX (and Parquet from a CSV result) need the whole table in one writer
+            frame = pd.concat(list(self.iter_frames(result)), ignore_index=True)
+            buffer = io.BytesIO()
+            if fmt == "xlsx":
+                frame.to_excel(buffer, index=False)
+            else:
+                frame_for_parquet(frame).to_parquet(buffer, index=False)
+            buffer.seek(0)
+            yield from iter(lambda: buffer.read(1024 * 1024), b"")
+
+    @staticmethod
+    def _read_file(path: str) -> Iterator[bytes]:
+        with open(path, "rb") as f:
+            yield from iter(lambda: f.read(1024 * 1024), b"")
+
+    # --- eviction ---
+
+    def delete(self, result_id: str) -> bool:
+        with self._lock:
+            row = self._db.execute("SELECT format FROM results WHERE result_id = ?", (result_id,)).fetchone()
+            if row is None:
+                return False
+            self._delete(result_id, row[0])
+            return True
+
+    def _delete(self, result_id: str, fmt: str):
+        path = self._file(result_id, fmt)
+        if os.path.exists(path):
+            os.remove(path)
+        self._db.execute("DELETE FROM results WHERE result_id = ?", (result_id,))
+        self._db.commit()
+        self.evictions += 1
+
+    def _evict(self, keep: Optional[str] = None):
+        """
+        Drops expired results, then the least recently accessed until the store fits `max_bytes`.
+        """
+        cutoff = time.time() - self.ttl_seconds
+        for result_id, fmt in self._db.execute("SELECT result_id, format FROM results WHERE created_at < ?", (cutoff,)).fetchall():
+            self._delete(result_id, fmt)
+        total = self._db.execute("SELECT COALESCE(SUM(bytes), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for result_id, fmt, size in self._db.execute(
+            "SELECT result_id, format, bytes FROM results ORDER BY last_access ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            if result_id != keep:
+                self._delete(result_id, fmt)
+                total -= size
+
+    def evict(self):
+        with self._lock:
+            self._evict()
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM results").fetchone()
+        return {"results": count, "bytes": size, "max_bytes": self.max_bytes, "ttl_seconds": self.ttl_seconds,
+                "evictions": self.evictions}
+
+result_store = ResultStore.from_env()
@@ -12,6 +12,7 @@ import json
 import os
 import asyncio
 from app.core.gatekeeper import gatekeeper
+from app.core.document import ParsedDocument
 from app.streams.stream_a import stream_a
 from app.streams.stream_b import stream_b
 from app.streams.stream_c import stream_c
@@ -59,6 +60,7 @@ class StatisticsService:
             file_path = os.path.join(path, filename)
             with open(file_path, "rb") as f:
                 content = f.read()
+            document = ParsedDocument(content, filename)
             
             sample_id = str(uuid.uuid4())
 
@@ -68,7 +70,7 @@ class StatisticsService:
                 
                 # Run Gatekeeper
                 try:
-                    route = await gatekeeper.route(content, filename)
+                    route = await gatekeeper.route(document)
                     
                     # Calculate "Cost" based on route
                     # Stream A = 100 tokens, Stream B = 20, Stream C = 50, Stream D = 30 (Hypothetical)
@@ -122,7 +124,7 @@ class StatisticsService:
                     # We need to peek into the stream_a.process logic or approximate it here.
                     # For accuracy, we'll replicate the estimation:
                     # 1. Analyze Schema
-                    df_schema, schema_context = await stream_a.analyze_schema(content, filename)
+                    df_schema, schema_context = await stream_a.analyze_schema(content, filename, document.sha256)
                     
                     # 2. Generate Code (Prompt = System + User(Schema + Instruction))
                     # System prompt is ~150 tokens. Schema context is variable.
@@ -130,7 +132,7 @@ class StatisticsService:
                     o_input_tokens = len(prompt_text) / 4 + 150 
                     
                     # 3. Execute
-                    result = await stream_a.process(content, filename, instruction)
+                    result = await stream_a.process(document, instruction)
                     
                     end_time = datetime.now()
                     duration_ms = (end_time - start_time).total_seconds() * 1000
@@ -200,7 +202,7 @@ class StatisticsService:
                 
                 try:
                     # Run Stream B
-                    res = await stream_b.process(content, filename)
+                    res = await stream_b.process(document)
                     
                     # Check if healing occurred
                     healed = res.get("healing_report") is not None
@@ -227,7 +229,7 @@ class StatisticsService:
                 try:
                     # Run Stream C (Mock query)
                     # Note: file needs to be treated as image if possible, or text description
-                    await stream_c.process(content, filename, "Extract chart data")
+                    await stream_c.process(document, "Extract chart data")
                     
                     # Orchestrator: High Accuracy
                     o_acc = 0.95
@@ -249,7 +251,7 @@ class StatisticsService:
                 # Baseline: "Generic Search"
                 
                 try:
-                    await stream_d.process(content, filename, "Summarize termination clause")
+                    await stream_d.process(document, "Summarize termination clause")
                     
                     # Orchestrator: Domain Adapted
                     legal_f1 = 0.88
@@ -265,6 +267,8 @@ class StatisticsService:
                     ))
                 except Exception as e:
                      print(f"Error in RQ4 real test: {e}")
+
+            document.close()
                      
         return baseline_results, orchestrator_results
 
@@ -0,0 +1,197 @@
+import os
+import csv
+import time
+import random
+import asyncio
+import sqlite3
+import threading
+from typing import List, Optional
+
+from app.core.executors import executors
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))), "datasources", "Test", "Results")
+
+COLUMNS = ["document_id", "group", "accuracy", "cost", "time"]
+
+# Map the letter to the actual logic group for the dashboard
+GROUP_MAP = {
+    "A": "Baseline A (LLM)",
+    "B": "Hybrid",
+    "C": "Hybrid",
+    "D": "Hybrid"
+}
+
+
+class TransactionLogger:
+    """
+    Append-only log of orchestrator transactions.
+    Requests only enqueue a row; a background task appends rows in batches to a
+    SQLite (WAL) table, trims it to the newest `max_records` with a single range
+    delete, and periodically refreshes the CSV snapshot the dashboard reads.
+    """
+
+    def __init__(self, db_path: str, csv_path: str, max_records: int = 10000,
+                 batch_size: int = 200, flush_interval: float = 1.0, csv_export_interval: float = 30.0):
+        self.db_path = db_path
+        self.csv_path = csv_path
+        self.max_records = max_records
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.csv_export_interval = csv_export_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.RLock()
+        self._dirty = False
+        self._last_export = 0.0
+
+    @classmethod
+    def from_env(cls) -> "TransactionLogger":
+        results_dir = os.getenv("TRANSACTION_LOG_DIR", RESULTS_DIR)
+        return cls(
+            db_path=os.path.join(results_dir, "transactions.db"),
+            csv_path=os.path.join(results_dir, "rq1_data.csv"),
+            max_records=int(os.getenv("TRANSACTION_LOG_MAX_RECORDS", "10000")),
+            csv_export_interval=float(os.getenv("TRANSACTION_LOG_CSV_INTERVAL", "30")),
+        )
+
+    def _connect(self):
+        with self._db_lock:
+            if self._db is None:
+                self._open()
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS transactions ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, document_id TEXT, \"group\" TEXT, "
+            "accuracy REAL, cost REAL, time REAL, logged_at REAL)"
+        )
+        self._db.commit()
+        # One-off import of the legacy CSV so dashboard history survives the switch
+        empty = self._db.execute("SELECT COUNT(*) FROM transactions").fetchone()[0] == 0
+        if empty and os.path.exists(self.csv_path):
+            with open(self.csv_path, newline="", encoding="utf-8") as f:
+                rows = [tuple(row.get(col) for col in COLUMNS) + (None,) for row in csv.DictReader(f)]
+            self._write_batch(rows[-self.max_records:])
+
+    def _write_batch(self, rows: List[tuple]):
+        with self._db_lock:
+            self._connect()
+            self._db.executemany(
+                "INSERT INTO transactions (document_id, \"group\", accuracy, cost, time, logged_at) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            # Enforce the record cap: ids are monotonic, so this is one range delete
+            self._db.execute(
+                "DELETE FROM transactions WHERE id <= (SELECT MAX(id) FROM transactions) - ?",
+                (self.max_records,),
+            )
+            self._db.commit()
+        self._dirty = True
+
+    def _export_csv(self):
+        """
+        Atomically rewrites the dashboard CSV from the table (off the request path).
+        """
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT document_id, \"group\", accuracy, cost, time FROM transactions ORDER BY id"
+            ).fetchall()
+        tmp_path = f"{self.csv_path}.tmp"
+        with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            writer.writerows(rows)
+        os.replace(tmp_path, self.csv_path)
+        self._dirty = False
+        self._last_export = time.time()
+
+    async def start(self):
+        self._ensure_started()
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            if self._queue is None:
+                self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """
+        Flushes everything still queued and writes a final CSV snapshot.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        rows = self._drain()
+        while rows:
+            await self._flush(rows)
+            rows = self._drain()
+        if self._dirty:
+            await executors.run_io(self._export_csv)
+
+    def log(self, filename: str, stream_type: str, elapsed_time: float, cost: float):
+        """
+        Enqueues one transaction. Never blocks the request.
+        """
+        group = GROUP_MAP.get(stream_type, "Hybrid")
+        # Generate generic mock accuracy based on stream for logging purposes
+        accuracy = random.randint(90, 100)
+        row = (filename, group, accuracy, cost, elapsed_time, time.time())
+
+        # Normally started by the lifespan; scripts start it on first use
+        self._ensure_started()
+        self._queue.put_nowait(row)
+
+    def _drain(self) -> List[tuple]:
+        rows = []
+        while self._queue is not None and not self._queue.empty() and len(rows) < self.batch_size:
+            rows.append(self._queue.get_nowait())
+        return rows
+
+    async def _flush(self, rows: List[tuple]):
+        if not rows:
+            return
+        try:
+            await executors.run_io(self._write_batch, rows)
+        except Exception as e:
+            print(f"Non-fatal error logging transactions: {e}")
+
+    async def _run(self):
+        await executors.run_io(self._connect)
+        while True:
+            try:
+                first = await asyncio.wait_for(self._queue.get(), timeout=self.flush_interval)
+                await self._flush([first] + self._drain())
+            except asyncio.TimeoutError:
+                pass
+            if self._dirty and time.time() - self._last_export >= self.csv_export_interval:
+                try:
+                    await executors.run_io(self._export_csv)
+                except Exception as e:
+                    print(f"Non-fatal error exporting transaction CSV: {e}")
+
+    def _read(self, limit: int) -> List[dict]:
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT document_id, \"group\", accuracy, cost, time FROM transactions ORDER BY id DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [dict(zip(COLUMNS, row)) for row in reversed(rows)]
+
+    async def read_records(self, limit: int = 10000) -> List[dict]:
+        """
+        Most recent transactions, oldest first (same columns as the dashboard CSV).
+        """
+        await executors.run_io(self._connect)
+        return await executors.run_io(self._read, limit)
+
+transaction_logger = TransactionLogger.from_env()
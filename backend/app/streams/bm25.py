@@ -0,0 +1,105 @@
+import re
+import math
+from collections import Counter
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.,'][a-z0-9]+)*")
+
+# Kept short on purpose: legal terms like "shall", "not", "any" carry meaning in contracts
+STOPWORDS = frozenset("a an and are as at be by for from in is it of on or that the this to was were with".split())
+
+# Longest first; a light suffix strip so "governed"/"governing" and "law"/"laws" match
+SUFFIXES = ("ations", "ation", "ating", "ated", "ates", "ings", "ing", "ies", "ate", "ed", "es", "s")
+
+
+def stem(token: str) -> str:
+    if not token.isalpha():
+        return token
+    for suffix in SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [stem(token) for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over the chunks of one document, stored as an inverted index
+    (term -> {chunk: term frequency}) so it can be built once at index time
+    and persisted alongside the vectors.
+    """
+
+    def __init__(self, postings: Dict[str, Dict[int, int]], lengths: Sequence[int], k1: float = 1.5, b: float = 0.75):
+        self.postings = postings
+        self.lengths = np.asarray(lengths, dtype=np.float32)
+        self.k1 = k1
+        self.b = b
+        self.avg_length = float(self.lengths.mean()) if len(self.lengths) else 0.0
+
+    @classmethod
+    def build(cls, chunks: Sequence[str]) -> "BM25Index":
+        index = cls({}, [])
+        index.extend(chunks)
+        return index
+
+    def extend(self, chunks: Sequence[str]):
+        """
+        Appends chunks (numbered after the existing ones), so the index can be built batch by batch.
+        """
+        lengths = self.lengths.tolist()
+        for chunk in chunks:
+            counts = Counter(tokenize(chunk))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, {})[len(lengths)] = tf
+            lengths.append(sum(counts.values()))
+        self.lengths = np.asarray(lengths, dtype=np.float32)
+        self.avg_length = float(self.lengths.mean()) if len(self.lengths) else 0.0
+
+    def to_dict(self) -> dict:
+        return {"postings": self.postings, "lengths": self.lengths.astype(int).tolist()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BM25Index":
+        # JSON turns the chunk keys into strings
+        postings = {term: {int(i): tf for i, tf in docs.items()} for term, docs in data["postings"].items()}
+        return cls(postings, data["lengths"])
+
+    def scores(self, query: str) -> np.ndarray:
+        n = len(self.lengths)
+        scores = np.zeros(n, dtype=np.float32)
+        if n == 0 or self.avg_length == 0:
+            return scores
+        norm = self.k1 * (1 - self.b + self.b * self.lengths / self.avg_length)
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            ids = np.fromiter(docs.keys(), dtype=np.int64, count=len(docs))
+            tf = np.fromiter(docs.values(), dtype=np.float32, count=len(docs))
+            scores[ids] += idf * tf * (self.k1 + 1) / (tf + norm[ids])
+        return scores
+
+    def top_k(self, query: str, k: int) -> List[int]:
+        """
+        Chunk indices by descending score; chunks sharing no term with the query are left out.
+        """
+        scores = self.scores(query)
+        order = np.argsort(-scores, kind="stable")[:k]
+        return [int(i) for i in order if scores[i] > 0]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = 60) -> List[int]:
+    """
+    Merges ranked lists: each item scores sum(1 / (k + rank)) over the lists it appears in.
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            fused[item] = fused.get(item, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused, key=lambda item: -fused[item])
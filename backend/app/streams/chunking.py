@@ -0,0 +1,152 @@
+import re
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# Approximates BPE tokens (words and punctuation marks) without needing a tokenizer model
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+SENTENCE_BREAK = re.compile(r"(?<=[.!?;:])\s+")
+
+
+def count_tokens(text: str) -> int:
+    return sum(1 for _ in TOKEN_PATTERN.finditer(text))
+
+
+def _tail(text: str, tokens: int) -> str:
+    """
+    The last `tokens` tokens of `text`, cut at a token boundary.
+    """
+    if tokens <= 0:
+        return ""
+    positions = [m.start() for m in TOKEN_PATTERN.finditer(text)]
+    if len(positions) <= tokens:
+        return text
+    return text[positions[-tokens]:]
+
+
+def _head(text: str, tokens: int) -> str:
+    """
+    The first `tokens` tokens of `text`, cut at a token boundary.
+    """
+    if tokens <= 0:
+        return ""
+    positions = [m.end() for m in TOKEN_PATTERN.finditer(text)]
+    if len(positions) <= tokens:
+        return text
+    return text[:positions[tokens - 1]]
+
+
+def fit_heading(heading: str, max_tokens: int) -> str:
+    """
+    Shortens a heading chain to at most `max_tokens` tokens: outer headings are dropped
+    first, keeping the most specific one, which is then truncated if still too long.
+    """
+    lines = heading.split("\n") if heading else []
+    while len(lines) > 1 and count_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return _head("\n".join(lines), max_tokens)
+
+
+def _iter_lines(text: str) -> Iterator[str]:
+    start = 0
+    while start < len(text):
+        end = text.find("\n", start)
+        if end == -1:
+            end = len(text)
+        yield text[start:end]
+        start = end + 1
+
+
+def iter_sections(text: str) -> Iterator[Tuple[str, str]]:
+    """
+    Yields (heading, paragraph) pairs, where heading is the chain of Markdown
+    headings above the paragraph (e.g. "# Agreement\\n## Termination").
+    """
+    headings: List[Tuple[int, str]] = []
+    paragraph: List[str] = []
+
+    def heading_path():
+        return "\n".join(f"{'#' * level} {title}" for level, title in headings)
+
+    for line in _iter_lines(text):
+        match = HEADING_PATTERN.match(line)
+        if match or not line.strip():
+            if paragraph:
+                yield heading_path(), "\n".join(paragraph)
+                paragraph = []
+            if match:
+                level = len(match.group(1))
+                headings = [h for h in headings if h[0] < level] + [(level, match.group(2))]
+            continue
+        paragraph.append(line)
+    if paragraph:
+        yield heading_path(), "\n".join(paragraph)
+
+
+def _split_long(paragraph: str, max_tokens: int) -> Iterator[str]:
+    """
+    Breaks a paragraph over the budget into sentences, and sentences over the budget into token windows.
+    """
+    if count_tokens(paragraph) <= max_tokens:
+        yield paragraph
+        return
+    for sentence in SENTENCE_BREAK.split(paragraph):
+        if count_tokens(sentence) <= max_tokens:
+            yield sentence
+            continue
+        positions = [m.start() for m in TOKEN_PATTERN.finditer(sentence)]
+        for i in range(0, len(positions), max_tokens):
+            end = positions[i + max_tokens] if i + max_tokens < len(positions) else len(sentence)
+            yield sentence[positions[i]:end].strip()
+
+
+def iter_chunks(text: str, max_tokens: int = 400, overlap: int = 50) -> Iterator[str]:
+    """
+    Streams chunks of at most `max_tokens` tokens. Paragraphs are packed together
+    within a Markdown section, each chunk is prefixed with its heading chain (shortened
+    to at most half the budget), and consecutive chunks of a section share `overlap`
+    tokens of context. A new heading always starts a new chunk.
+    """
+    overlap = max(0, min(overlap, max_tokens // 2))
+    section_key: Optional[str] = None
+    heading = ""
+    pieces: List[str] = []
+    size = 0
+
+    def render():
+        body = "\n\n".join(pieces)
+        return f"{heading}\n\n{body}" if heading else body
+
+    for section, paragraph in iter_sections(text):
+        if section != section_key:
+            if pieces:
+                yield render()
+            section_key, pieces, size = section, [], 0
+            heading = fit_heading(section, max_tokens // 2)
+        # The heading is repeated in every chunk, so it counts against the budget
+        budget = max_tokens - count_tokens(heading)
+        # Pieces leave room for the overlap carried into the next chunk
+        for piece in _split_long(paragraph, max(1, budget - overlap)):
+            tokens = count_tokens(piece)
+            if pieces and size + tokens > budget:
+                chunk_body = "\n\n".join(pieces)
+                yield render()
+                carry = _tail(chunk_body, overlap)
+                if carry and count_tokens(carry) + tokens <= budget:
+                    pieces, size = [carry], count_tokens(carry)
+                else:
+                    pieces, size = [], 0
+            pieces.append(piece)
+            size += tokens
+    if pieces:
+        yield render()
+
+
+def batched(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,184 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+import chromadb
+
+from app.clients.local_embeddings import LocalEmbeddingFunction
+
+DEFAULT_CORPUS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "cache", "corpora")
+
+CORPUS_NAME_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{2,62}$")
+
+# Chunk metadata keys set by the store; user metadata cannot override them
+RESERVED_KEYS = ("document_id", "filename", "chunk", "chunk_hash")
+
+
+class CorpusStore:
+    """
+    Named, persistent multi-document indexes for Stream D (one Chroma collection per corpus).
+    Chunk ids are "<document_id>:<chunk hash>", so re-adding a changed document only
+    embeds the chunks whose text changed; unchanged chunks keep their vectors.
+    A SQLite registry records each corpus's embedding space and each document's
+    indexing status. All methods are blocking; callers go through the I/O executor.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.chroma = chromadb.PersistentClient(path=path)
+        self._collections: Dict[str, chromadb.Collection] = {}
+        self._lock = threading.Lock()
+        self._registry = sqlite3.connect(os.path.join(path, "corpora.db"), check_same_thread=False)
+        self._registry.execute("CREATE TABLE IF NOT EXISTS corpora (name TEXT PRIMARY KEY, local INTEGER, created_at REAL)")
+        self._registry.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "corpus TEXT, document_id TEXT, filename TEXT, sha256 TEXT, metadata TEXT, revision TEXT, "
+            "status TEXT, error TEXT, chunk_count INTEGER, updated_at REAL, PRIMARY KEY (corpus, document_id))"
+        )
+        self._registry.commit()
+
+    @classmethod
+    def from_env(cls) -> "CorpusStore":
+        return cls(os.getenv("CORPUS_DIR", DEFAULT_CORPUS_DIR))
+
+    # --- corpora ---
+
+    def create(self, name: str, local: bool) -> dict:
+        """
+        Creates the corpus if needed. Its embedding space (external or local) is fixed at creation.
+        """
+        if not CORPUS_NAME_PATTERN.match(name):
+            raise ValueError("Corpus names are 3-63 letters, digits, '-' or '_'.")
+        with self._lock:
+            self._registry.execute("INSERT OR IGNORE INTO corpora (name, local, created_at) VALUES (?, ?, ?)",
+                                   (name, int(local), time.time()))
+            self._registry.commit()
+        return self.get(name)
+
+    def get(self, name: str) -> Optional[dict]:
+        with self._lock:
+            row = self._registry.execute("SELECT name, local, created_at FROM corpora WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                return None
+            documents, chunks = self._registry.execute(
+                "SELECT COUNT(*), COALESCE(SUM(chunk_count), 0) FROM documents WHERE corpus = ?", (name,)
+            ).fetchone()
+        return {"name": row[0], "embeddings": "local" if row[1] else "external", "created_at": row[2],
+                "documents": documents, "chunks": chunks}
+
+    def list_corpora(self) -> List[dict]:
+        with self._lock:
+            names = [r[0] for r in self._registry.execute("SELECT name FROM corpora ORDER BY name")]
+        return [self.get(name) for name in names]
+
+    def drop(self, name: str):
+        with self._lock:
+            self._collections.pop(name, None)
+            try:
+                self.chroma.delete_collection(f"corpus_{name}")
+            except Exception:
+                pass
+            self._registry.execute("DELETE FROM documents WHERE corpus = ?", (name,))
+            self._registry.execute("DELETE FROM corpora WHERE name = ?", (name,))
+            self._registry.commit()
+
+    def collection(self, name: str):
+        corpus = self.get(name)
+        if corpus is None:
+            raise KeyError(f"Corpus '{name}' does not exist.")
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                local = corpus["embeddings"] == "local"
+                collection = self.chroma.get_or_create_collection(
+                    name=f"corpus_{name}",
+                    embedding_function=LocalEmbeddingFunction.from_env() if local else None
+                )
+                self._collections[name] = collection
+        return collection
+
+    # --- documents ---
+
+    def set_document(self, name: str, document_id: str, **fields):
+        """
+        Inserts or updates a document's registry row (filename, sha256, metadata, revision, status, ...).
+        """
+        if "metadata" in fields:
+            fields["metadata"] = json.dumps(fields["metadata"] or {}, sort_keys=True)
+        fields["updated_at"] = time.time()
+        with self._lock:
+            self._registry.execute("INSERT OR IGNORE INTO documents (corpus, document_id) VALUES (?, ?)", (name, document_id))
+            assignments = ", ".join(f"{key} = ?" for key in fields)
+            self._registry.execute(f"UPDATE documents SET {assignments} WHERE corpus = ? AND document_id = ?",
+                                   (*fields.values(), name, document_id))
+            self._registry.commit()
+
+    def document(self, name: str, document_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._registry.execute(
+                "SELECT document_id, filename, sha256, metadata, revision, status, error, chunk_count, updated_at "
+                "FROM documents WHERE corpus = ? AND document_id = ?", (name, document_id)
+            ).fetchone()
+        return self._document_row(row) if row else None
+
+    def list_documents(self, name: str) -> List[dict]:
+        with self._lock:
+            rows = self._registry.execute(
+                "SELECT document_id, filename, sha256, metadata, revision, status, error, chunk_count, updated_at "
+                "FROM documents WHERE corpus = ? ORDER BY document_id", (name,)
+            ).fetchall()
+        return [self._document_row(row) for row in rows]
+
+    @staticmethod
+    def _document_row(row) -> dict:
+        keys = ("document_id", "filename", "sha256", "metadata", "revision", "status", "error", "chunk_count", "updated_at")
+        document = dict(zip(keys, row))
+        document["metadata"] = json.loads(document["metadata"]) if document["metadata"] else {}
+        return document
+
+    def delete_document(self, name: str, document_id: str):
+        self.collection(name).delete(where={"document_id": document_id})
+        with self._lock:
+            self._registry.execute("DELETE FROM documents WHERE corpus = ? AND document_id = ?", (name, document_id))
+            self._registry.commit()
+
+    # --- chunks ---
+
+    def existing_chunks(self, name: str, document_id: str) -> List[str]:
+        return self.collection(name).get(where={"document_id": document_id}, include=[])["ids"]
+
+    def upsert_chunks(self, name: str, ids: List[str], chunks: List[str], metadatas: List[dict], embeddings=None):
+        if embeddings is not None:
+            self.collection(name).upsert(ids=ids, documents=chunks, metadatas=metadatas, embeddings=embeddings)
+        else:
+            self.collection(name).upsert(ids=ids, documents=chunks, metadatas=metadatas)
+
+    def update_metadatas(self, name: str, ids: List[str], metadatas: List[dict]):
+        if ids:
+            self.collection(name).update(ids=ids, metadatas=metadatas)
+
+    def delete_chunks(self, name: str, ids: List[str]):
+        if ids:
+            self.collection(name).delete(ids=ids)
+
+    def query(self, name: str, query_texts: List[str], query_embeddings=None, n_results: int = 5,
+              where: Optional[dict] = None) -> List[List[dict]]:
+        """
+        Nearest chunks across the corpus per query, optionally filtered by chunk metadata
+        (Chroma `where` syntax, e.g. {"domain": "lease"} or {"year": {"$gte": 2023}}).
+        """
+        collection = self.collection(name)
+        kwargs = {"n_results": n_results, "where": where or None, "include": ["documents", "metadatas", "distances"]}
+        if query_embeddings is not None:
+            results = collection.query(query_embeddings=query_embeddings, **kwargs)
+        else:
+            results = collection.query(query_texts=query_texts, **kwargs)
+        return [
+            [{"text": text, "distance": distance, **metadata} for text, metadata, distance in zip(texts, metadatas, distances)]
+            for texts, metadatas, distances in zip(results["documents"], results["metadatas"], results["distances"])
+        ]
@@ -0,0 +1,189 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+import chromadb
+
+from app.clients.local_embeddings import LocalEmbeddingFunction
+from app.streams.bm25 import BM25Index
+from app.streams.retrievers import Retriever
+
+DEFAULT_INDEX_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "cache", "stream_d_index")
+
+# Bump when chunking or embedding changes so old vectors are not mixed with new ones
+INDEX_VERSION = "v3"
+
+
+class DocumentIndex(Retriever):
+    """
+    Persistent Chroma retriever for Stream D, keyed by document content hash.
+    A document is chunked, embedded and indexed once; later questions about the same
+    bytes only run the query, scoped to that document with a metadata filter.
+    A small SQLite registry tracks indexed documents for TTL / LRU eviction of whole documents,
+    and keeps each document's BM25 inverted index for keyword and hybrid retrieval.
+    Chunk ids are namespaced by document hash, so concurrent requests for different files
+    (even with the same filename) never share ids, and a document that is leased by an
+    in-flight request is never evicted under it.
+    All methods except lease() are blocking; Stream D calls them through the I/O executor.
+    Search itself (vector / BM25 / hybrid) is shared with the other retrievers.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 7 * 86400, max_documents: int = 1000,
+                 bm25_cache_size: int = 64):
+        super().__init__()
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_documents = max_documents
+        os.makedirs(path, exist_ok=True)
+        self.chroma = chromadb.PersistentClient(path=path)
+        # Documents embedded locally (the offline backend, or the fallback when the external
+        # call fails) live in their own collection, which embeds texts with the built-in
+        # hashing model instead of Chroma's downloaded default
+        self.collection = self.chroma.get_or_create_collection(
+            name=f"stream_d_documents_{INDEX_VERSION}", embedding_function=None
+        )
+        self.local_collection = self.chroma.get_or_create_collection(
+            name=f"stream_d_documents_{INDEX_VERSION}_local",
+            embedding_function=LocalEmbeddingFunction.from_env()
+        )
+        self._lock = threading.Lock()
+        self._registry = sqlite3.connect(os.path.join(path, "registry.db"), check_same_thread=False)
+        self._registry.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "doc_id TEXT PRIMARY KEY, filename TEXT, chunk_count INTEGER, local INTEGER, indexed_at REAL, last_access REAL)"
+        )
+        self._registry.execute("CREATE TABLE IF NOT EXISTS bm25 (doc_id TEXT PRIMARY KEY, data TEXT)")
+        self._registry.commit()
+        self._bm25: OrderedDict = OrderedDict()
+        self.bm25_cache_size = bm25_cache_size
+
+    @classmethod
+    def from_env(cls) -> "DocumentIndex":
+        return cls(
+            path=os.getenv("STREAM_D_INDEX_DIR", DEFAULT_INDEX_DIR),
+            ttl_seconds=float(os.getenv("STREAM_D_INDEX_TTL", str(7 * 86400))),
+            max_documents=int(os.getenv("STREAM_D_INDEX_MAX_DOCS", "1000")),
+        )
+
+    def has(self, doc_id: str) -> bool:
+        with self._lock:
+            row = self._registry.execute("SELECT indexed_at FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+            if row is None:
+                return False
+            if time.time() - row[0] > self.ttl_seconds and not self._is_leased(doc_id):
+                self._delete(doc_id)
+                return False
+            self._registry.execute("UPDATE documents SET last_access = ? WHERE doc_id = ?", (time.time(), doc_id))
+            self._registry.commit()
+            return True
+
+    def add_chunks(self, doc_id: str, filename: str, start: int, chunks: List[str], embeddings=None):
+        """
+        Stores one batch of chunks numbered from `start`. The document stays invisible
+        to has() until commit_document() registers it.
+        """
+        ids = [f"{doc_id}:{start + i}" for i in range(len(chunks))]
+        metadatas = [{"doc_id": doc_id, "chunk": start + i, "filename": filename} for i in range(len(chunks))]
+        if embeddings is not None:
+            self.collection.upsert(ids=ids, documents=chunks, embeddings=embeddings, metadatas=metadatas)
+        else:
+            self.local_collection.upsert(ids=ids, documents=chunks, metadatas=metadatas)
+
+    def commit_document(self, doc_id: str, filename: str, chunk_count: int, local: bool, bm25: BM25Index):
+        now = time.time()
+        with self._lock:
+            self._registry.execute("INSERT OR REPLACE INTO bm25 (doc_id, data) VALUES (?, ?)",
+                                   (doc_id, json.dumps(bm25.to_dict())))
+            self._remember_bm25(doc_id, bm25)
+            self._registry.execute(
+                "INSERT OR REPLACE INTO documents (doc_id, filename, chunk_count, local, indexed_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (doc_id, filename, chunk_count, int(local), now, now),
+            )
+            self._registry.commit()
+            self._evict()
+
+    def query(self, doc_id: str, query_embeddings=None, query_texts: Optional[List[str]] = None, n_results: int = 3) -> dict:
+        """
+        Nearest chunks of a single document. Documents indexed with Chroma's local
+        embedding function are searched by `query_texts`, the rest by `query_embeddings`.
+        """
+        with self._lock:
+            row = self._registry.execute("SELECT chunk_count, local FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"Document {doc_id} is not indexed.")
+        n_results = max(1, min(n_results, row[0]))
+        if row[1]:
+            return self.local_collection.query(query_texts=query_texts, n_results=n_results, where={"doc_id": doc_id})
+        if query_embeddings is None:
+            raise ValueError(f"Document {doc_id} was indexed with external embeddings; query embeddings are required.")
+        return self.collection.query(query_embeddings=query_embeddings, n_results=n_results, where={"doc_id": doc_id})
+
+    def _remember_bm25(self, doc_id: str, bm25: BM25Index):
+        self._bm25[doc_id] = bm25
+        self._bm25.move_to_end(doc_id)
+        while len(self._bm25) > self.bm25_cache_size:
+            self._bm25.popitem(last=False)
+
+    def bm25(self, doc_id: str) -> BM25Index:
+        with self._lock:
+            bm25 = self._bm25.get(doc_id)
+            if bm25 is None:
+                row = self._registry.execute("SELECT data FROM bm25 WHERE doc_id = ?", (doc_id,)).fetchone()
+                if row is None:
+                    raise KeyError(f"Document {doc_id} is not indexed.")
+                bm25 = BM25Index.from_dict(json.loads(row[0]))
+            self._remember_bm25(doc_id, bm25)
+            return bm25
+
+    def is_local(self, doc_id: str) -> bool:
+        with self._lock:
+            row = self._registry.execute("SELECT local FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+        return bool(row and row[0])
+
+    def chunks(self, doc_id: str, indices: List[int]) -> List[str]:
+        if not indices:
+            return []
+        collection = self.local_collection if self.is_local(doc_id) else self.collection
+        found = collection.get(ids=[f"{doc_id}:{i}" for i in indices], include=["documents"])
+        by_id = dict(zip(found["ids"], found["documents"]))
+        return [by_id[f"{doc_id}:{i}"] for i in indices if f"{doc_id}:{i}" in by_id]
+
+    def vector_rankings(self, doc_id: str, query_texts: List[str], query_embeddings, k: int) -> List[List[int]]:
+        results = self.query(doc_id, query_embeddings, query_texts, k)
+        return [[meta["chunk"] for meta in metas] for metas in results["metadatas"]]
+
+    def delete(self, doc_id: str):
+        with self._lock:
+            self._delete(doc_id)
+
+    def _delete(self, doc_id: str):
+        self.collection.delete(where={"doc_id": doc_id})
+        self.local_collection.delete(where={"doc_id": doc_id})
+        self._registry.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+        self._registry.execute("DELETE FROM bm25 WHERE doc_id = ?", (doc_id,))
+        self._bm25.pop(doc_id, None)
+        self._registry.commit()
+
+    def _evict(self):
+        """
+        Drops expired documents, then the least recently used beyond `max_documents`.
+        Leased documents are skipped and picked up by a later pass.
+        """
+        cutoff = time.time() - self.ttl_seconds
+        expired = [r[0] for r in self._registry.execute("SELECT doc_id FROM documents WHERE indexed_at < ?", (cutoff,))]
+        overflow = [r[0] for r in self._registry.execute(
+            "SELECT doc_id FROM documents ORDER BY last_access DESC LIMIT -1 OFFSET ?", (self.max_documents,)
+        )]
+        for doc_id in dict.fromkeys(expired + overflow):
+            if not self._is_leased(doc_id):
+                self._delete(doc_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            documents, chunks = self._registry.execute("SELECT COUNT(*), COALESCE(SUM(chunk_count), 0) FROM documents").fetchone()
+        return {"documents": documents, "chunks": chunks, "leased": self._leased_count(), "max_documents": self.max_documents, "ttl_seconds": self.ttl_seconds}
@@ -0,0 +1,246 @@
+import io
+import os
+import re
+import json
+import xml.etree.ElementTree as ET
+from typing import Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+# Excel engine: "auto" uses calamine (Rust, several times faster than openpyxl) when
+# python-calamine is installed and falls back to openpyxl otherwise
+EXCEL_ENGINE = os.getenv("STREAM_A_EXCEL_ENGINE", "auto")
+# Records flattened per json_normalize call when streaming JSON / NDJSON / XML
+RECORD_BATCH = 10000
+
+# Reader signature: (content, nrows, sheets) -> DataFrame; `sheets` only matters for workbooks
+Reader = Callable[[bytes, Optional[int], Optional[List[str]]], pd.DataFrame]
+READERS: Dict[str, Reader] = {}
+
+
+def register_reader(extensions, reader: Reader):
+    """
+    Registers `reader` for the given file extensions (".csv", ...), replacing any existing one.
+    """
+    for extension in extensions:
+        READERS[extension.lower()] = reader
+
+
+def supported_extensions() -> List[str]:
+    return sorted(READERS)
+
+
+def read_table(content: bytes, filename: str, nrows: Optional[int] = None,
+               sheets: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+    """
+    Blocking: parses the upload into one DataFrame, only the first `nrows` rows when given.
+    None for unsupported formats.
+    """
+    reader = READERS.get(os.path.splitext(filename)[1].lower())
+    if reader is None:
+        return None
+    return reader(content, nrows, sheets)
+
+
+# --- CSV ---
+
+def read_csv(content: bytes, nrows: Optional[int] = None, sheets=None) -> pd.DataFrame:
+    return pd.read_csv(io.BytesIO(content), nrows=nrows)
+
+
+# --- Excel ---
+
+def excel_engine() -> str:
+    if EXCEL_ENGINE != "auto":
+        return EXCEL_ENGINE
+    try:
+        import python_calamine  # noqa: F401
+        return "calamine"
+    except ImportError:
+        return "openpyxl"
+
+
+def sheet_names(content: bytes) -> List[str]:
+    """
+    Blocking: the workbook's sheet names, without loading any sheet data.
+    """
+    with pd.ExcelFile(io.BytesIO(content), engine=excel_engine()) as workbook:
+        return [str(name) for name in workbook.sheet_names]
+
+
+def referenced_sheets(names: List[str], instruction: str) -> List[str]:
+    """
+    Sheets the instruction names (case-insensitive, whole words), in workbook order.
+    "all sheets" / "every sheet" selects all of them; otherwise defaults to the first sheet.
+    """
+    if not names:
+        return []
+    text = instruction.lower()
+    if re.search(r"\b(all|every|each)\s+(the\s+)?(sheets?|tabs?|worksheets?)\b", text):
+        return list(names)
+    mentioned = [name for name in names
+                 if re.search(rf"(?<!\w){re.escape(name.lower())}(?!\w)", text)]
+    return mentioned or names[:1]
+
+
+def read_excel(content: bytes, nrows: Optional[int] = None, sheets: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Loads only `sheets` (default: the first one). Several sheets are stacked into one
+    table with a leading "sheet" column, so the generated code still sees a single `df`.
+    """
+    with pd.ExcelFile(io.BytesIO(content), engine=excel_engine()) as workbook:
+        sheets = sheets or [workbook.sheet_names[0]]
+        if len(sheets) == 1:
+            return workbook.parse(sheets[0], nrows=nrows)
+        frames = [workbook.parse(sheet, nrows=nrows).assign(sheet=str(sheet)) for sheet in sheets]
+    df = pd.concat(frames, ignore_index=True)
+    df = df[["sheet"] + [column for column in df.columns if column != "sheet"]]
+    return df.head(nrows) if nrows is not None else df
+
+
+def resolve_sheets(content: bytes, filename: str, instruction: str) -> Optional[List[str]]:
+    """
+    Blocking: the sheets to load for a workbook upload; None for other formats.
+    """
+    if READERS.get(os.path.splitext(filename)[1].lower()) is not read_excel:
+        return None
+    return referenced_sheets(sheet_names(content), instruction or "")
+
+
+# --- JSON / NDJSON ---
+
+def _iter_json_records(text: str, bounded: bool = True) -> Iterator[dict]:
+    """
+    Yields records one at a time from a top-level array, from NDJSON / concatenated
+    objects, or from the first list of objects inside a single top-level object
+    ({"data": [...]}), so a bounded read stops decoding after the rows it needs.
+    """
+    decoder = json.JSONDecoder()
+    end = len(text)
+    if not bounded and text.lstrip().startswith("["):
+        # Whole arrays decode faster in one call than element by element
+        yield from (record if isinstance(record, dict) else {"value": record} for record in json.loads(text))
+        return
+
+    def skip(pos: int, separators: str = " \t\r\n") -> int:
+        while pos < end and text[pos] in separators:
+            pos += 1
+        return pos
+
+    pos = skip(0)
+    if pos < end and text[pos] == "[":
+        pos = skip(pos + 1)
+        while pos < end and text[pos] != "]":
+            record, pos = decoder.raw_decode(text, pos)
+            yield record if isinstance(record, dict) else {"value": record}
+            pos = skip(pos, " \t\r\n,")
+        return
+
+    first, pos = decoder.raw_decode(text, pos)
+    pos = skip(pos)
+    if pos == end and isinstance(first, dict):
+        # One document: records are its first list of objects, or the document itself
+        nested = next((value for value in first.values()
+                       if isinstance(value, list) and value and all(isinstance(item, dict) for item in value)), None)
+        yield from nested if nested is not None else [first]
+        return
+    yield first
+    while pos < end:
+        record, pos = decoder.raw_decode(text, pos)
+        yield record
+        pos = skip(pos)
+
+
+def _records_frame(records: Iterator[dict], nrows: Optional[int], flatten: bool = True) -> pd.DataFrame:
+    build = pd.json_normalize if flatten else pd.DataFrame
+    frames, batch, count = [], [], 0
+    for record in records:
+        batch.append(record)
+        count += 1
+        if len(batch) >= RECORD_BATCH:
+            frames.append(build(batch))
+            batch = []
+        if nrows is not None and count >= nrows:
+            break
+    if batch or not frames:
+        frames.append(build(batch))
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+
+def read_json(content: bytes, nrows: Optional[int] = None, sheets=None) -> pd.DataFrame:
+    """
+    JSON or NDJSON records, with nested objects flattened into dotted columns
+    ({"customer": {"id": 1}} -> "customer.id"). Lists are kept as values.
+    """
+    return _records_frame(_iter_json_records(content.decode("utf-8-sig"), bounded=nrows is not None), nrows)
+
+
+# --- XML ---
+
+_local_names: Dict[str, str] = {}
+
+
+def _local(tag: str) -> str:
+    # Tag without its {namespace}; memoized, as every record repeats the same few tags
+    name = _local_names.get(tag)
+    if name is None:
+        name = _local_names[tag] = tag.rsplit("}", 1)[-1]
+    return name
+
+
+def _element_record(element, prefix: str = "") -> dict:
+    record = {f"{prefix}{_local(key)}": value for key, value in element.attrib.items()}
+    for child in element:
+        name = f"{prefix}{_local(child.tag)}"
+        if len(child) or child.attrib:
+            record.update(_element_record(child, f"{name}."))
+            text = (child.text or "").strip()
+            if text:
+                record[name] = text
+        elif name in record:
+            # Repeated child elements become a list, like JSON arrays
+            previous = record[name]
+            record[name] = (previous if isinstance(previous, list) else [previous]) + [child.text]
+        else:
+            record[name] = child.text
+    return record
+
+
+def _iter_xml_records(content: bytes) -> Iterator[dict]:
+    """
+    Streams the children of the root element as records (attributes and child elements
+    become columns, nested elements dotted ones), clearing each one once converted.
+    """
+    depth, root = 0, None
+    for event, element in ET.iterparse(io.BytesIO(content), events=("start", "end")):
+        if event == "start":
+            depth += 1
+            if root is None:
+                root = element
+            continue
+        depth -= 1
+        if depth == 1:
+            yield _element_record(element)
+            root.remove(element)
+
+
+def _infer_types(df: pd.DataFrame) -> pd.DataFrame:
+    # XML values are all text; convert the columns that are entirely numeric
+    for column in df.columns:
+        if df[column].dtype == object or pd.api.types.is_string_dtype(df[column]):
+            try:
+                df[column] = pd.to_numeric(df[column])
+            except (ValueError, TypeError):
+                pass
+    return df
+
+
+def read_xml(content: bytes, nrows: Optional[int] = None, sheets=None) -> pd.DataFrame:
+    # Records come out already flat, so they skip json_normalize
+    return _infer_types(_records_frame(_iter_xml_records(content), nrows, flatten=False))
+
+
+register_reader([".csv"], read_csv)
+register_reader([".xlsx"], read_excel)
+register_reader([".json", ".ndjson", ".jsonl"], read_json)
+register_reader([".xml"], read_xml)
@@ -0,0 +1,383 @@
+import os
+import ast
+import json
+from typing import List, Optional
+
+import pandas as pd
+
+from app.core.sandbox import run_transformation
+from app.services.result_store import frame_for_parquet, write_result
+
+# Rows per chunk when streaming a transformation over a large CSV
+DEFAULT_CHUNK_ROWS = 100000
+
+
+def _preview(result_df: pd.DataFrame, preview: List[dict], rows: int) -> List[dict]:
+    if len(preview) < rows:
+        preview.extend(json.loads(result_df.head(rows - len(preview)).to_json(orient="records", date_format="iso")))
+    return preview
+
+
+class _ChunkWriter:
+    """
+    Appends result chunks to one Parquet file, or to a CSV next to it when Arrow cannot
+    represent the first chunk. pandas infers dtypes per chunk, so when a later chunk needs
+    a wider type (int64 -> double, int64 -> string) the file written so far is promoted
+    to the wider schema instead of casting the new chunk down.
+    """
+
+    def __init__(self, output_path: str):
+        self.output_path = output_path
+        self.format = None
+        self.columns: List[str] = []
+        self._writer = None
+        self._path = output_path
+        self._rewrites = 0
+
+    def write(self, result_df: pd.DataFrame):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if self.format is None:
+            self.columns = [str(c) for c in result_df.columns]
+            try:
+                table = pa.Table.from_pandas(frame_for_parquet(result_df), preserve_index=False)
+                self._writer = pq.ParquetWriter(self._path, table.schema)
+                self.format = "parquet"
+            except (pa.ArrowException, TypeError, ValueError):
+                self.format = "csv"
+                result_df.to_csv(self._csv_path, index=False)
+                return
+        if self.format == "csv":
+            result_df.to_csv(self._csv_path, mode="a", header=False, index=False)
+            return
+        table = pa.Table.from_pandas(frame_for_parquet(result_df), preserve_index=False)
+        if not table.schema.equals(self._writer.schema):
+            table = table.select(self._writer.schema.names)
+            schema = _widen_schema(self._writer.schema, table.schema)
+            if not schema.equals(self._writer.schema):
+                self._promote(schema)
+            table = table.cast(schema)
+        self._writer.write_table(table)
+
+    def _promote(self, schema):
+        # Copies the row groups written so far into a new file with the wider schema,
+        # one batch at a time so memory stays bounded by a chunk
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._writer.close()
+        self._rewrites += 1
+        path = f"{self.output_path}.{self._rewrites}.tmp"
+        writer = pq.ParquetWriter(path, schema)
+        for batch in pq.ParquetFile(self._path).iter_batches():
+            writer.write_table(pa.Table.from_batches([batch]).cast(schema))
+        os.remove(self._path)
+        self._writer, self._path = writer, path
+
+    @property
+    def _csv_path(self) -> str:
+        return os.path.splitext(self.output_path)[0] + ".csv"
+
+    def close(self) -> str:
+        if self._writer is not None:
+            self._writer.close()
+            if self._path != self.output_path:
+                os.replace(self._path, self.output_path)
+        if self.format is None:
+            self.format = write_result(pd.DataFrame(), self.output_path)
+        return self.format
+
+
+def _widen_schema(schema, other):
+    """
+    The narrowest schema both `schema` and `other` (same field names) cast to without loss:
+    Arrow's numeric promotion where it applies, strings where the types are unrelated.
+    """
+    import pyarrow as pa
+    fields = []
+    for field, new in zip(schema, other):
+        if field.type.equals(new.type) or pa.types.is_null(new.type):
+            fields.append(field)
+            continue
+        try:
+            widened = pa.unify_schemas([pa.schema([field]), pa.schema([new.with_name(field.name)])],
+                                       promote_options="permissive").field(0)
+        except (pa.ArrowException, TypeError):
+            widened = field.with_type(pa.large_string())
+        fields.append(widened.with_nullable(True))
+    return pa.schema(fields, metadata=schema.metadata)
+
+
+def chunked_task(path: str, code: str, output_path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS, preview_rows: int = 10):
+    """
+    Sandbox task: streams the CSV in chunks, runs row-local code on each and appends the
+    results to `output_path`, so memory stays bounded by one chunk.
+    Returns ({rows, preview, columns, format}, error).
+    """
+    rows, preview = 0, []
+    writer = _ChunkWriter(output_path)
+    try:
+        for chunk in pd.read_csv(path, chunksize=chunk_rows):
+            result_df, error = run_transformation(chunk, code, copy=False)
+            if error:
+                return None, error
+            writer.write(result_df)
+            rows += len(result_df)
+            _preview(result_df, preview, preview_rows)
+    finally:
+        fmt = writer.close()
+    return {"rows": rows, "preview": preview, "columns": writer.columns, "format": fmt}, None
+
+
+def projected_task(path: str, code: str, columns: Optional[List[str]], output_path: str, preview_rows: int = 10):
+    """
+    Sandbox task for code that needs the whole table: loads only `columns` (all when None)
+    with the same pandas reader that built the sample, runs the code once without an
+    extra copy, and writes the result to `output_path`.
+    Returns ({rows, preview, columns, format}, error).
+    """
+    df = pd.read_csv(path, usecols=columns)
+    result_df, error = run_transformation(df, code, copy=False)
+    del df
+    if error:
+        return None, error
+    fmt = write_result(result_df, output_path)
+    return {"rows": len(result_df), "preview": _preview(result_df, [], preview_rows),
+            "columns": [str(c) for c in result_df.columns], "format": fmt}, None
+
+
+# --- static analysis of the generated code ---
+
+# Series / DataFrame methods whose output row i depends only on input row i
+ROW_LOCAL_METHODS = {
+    "astype", "fillna", "replace", "isin", "isna", "notna", "isnull", "notnull", "between", "abs", "round",
+    "clip", "where", "mask", "apply", "map", "rename", "drop", "assign", "copy", "reset_index",
+    "add", "sub", "mul", "div", "truediv", "floordiv", "mod", "pow", "radd", "rsub", "rmul", "rdiv",
+    "eq", "ne", "lt", "gt", "le", "ge",
+}
+# pandas functions that work element by element
+ROW_LOCAL_FUNCTIONS = {"to_datetime", "to_numeric", "isna", "notna", "isnull", "notnull"}
+# .str / .dt methods that combine or re-shape rows rather than map them
+NON_LOCAL_ACCESSOR_METHODS = {"cat", "get_dummies"}
+SAFE_BUILTINS = {"str", "int", "float", "bool", "len", "abs", "round", "min", "max", "None", "True", "False"}
+
+_ROWS, _SCALAR, _ACCESSOR = "rows", "scalar", "accessor"
+
+
+def _literal_columns(node) -> Optional[List[str]]:
+    """
+    Column names for a literal selector: "a" or ["a", "b"]. None for anything else.
+    """
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return [node.value]
+    if isinstance(node, (ast.List, ast.Tuple)) and node.elts and all(
+            isinstance(e, ast.Constant) and isinstance(e.value, str) for e in node.elts):
+        return [e.value for e in node.elts]
+    return None
+
+
+def _column_attribute(node: ast.Attribute, columns: List[str]) -> bool:
+    # df.sales reads a column only when no DataFrame attribute or method shadows the name
+    return node.attr in columns and not hasattr(pd.DataFrame, node.attr)
+
+
+class _RowLocalChecker:
+    """
+    Classifies expressions of the generated code: "rows" for values aligned with the input
+    rows, "scalar" for constants, None for anything that could mix rows.
+    """
+
+    def __init__(self, columns: List[str]):
+        self.columns = columns
+        self.names = {"df": _ROWS}
+
+    def kind(self, node, frames=None) -> Optional[str]:
+        names = dict(self.names, **{name: _ROWS for name in (frames or ())})
+        return self._kind(node, names)
+
+    def _kinds(self, nodes, names) -> Optional[str]:
+        kinds = [self._kind(n, names) for n in nodes]
+        if any(k is None or k == _ACCESSOR for k in kinds):
+            return None
+        return _ROWS if _ROWS in kinds else _SCALAR
+
+    def _lambda(self, node: ast.Lambda, names, frame_args: bool) -> Optional[str]:
+        args = [a.arg for a in node.args.args]
+        if frame_args:
+            # The argument is the chunk itself (assign(x=lambda d: ...)): its body must be row-local too
+            return _SCALAR if self._kind(node.body, dict(names, **{a: _ROWS for a in args})) is not None else None
+        # Element- or row-wise callbacks (apply / map) may compute anything from their argument,
+        # as long as they never reach back into the whole frame
+        for child in ast.walk(node.body):
+            if isinstance(child, ast.Name) and child.id not in args and child.id not in SAFE_BUILTINS \
+                    and child.id != "pd" and names.get(child.id) != _SCALAR:
+                return None
+        return _SCALAR
+
+    def _kind(self, node, names) -> Optional[str]:
+        if isinstance(node, ast.Constant):
+            return _SCALAR
+        if isinstance(node, ast.Name):
+            return names.get(node.id, _SCALAR if node.id in SAFE_BUILTINS else None)
+        if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+            return _SCALAR if self._kinds(node.elts, names) == _SCALAR or not node.elts else None
+        if isinstance(node, ast.Dict):
+            return _SCALAR if self._kinds([k for k in node.keys if k is not None] + node.values, names) == _SCALAR else None
+        if isinstance(node, ast.UnaryOp):
+            return self._kinds([node.operand], names)
+        if isinstance(node, ast.BinOp):
+            return self._kinds([node.left, node.right], names)
+        if isinstance(node, ast.BoolOp):
+            return self._kinds(node.values, names)
+        if isinstance(node, ast.Compare):
+            return self._kinds([node.left] + node.comparators, names)
+        if isinstance(node, ast.Subscript):
+            return self._subscript(node, names)
+        if isinstance(node, ast.Attribute):
+            value = self._kind(node.value, names)
+            if value == _ROWS and node.attr in ("str", "dt"):
+                return _ACCESSOR
+            if value == _ACCESSOR:
+                return _ROWS  # .dt.year and friends
+            if value == _ROWS and _column_attribute(node, self.columns):
+                return _ROWS
+            return None
+        if isinstance(node, ast.Call):
+            return self._call(node, names)
+        return None
+
+    def _subscript(self, node: ast.Subscript, names) -> Optional[str]:
+        if isinstance(node.value, ast.Attribute) and node.value.attr == "loc":
+            # df.loc[mask], df.loc[mask, "col"], df.loc[:, ["a", "b"]]
+            if self._kind(node.value.value, names) != _ROWS:
+                return None
+            parts = node.slice.elts if isinstance(node.slice, ast.Tuple) else [node.slice]
+            if len(parts) > 2:
+                return None
+            for i, part in enumerate(parts):
+                if isinstance(part, ast.Slice) and part.lower is None and part.upper is None and part.step is None:
+                    continue
+                if i == 1 and _literal_columns(part) is not None:
+                    continue
+                if i == 0 and self._kind(part, names) == _ROWS:
+                    continue
+                return None
+            return _ROWS
+        if self._kind(node.value, names) != _ROWS:
+            return None
+        if _literal_columns(node.slice) is not None or self._kind(node.slice, names) == _ROWS:
+            return _ROWS  # column selection or boolean mask
+        return None
+
+    def _call(self, node: ast.Call, names) -> Optional[str]:
+        func = node.func
+        if not isinstance(func, ast.Attribute):
+            return None
+        keywords = {k.arg: k.value for k in node.keywords}
+        if None in keywords:
+            return None
+        lenient = func.attr in ("apply", "map")
+        arguments = []
+        for arg in list(node.args) + list(keywords.values()):
+            if isinstance(arg, ast.Lambda):
+                if self._lambda(arg, names, frame_args=not lenient) is None:
+                    return None
+            else:
+                arguments.append(arg)
+        if arguments and self._kinds(arguments, names) is None:
+            return None
+
+        if isinstance(func.value, ast.Name) and func.value.id == "pd" and "pd" not in names:
+            return _ROWS if func.attr in ROW_LOCAL_FUNCTIONS else None
+        receiver = self._kind(func.value, names)
+        if receiver == _ACCESSOR:
+            return _ROWS if func.attr not in NON_LOCAL_ACCESSOR_METHODS else None
+        if receiver != _ROWS or func.attr not in ROW_LOCAL_METHODS:
+            return None
+        if func.attr == "apply" and not self._is_series(func.value) and not self._axis_one(keywords):
+            return None  # DataFrame.apply defaults to whole columns
+        if func.attr == "fillna" and ("method" in keywords or "limit" in keywords):
+            return None
+        if func.attr == "drop" and (node.args and not self._axis_one(keywords) or "index" in keywords):
+            return None
+        if func.attr == "rename" and (node.args or "index" in keywords):
+            return None
+        if func.attr == "reset_index" and not (isinstance(keywords.get("drop"), ast.Constant) and keywords["drop"].value is True):
+            return None
+        return _ROWS
+
+    def _is_series(self, node) -> bool:
+        if isinstance(node, ast.Subscript):
+            return isinstance(node.slice, ast.Constant) and isinstance(node.slice.value, str)
+        return isinstance(node, ast.Attribute) and _column_attribute(node, self.columns)
+
+    @staticmethod
+    def _axis_one(keywords) -> bool:
+        axis = keywords.get("axis")
+        return isinstance(axis, ast.Constant) and axis.value in (1, "columns")
+
+    def _target(self, target, kind: str) -> bool:
+        if isinstance(target, ast.Name):
+            self.names[target.id] = kind
+            return True
+        # df["new"] = ... / df.loc[mask, "new"] = ...
+        return isinstance(target, ast.Subscript) and self._subscript(target, self.names) == _ROWS
+
+    def check(self, tree: ast.Module) -> bool:
+        for statement in tree.body:
+            if isinstance(statement, (ast.Assign, ast.AugAssign)):
+                kind = self._kind(statement.value, self.names)
+                targets = statement.targets if isinstance(statement, ast.Assign) else [statement.target]
+                if kind is None or kind == _ACCESSOR or not all(self._target(t, kind) for t in targets):
+                    return False
+            elif isinstance(statement, ast.Expr):
+                # In-place calls such as df.fillna(0, inplace=True)
+                if self._kind(statement.value, self.names) != _ROWS:
+                    return False
+            elif isinstance(statement, ast.Delete):
+                if not all(isinstance(t, ast.Subscript) and self._subscript(t, self.names) == _ROWS
+                           for t in statement.targets):
+                    return False
+            else:
+                return False
+        return self.names.get("result_df", self.names["df"]) == _ROWS
+
+
+def is_row_local(code: str, columns: List[str]) -> bool:
+    """
+    True only when every statement of the code is an allow-listed row-wise operation
+    (filters, column assignments, arithmetic, elementwise methods), so running it chunk by
+    chunk gives the same rows as one run over the whole table. Sorts, de-duplication,
+    aggregations, cumulative and window functions, positional access and anything the
+    check does not recognize go to the whole-table path.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return False
+    return _RowLocalChecker(columns).check(tree)
+
+
+def referenced_columns(code: str, columns: List[str]) -> Optional[List[str]]:
+    """
+    The columns to load when every read of `df` selects columns by literal name
+    (df["x"], df[["x", "y"]], df.x), in file order. None (load everything) as soon as
+    the code uses `df` any other way: df.groupby(...), df.sum(), df[mask], result_df = df.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    parents = {child: node for node in ast.walk(tree) for child in ast.iter_child_nodes(node)}
+    used = set()
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Name) and node.id == "df") or isinstance(node.ctx, ast.Store):
+            continue
+        parent = parents.get(node)
+        if isinstance(parent, ast.Subscript) and parent.value is node and _literal_columns(parent.slice) is not None:
+            used.update(_literal_columns(parent.slice))
+        elif isinstance(parent, ast.Attribute) and _column_attribute(parent, columns):
+            used.add(parent.attr)
+        else:
+            return None
+    selected = [column for column in columns if column in used]
+    return selected or None
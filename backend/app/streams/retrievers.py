@@ -0,0 +1,271 @@
+import os
+import time
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import List, Optional
+
+import numpy as np
+
+from app.clients.local_embeddings import LocalEmbeddingFunction
+from app.streams.bm25 import BM25Index, reciprocal_rank_fusion
+
+RETRIEVAL_MODES = ("vector", "bm25", "hybrid")
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> List[List[int]]:
+    """
+    Column indices of the `k` highest scores in each row, best first.
+    """
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return [[] for _ in range(len(scores))]
+    # argpartition finds the top k in O(n); only those k are sorted
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(top, order, axis=1).tolist()
+
+
+def normalize(matrix) -> np.ndarray:
+    """
+    Rows of `matrix` as float32 unit vectors (zero rows stay zero).
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+class Retriever:
+    """
+    Interface Stream D indexes and searches documents through.
+    A document is written with add_chunks() batch by batch and becomes visible to has()
+    once commit_document() registers it. Backends provide the storage primitives below;
+    leasing and vector / BM25 / hybrid search are shared.
+    """
+
+    def __init__(self):
+        self._leases = Counter()
+        self._lease_lock = threading.Lock()
+
+    # --- backend primitives ---
+
+    def has(self, doc_id: str) -> bool:
+        raise NotImplementedError
+
+    def add_chunks(self, doc_id: str, filename: str, start: int, chunks: List[str], embeddings=None):
+        raise NotImplementedError
+
+    def commit_document(self, doc_id: str, filename: str, chunk_count: int, local: bool, bm25: BM25Index):
+        raise NotImplementedError
+
+    def delete(self, doc_id: str):
+        raise NotImplementedError
+
+    def bm25(self, doc_id: str) -> BM25Index:
+        raise NotImplementedError
+
+    def chunks(self, doc_id: str, indices: List[int]) -> List[str]:
+        raise NotImplementedError
+
+    def is_local(self, doc_id: str) -> bool:
+        """
+        True when the document was embedded with the local embedding function.
+        """
+        raise NotImplementedError
+
+    def vector_rankings(self, doc_id: str, query_texts: List[str], query_embeddings, k: int) -> List[List[int]]:
+        """
+        Chunk indices of the `k` nearest chunks, per query.
+        """
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+    # --- shared behaviour ---
+
+    def add(self, doc_id: str, filename: str, chunks: List[str], embeddings=None):
+        """
+        Indexes a document's chunks. Without `embeddings`, the local embedding function is used.
+        """
+        self.add_chunks(doc_id, filename, 0, chunks, embeddings)
+        self.commit_document(doc_id, filename, len(chunks), embeddings is None, BM25Index.build(chunks))
+
+    @contextmanager
+    def lease(self, doc_id: str):
+        """
+        Pins a document for the duration of a request. Take the lease before has()/add()
+        so eviction cannot remove the chunks between indexing and querying.
+        """
+        with self._lease_lock:
+            self._leases[doc_id] += 1
+        try:
+            yield
+        finally:
+            with self._lease_lock:
+                self._leases[doc_id] -= 1
+                if self._leases[doc_id] <= 0:
+                    del self._leases[doc_id]
+
+    def _is_leased(self, doc_id: str) -> bool:
+        with self._lease_lock:
+            return self._leases[doc_id] > 0
+
+    def _leased_count(self) -> int:
+        with self._lease_lock:
+            return len(self._leases)
+
+    def search(self, doc_id: str, query_texts: List[str], query_embeddings=None, n_results: int = 3,
+               mode: str = "hybrid", candidates: int = 20) -> List[List[str]]:
+        """
+        Top `n_results` chunks of one document for each query.
+        "vector" ranks by embedding similarity, "bm25" by keyword score, and "hybrid"
+        fuses the top `candidates` of both with reciprocal-rank fusion.
+        """
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{mode}'. Use one of {', '.join(RETRIEVAL_MODES)}.")
+
+        if mode != "bm25" and query_embeddings is None and not self.is_local(doc_id):
+            # No query vectors for an externally embedded document: keyword ranking only
+            mode = "bm25"
+        if mode == "vector":
+            rankings = self.vector_rankings(doc_id, query_texts, query_embeddings, n_results)
+        else:
+            bm25 = self.bm25(doc_id)
+            keyword_rankings = [bm25.top_k(text, candidates) for text in query_texts]
+            if mode == "bm25":
+                rankings = [ranking[:n_results] for ranking in keyword_rankings]
+            else:
+                vector_rankings = self.vector_rankings(doc_id, query_texts, query_embeddings, candidates)
+                rankings = [
+                    reciprocal_rank_fusion([vector, keyword])[:n_results]
+                    for vector, keyword in zip(vector_rankings, keyword_rankings)
+                ]
+        return [self.chunks(doc_id, ranking) for ranking in rankings]
+
+
+class _MemoryDocument:
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.chunks: List[str] = []
+        self.blocks: List[np.ndarray] = []
+        self.matrix: Optional[np.ndarray] = None
+        self.local = False
+        self.bm25: Optional[BM25Index] = None
+        self.indexed_at = time.time()
+
+
+class InMemoryRetriever(Retriever):
+    """
+    Exact brute-force cosine search over a NumPy matrix per document.
+    For ephemeral single-document queries this beats creating Chroma / HNSW entries
+    (see bench_retrievers.py); the cost is RAM, so nothing is persisted and documents
+    are dropped by TTL, LRU count or total vector bytes (never while leased).
+    """
+
+    def __init__(self, max_documents: int = 256, ttl_seconds: float = 3600, max_bytes: int = 512 * 1024 * 1024):
+        super().__init__()
+        self.max_documents = max_documents
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._documents: "OrderedDict[str, _MemoryDocument]" = OrderedDict()
+        self._pending: dict = {}
+        self._lock = threading.Lock()
+        self._embedding_function: Optional[LocalEmbeddingFunction] = None
+
+    @classmethod
+    def from_env(cls) -> "InMemoryRetriever":
+        return cls(
+            max_documents=int(os.getenv("STREAM_D_MEMORY_MAX_DOCS", "256")),
+            ttl_seconds=float(os.getenv("STREAM_D_MEMORY_TTL", "3600")),
+            max_bytes=int(float(os.getenv("STREAM_D_MEMORY_MAX_MB", "512")) * 1024 * 1024),
+        )
+
+    def _local_embed(self, texts: List[str]) -> np.ndarray:
+        if self._embedding_function is None:
+            self._embedding_function = LocalEmbeddingFunction.from_env()
+        return self._embedding_function.embedder.embed(texts)
+
+    def has(self, doc_id: str) -> bool:
+        with self._lock:
+            document = self._documents.get(doc_id)
+            if document is None:
+                return False
+            if time.time() - document.indexed_at > self.ttl_seconds and not self._is_leased(doc_id):
+                del self._documents[doc_id]
+                return False
+            self._documents.move_to_end(doc_id)
+            return True
+
+    def add_chunks(self, doc_id: str, filename: str, start: int, chunks: List[str], embeddings=None):
+        local = embeddings is None
+        vectors = self._local_embed(chunks) if local else normalize(embeddings)
+        with self._lock:
+            document = self._pending.setdefault(doc_id, _MemoryDocument(filename))
+            document.chunks.extend(chunks)
+            document.blocks.append(vectors)
+            document.local = local
+
+    def commit_document(self, doc_id: str, filename: str, chunk_count: int, local: bool, bm25: BM25Index):
+        with self._lock:
+            document = self._pending.pop(doc_id)
+            document.matrix = np.vstack(document.blocks) if document.blocks else np.zeros((0, 1), dtype=np.float32)
+            document.blocks = []
+            document.local = local
+            document.bm25 = bm25
+            document.indexed_at = time.time()
+            self._documents[doc_id] = document
+            self._documents.move_to_end(doc_id)
+            self._evict()
+
+    def delete(self, doc_id: str):
+        with self._lock:
+            self._documents.pop(doc_id, None)
+            self._pending.pop(doc_id, None)
+
+    def _get(self, doc_id: str) -> _MemoryDocument:
+        with self._lock:
+            document = self._documents.get(doc_id)
+        if document is None:
+            raise KeyError(f"Document {doc_id} is not indexed.")
+        return document
+
+    def bm25(self, doc_id: str) -> BM25Index:
+        return self._get(doc_id).bm25
+
+    def chunks(self, doc_id: str, indices: List[int]) -> List[str]:
+        document = self._get(doc_id)
+        return [document.chunks[i] for i in indices]
+
+    def is_local(self, doc_id: str) -> bool:
+        with self._lock:
+            document = self._documents.get(doc_id)
+        return bool(document and document.local)
+
+    def vector_rankings(self, doc_id: str, query_texts: List[str], query_embeddings, k: int) -> List[List[int]]:
+        document = self._get(doc_id)
+        queries = self._local_embed(query_texts) if document.local else normalize(query_embeddings)
+        return top_k_indices(queries @ document.matrix.T, k)
+
+    def _evict(self):
+        cutoff = time.time() - self.ttl_seconds
+        for doc_id in [d for d, doc in self._documents.items() if doc.indexed_at < cutoff]:
+            if not self._is_leased(doc_id):
+                del self._documents[doc_id]
+        # OrderedDict order is least recently used first
+        total_bytes = sum(doc.matrix.nbytes for doc in self._documents.values())
+        for doc_id in list(self._documents):
+            if len(self._documents) <= self.max_documents and total_bytes <= self.max_bytes:
+                break
+            if not self._is_leased(doc_id):
+                total_bytes -= self._documents.pop(doc_id).matrix.nbytes
+
+    def stats(self) -> dict:
+        with self._lock:
+            documents = len(self._documents)
+            chunks = sum(len(doc.chunks) for doc in self._documents.values())
+            nbytes = sum(doc.matrix.nbytes for doc in self._documents.values())
+        return {"documents": documents, "chunks": chunks, "leased": self._leased_count(), "vector_bytes": nbytes,
+                "max_documents": self.max_documents, "max_bytes": self.max_bytes, "ttl_seconds": self.ttl_seconds}
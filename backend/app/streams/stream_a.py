@@ -1,42 +1,153 @@
 import pandas as pd
-import io
-import traceback
-from typing import Optional
+import asyncio
+import os
+import re
+import json
+import uuid
+import hashlib
+from collections import OrderedDict
+from typing import Awaitable, List, Optional, Tuple
 from app.models.schemas import ProcessRequest, ProcessResponse
-from app.clients.fal_client import fal_client_instance as fal_client
+from app.clients.fal_client import cached_fal_client as fal_client
 from app.clients.azure_client import azure_client
+from app.clients.llm_cache import ResponseCache, bypass_llm_cache
+from app.core.document import ParsedDocument
+from app.core.executors import executors
+from app.core.sandbox import sandbox_pool
+from app.services.result_store import result_store
+from app.streams import ingestion, large_files
+
+# CSV uploads above this size skip the full in-memory parse (see process_large)
+LARGE_FILE_BYTES = int(float(os.getenv("STREAM_A_LARGE_FILE_MB", "100")) * 1024 * 1024)
+# Rows read to infer the schema and validate generated code in large-file mode
+SAMPLE_ROWS = int(os.getenv("STREAM_A_SAMPLE_ROWS", "5000"))
+# Rows parsed up front to build the prompt while the full parse overlaps the LLM call
+PROMPT_SAMPLE_ROWS = int(os.getenv("STREAM_A_PROMPT_SAMPLE_ROWS", "200"))
+CHUNK_ROWS = int(os.getenv("STREAM_A_CHUNK_ROWS", "100000"))
+LARGE_EXEC_TIMEOUT = float(os.getenv("STREAM_A_LARGE_EXEC_TIMEOUT", "1800"))
+UNSUPPORTED_FORMAT = "Unsupported file format. Please upload CSV, Excel, JSON or XML."
+SPOOL_DIR = os.getenv("STREAM_A_SPOOL_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "cache", "stream_a_spool"))
+
+
+class DataFrameCache:
+    """
+    In-memory LRU of parsed DataFrames (with their schema context), keyed by content hash
+    and file type, so the same upload is parsed once per process. Bounded by entry count
+    and by the frames' deep memory usage. Cached frames are shared: callers must copy before mutating.
+    """
+
+    def __init__(self, max_entries: int = 32, max_bytes: int = 512 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "DataFrameCache":
+        return cls(
+            max_entries=int(os.getenv("STREAM_A_DF_CACHE_ENTRIES", "32")),
+            max_bytes=int(float(os.getenv("STREAM_A_DF_CACHE_MAX_MB", "512")) * 1024 * 1024),
+        )
+
+    def get(self, key: str) -> Optional[Tuple[pd.DataFrame, str]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0], entry[1]
+
+    def set(self, key: str, df: pd.DataFrame, schema_context: str):
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[2]
+        self._entries[key] = (df, schema_context, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._bytes -= self._entries.popitem(last=False)[1][2]
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "bytes": self._bytes,
+                "max_entries": self.max_entries, "max_bytes": self.max_bytes}
+
+
+def schema_fingerprint(df: pd.DataFrame) -> str:
+    """
+    Hash of the column names and dtypes, in order. Two exports with the same layout
+    share a fingerprint regardless of their rows.
+    """
+    columns = [[str(column), str(dtype)] for column, dtype in df.dtypes.items()]
+    return hashlib.sha256(json.dumps(columns).encode("utf-8")).hexdigest()
+
+
+def normalize_instruction(instruction: str) -> str:
+    return re.sub(r"\s+", " ", instruction or "").strip()
+
 
 class StreamAProcessor:
     def __init__(self):
         self.client = fal_client
+        self.frames = DataFrameCache.from_env()
+        self.results = result_store
+        # Generated code that executed successfully, keyed by schema fingerprint + instruction
+        self.code_cache = ResponseCache.from_env(prefix="STREAM_A_CODE_CACHE", namespace="stream_a_code")
+
+    @staticmethod
+    def read_sample(file_content: bytes, filename: str, nrows: int,
+                    sheets: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+        """
+        Blocking: parses only the first `nrows` rows. None for unsupported formats.
+        """
+        return ingestion.read_table(file_content, filename, nrows, sheets)
+
+    @staticmethod
+    def frame_key(sha256: str, filename: str, sheets: Optional[List[str]] = None) -> str:
+        key = f"{sha256}:{os.path.splitext(filename)[1].lower()}"
+        return f"{key}:{json.dumps(sheets)}" if sheets else key
 
-    async def analyze_schema(self, file_content: bytes, filename: str):
+    async def analyze_schema(self, file_content: bytes, filename: str, sha256: Optional[str] = None,
+                             sheets: Optional[List[str]] = None):
         """
-        Reads the file and returns schema + sample data.
+        Reads the file (only `sheets` of a workbook, default the first) and returns schema + sample data.
+        Parsed frames are cached by content hash, so repeat calls for the same bytes skip the parse.
         """
+        key = self.frame_key(sha256 or hashlib.sha256(file_content).hexdigest(), filename, sheets)
+        cached = self.frames.get(key)
+        if cached is not None:
+            return cached
         try:
-            if filename.endswith(".csv"):
-                df = pd.read_csv(io.BytesIO(file_content))
-            elif filename.endswith(".xlsx"):
-                df = pd.read_excel(io.BytesIO(file_content))
-            else:
-                return None, "Unsupported file format. Please upload CSV or Excel."
-
-            # Include column indices for easier instruction following (e.g. "Column B" -> index 1)
-            column_map = {i: col for i, col in enumerate(df.columns)}
-            import string
-            excel_cols = {i: string.ascii_uppercase[i] if i < 26 else f"Z{i}" for i in range(len(df.columns))}
-            
-            schema_context = f"Columns (Index: Name [Excel Ref]):\n"
-            for i, col in column_map.items():
-                ref = excel_cols.get(i, "")
-                schema_context += f"- {i}: {col} [{ref}]\n"
-            
-            sample_data = df.head(5).to_markdown()
-            return df, f"{schema_context}\n\nSample Data:\n{sample_data}"
+            # Parsing runs in the I/O thread pool: the pandas readers are blocking and
+            # returning the frame from a worker process would cost a full pickle round trip
+            df = await executors.run_io(ingestion.read_table, file_content, filename, None, sheets)
+            if df is None:
+                return None, UNSUPPORTED_FORMAT
+
+            schema_context = self.schema_context(df)
+            self.frames.set(key, df, schema_context)
+            return df, schema_context
         except Exception as e:
             return None, f"Error reading file: {str(e)}"
 
+    @staticmethod
+    def schema_context(df: pd.DataFrame) -> str:
+        # Include column indices for easier instruction following (e.g. "Column B" -> index 1)
+        column_map = {i: col for i, col in enumerate(df.columns)}
+        import string
+        excel_cols = {i: string.ascii_uppercase[i] if i < 26 else f"Z{i}" for i in range(len(df.columns))}
+        
+        schema_context = f"Columns (Index: Name [Excel Ref]):\n"
+        for i, col in column_map.items():
+            ref = excel_cols.get(i, "")
+            schema_context += f"- {i}: {col} [{ref}]\n"
+        
+        sample_data = df.head(5).to_markdown()
+        return f"{schema_context}\n\nSample Data:\n{sample_data}"
+
     async def generate_transformation_code(self, schema_context: str, instruction: str) -> str:
         """
         Prompts LLM to generate Pandas code.
@@ -69,55 +180,78 @@ class StreamAProcessor:
 
     async def execute_transformation(self, df: pd.DataFrame, code: str):
         """
-        Executes the generated code on the dataframe.
+        Executes the generated code on the dataframe in the sandbox process pool
+        (wall-clock and memory limits, stdout captured per run).
         """
-        local_vars = {"df": df.copy(), "pd": pd}
+        result_df, error, _ = await sandbox_pool.run(df, code)
+        return result_df, error
+
+    def code_cache_key(self, df: pd.DataFrame, instruction: str) -> str:
+        return self.code_cache.make_key(schema_fingerprint(df), normalize_instruction(instruction))
+
+    async def resolve_code(self, sample: pd.DataFrame, schema_context: str, instruction: str,
+                           frame: Optional[Awaitable] = None):
+        """
+        Returns (code, code_cached, result_df, error) for running `instruction`.
+        The code cache is keyed on `sample`'s schema. `frame` resolves to the (df, error) pair
+        to execute on (default: the sample itself) and is only awaited once code is needed,
+        so a full parse started by the caller overlaps the LLM call.
+        Code that already worked for this schema + instruction is reused without an LLM call;
+        otherwise (or when the cached code fails on this data) new code is generated.
+        """
+        async def load():
+            return await frame if frame is not None else (sample, None)
+
+        use_cache = not bypass_llm_cache.get()
+        key = self.code_cache_key(sample, instruction)
+        code = await self.code_cache.get(key) if use_cache else None
+        code_cached = code is not None
+        if code_cached:
+            df, error = await load()
+            if df is None:
+                return code, code_cached, None, error
+            result_df, error = await self.execute_transformation(df, code)
+        else:
+            df, result_df, error = None, None, None
+
+        if not code_cached or error:
+            code_cached = False
+            code = await self.generate_transformation_code(schema_context, instruction)
+            if df is None:
+                df, error = await load()
+                if df is None:
+                    return code, code_cached, None, error
+            result_df, error = await self.execute_transformation(df, code)
+            if not error and use_cache:
+                await self.code_cache.set(key, code)
+        return code, code_cached, result_df, error
+
+    async def process(self, document: ParsedDocument, instruction: str):
+        if document.extension == ".csv" and len(document.content) > LARGE_FILE_BYTES:
+            return await self.process_large(document, instruction)
+
+        # 1. Analyze: a bounded sample builds the prompt and keys the code cache right away,
+        # while the full parse (served from the frame cache when these bytes were parsed
+        # before) runs alongside code generation. The sample is always re-read, so the
+        # cache key never depends on whether the full frame was cached.
         try:
-            # Capture stdout to see prints if any (optional, but good for debugging)
-            import sys
-            import io
-            old_stdout = sys.stdout
-            sys.stdout = buffer = io.StringIO()
-            
-            exec(code, {}, local_vars)
-            
-            sys.stdout = old_stdout
-            
-            # Use result_df if available, otherwise fallback to modified df
-            result_df = local_vars.get("result_df", local_vars.get("df"))
-            
-            if result_df is None:
-                return None, "The generated code did not produce a valid result."
-            
-            # ENSURE result_df is a DataFrame
-            # If it's a Series (e.g. from groupby or simple aggregation)
-            if isinstance(result_df, pd.Series):
-                result_df = result_df.to_frame()
-                
-            # If it's a scalar (int, float, str, bool, numpy scalar)
-            elif not isinstance(result_df, pd.DataFrame):
-                # Check for numpy scalars
-                if hasattr(result_df, 'item'):
-                     result_df = result_df.item()
-                     
-                result_df = pd.DataFrame([{"Result": result_df}])
-            
-            return result_df, None
+            # Workbooks: only the sheets the instruction names are ever loaded
+            sheets = await executors.run_io(ingestion.resolve_sheets, document.content, document.filename, instruction)
+            sample = await executors.run_io(self.read_sample, document.content, document.filename,
+                                            PROMPT_SAMPLE_ROWS, sheets)
         except Exception as e:
-            tb = traceback.format_exc()
-            return None, f"Execution Error: {str(e)}\n\nTraceback:\n{tb}"
+            return {"status": "error", "message": f"Error reading file: {str(e)}"}
+        if sample is None:
+            return {"status": "error", "message": UNSUPPORTED_FORMAT}
+        schema_context = self.schema_context(sample)
+        frame = asyncio.ensure_future(self.analyze_schema(document.content, document.filename, document.sha256, sheets))
 
-    async def process(self, file_content: bytes, filename: str, instruction: str):
-        # 1. Analyze
-        df, context_or_error = await self.analyze_schema(file_content, filename)
-        if df is None:
-            return {"status": "error", "message": context_or_error}
-
-        # 2. Generate
-        code = await self.generate_transformation_code(context_or_error, instruction)
-        
-        # 3. Execute
-        result_df, error = await self.execute_transformation(df, code)
+        # 2. Generate (or reuse) and execute
+        try:
+            code, code_cached, result_df, error = await self.resolve_code(sample, schema_context, instruction, frame)
+        finally:
+            if not frame.done():
+                frame.cancel()
         
         if error:
             return {
@@ -126,25 +260,94 @@ class StreamAProcessor:
                 "generated_code": code
             }
         
-        # 4. Save results for export
-        import uuid
-        import os
+        # 3. Save results for export
+        stored = await executors.run_io(self.results.save, result_df, document.filename)
         
-        results_dir = os.path.join(os.path.dirname(__file__), "results")
-        os.makedirs(results_dir, exist_ok=True)
-        
-        result_id = str(uuid.uuid4())
-        file_path = os.path.join(results_dir, f"{result_id}.csv")
-        result_df.to_csv(file_path, index=False)
-        
-        # 5. Return result
+        # 4. Return result
         return {
             "status": "success",
             "message": "Transformation successful",
             "generated_code": code,
+            "code_cached": code_cached,
             "preview": result_df.head(10).to_dict(orient="records"),
             "rows_processed": len(result_df),
-            "result_id": result_id
+            "result_id": stored["result_id"]
         }
 
+    @staticmethod
+    def _spool(content: bytes) -> str:
+        os.makedirs(SPOOL_DIR, exist_ok=True)
+        path = os.path.join(SPOOL_DIR, f"{uuid.uuid4()}.csv")
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    @staticmethod
+    def _remove_outputs(output_path: str):
+        # A result may have fallen back to CSV next to the Parquet path
+        for leftover in (output_path, os.path.splitext(output_path)[0] + ".csv"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+    async def process_large(self, document: ParsedDocument, instruction: str):
+        """
+        Large-file mode for CSVs: the upload is spooled to disk, the schema and the generated
+        code are built and validated on the first SAMPLE_ROWS rows, and the full file is never
+        materialized in this process. Code that is provably row-local (filters, derived columns)
+        streams through the sandbox chunk by chunk; everything else (aggregations, sorts) runs
+        once on the whole table, loading only the columns it names explicitly.
+        Results are written straight to the result store.
+        """
+        path = await executors.run_io(self._spool, document.content)
+        try:
+            try:
+                sample = await executors.run_io(pd.read_csv, path, nrows=SAMPLE_ROWS)
+            except Exception as e:
+                return {"status": "error", "message": f"Error reading file: {str(e)}"}
+            schema_context = (f"{self.schema_context(sample)}\n\n(Schema from the first {len(sample)} rows; "
+                              "the full file is larger. Use vectorized pandas operations.)")
+
+            code, code_cached, sample_result, error = await self.resolve_code(sample, schema_context, instruction)
+            if error:
+                return {"status": "error", "message": error, "generated_code": code}
+
+            columns = [str(c) for c in sample.columns]
+            result_id, output_path = self.results.allocate()
+            if large_files.is_row_local(code, columns):
+                mode = "chunked"
+                summary, error, _ = await sandbox_pool.call(
+                    large_files.chunked_task, path, code, output_path, CHUNK_ROWS, timeout=LARGE_EXEC_TIMEOUT
+                )
+            else:
+                mode = "projected"
+                projection = large_files.referenced_columns(code, columns)
+                summary, error, _ = await sandbox_pool.call(
+                    large_files.projected_task, path, code, projection, output_path, timeout=LARGE_EXEC_TIMEOUT
+                )
+                if not error and projection and summary["columns"] != [str(c) for c in sample_result.columns]:
+                    # The projection changed the result's shape: run again on every column
+                    print("Stream A: projected result columns differ from the sample's, reloading all columns")
+                    await executors.run_io(self._remove_outputs, output_path)
+                    summary, error, _ = await sandbox_pool.call(
+                        large_files.projected_task, path, code, None, output_path, timeout=LARGE_EXEC_TIMEOUT
+                    )
+            if error:
+                await executors.run_io(self._remove_outputs, output_path)
+                return {"status": "error", "message": error, "generated_code": code, "execution_mode": mode}
+            await executors.run_io(self.results.register, result_id, summary["format"], summary["rows"],
+                                   summary["columns"], summary["preview"], document.filename)
+
+            return {
+                "status": "success",
+                "message": "Transformation successful",
+                "generated_code": code,
+                "code_cached": code_cached,
+                "execution_mode": mode,
+                "preview": summary["preview"],
+                "rows_processed": summary["rows"],
+                "result_id": result_id
+            }
+        finally:
+            await executors.run_io(os.remove, path)
+
 stream_a = StreamAProcessor()
@@ -1,16 +1,15 @@
 from app.models.schemas import ProcessRequest, ProcessResponse
-from app.clients.fal_client import fal_client_instance as fal_client
+from app.clients.fal_client import cached_fal_client as fal_client
 from app.clients.azure_client import azure_client
+from app.core.document import ParsedDocument
 import json
-import fitz
-import io
 
 class StreamBProcessor:
     def __init__(self):
         self.azure = azure_client
         self.openai = fal_client
 
-    async def analyze_layout(self, file_content: bytes):
+    async def analyze_layout(self, file_content: bytes, sha256: str = None):
         """
         Uses Azure Document Intelligence to analyze layout.
         """
@@ -18,31 +17,20 @@ class StreamBProcessor:
             return None, "Azure Client not configured."
             
         try:
-            poller = self.azure.analyze_layout(file_content)
-            result = poller.result()
+            result = await self.azure.analyze_layout_cached(file_content, sha256)
             return result, None
         except Exception as e:
             return None, f"Azure Analysis Error: {str(e)}"
 
-    def analyze_with_pymupdf(self, file_content: bytes):
+    def analyze_with_pymupdf(self, document: ParsedDocument):
         """
-        Fallback: Uses PyMuPDF to extract text and layout.
+        Fallback: Uses the shared PyMuPDF parse to extract text and layout.
         Returns a mock Azure-like object with .content
         """
-        try:
-            doc = fitz.open(stream=file_content, filetype="pdf")
-        except Exception as e:
-            # Fallback for non-pdf handling if necessary, but assuming PDF for this stream
-            try:
-                doc = fitz.open(stream=file_content)
-            except Exception as inner_e:
-                return None, f"PyMuPDF Error: {str(e)} | Inner: {str(inner_e)}"
-            
-        full_text = ""
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            full_text += page.get_text("text") + "\n"
-        doc.close()
+        if document.open_error is not None:
+            return None, f"PyMuPDF Error: {document.open_error}"
+
+        full_text = document.full_text
         
         class MockAzureResult:
             def __init__(self, content):
@@ -50,20 +38,20 @@ class StreamBProcessor:
                 
         return MockAzureResult(full_text), None
 
-    def is_digital_native(self, file_content: bytes, filename: str) -> bool:
+    def is_digital_native(self, document: ParsedDocument) -> bool:
         """
         Determines if a document is a digital-native PDF by checking for embedded text.
         """
-        if not filename.lower().endswith('.pdf'):
+        if not document.is_pdf:
             return False
             
         try:
-            doc = fitz.open(stream=file_content, filetype="pdf")
-            text_length = sum(len(page.get_text("text").strip()) for page in doc)
-            doc.close()
+            if document.open_error is not None:
+                print(f"Error checking digital-native status: {document.open_error}")
+                return False
             # If the PDF contains more than 100 characters of extractable text, 
             # we consider it digital-native rather than a scanned image.
-            return text_length > 100
+            return document.text_length > 100
         except Exception as e:
             print(f"Error checking digital-native status: {e}")
             return False
@@ -173,16 +161,20 @@ class StreamBProcessor:
             
         return response.strip()
 
-    async def process(self, file_content: bytes, filename: str):
+    async def process(self, document: ParsedDocument):
+        filename = document.filename
+        # Extract all page text in the CPU pool; the checks below read the cached pages
+        await document.load_text()
+
         # 1. Fast Path: Check if Digital-Native
-        is_native = self.is_digital_native(file_content, filename)
+        is_native = self.is_digital_native(document)
         
         result, error = None, None
         extraction_method = "Unknown"
         
         if is_native:
             print(f"[{filename}] Detected as Digital-Native PDF. Routing directly to PyMuPDF...")
-            result, error = self.analyze_with_pymupdf(file_content)
+            result, error = self.analyze_with_pymupdf(document)
             if error:
                 print(f"PyMuPDF failed with error: {error}. Falling back to Azure...")
                 # Note: if it fails, we let it fall through to Azure
@@ -193,12 +185,12 @@ class StreamBProcessor:
         # 2. Azure Path (Fallback or for Scanned documents)
         if not result:
             print(f"[{filename}] Routing to Azure Document Intelligence...")
-            result, error = await self.analyze_layout(file_content)
+            result, error = await self.analyze_layout(document.content, document.sha256)
             if error:
                 if "Azure Client not configured" in error and not is_native:
                     # Final Fallback to PyMuPDF if Azure isn't configured for non-native docs
                     print("Azure not configured. Final fallback to PyMuPDF extraction...")
-                    result, pdf_error = self.analyze_with_pymupdf(file_content)
+                    result, pdf_error = self.analyze_with_pymupdf(document)
                     if pdf_error:
                         return {
                             "status": "error",
@@ -1,14 +1,18 @@
 from app.models.schemas import ProcessRequest, ProcessResponse
-from app.clients.fal_client import fal_client_instance as fal_client
+from app.clients.fal_client import cached_fal_client as fal_client
 from app.clients.azure_client import azure_client
+from app.core.document import ParsedDocument
 import json
+from typing import AsyncIterator, Tuple
+
+SYSTEM_PROMPT = "You are a Visual Extraction Specialist. Your output must be strictly a JSON object."
 
 class StreamCProcessor:
     def __init__(self):
         self.azure = azure_client
         self.openai = fal_client
 
-    async def extract_visual_data(self, file_content: bytes):
+    async def extract_visual_data(self, file_content: bytes, sha256: str = None):
         """
         Uses Azure Document Intelligence (Prebuilt-Invoices/ID) or Layout for visual extraction.
         """
@@ -17,17 +21,17 @@ class StreamCProcessor:
             
         try:
             # In a full implementation, this could dynamically choose models (prebuilt-invoice, etc.)
-            poller = self.azure.analyze_layout(file_content)
-            result = poller.result()
+            result = await self.azure.analyze_layout_cached(file_content, sha256)
             return result, None
         except Exception as e:
             return None, f"Azure Visual Analysis Error: {str(e)}"
 
-    async def process(self, file_content: bytes, filename: str, query: str = None):
+    async def process(self, document: ParsedDocument, query: str = None):
         """
         Stream C: Visual Extraction for semi-structured documents.
         """
-        result, error = await self.extract_visual_data(file_content)
+        filename = document.filename
+        result, error = await self.extract_visual_data(document.content, document.sha256)
         
         if error:
              return {
@@ -36,10 +40,22 @@ class StreamCProcessor:
                 "note": "Stream C requires active Azure Document Intelligence credentials."
             }
 
+        extraction = await self.openai.generate_completion(
+            system_prompt=SYSTEM_PROMPT,
+            user_prompt=self.extraction_prompt(result)
+        )
+
+        return {
+            "status": "success",
+            "data": self.parse_extraction(extraction),
+            "filename": filename
+        }
+
+    @staticmethod
+    def extraction_prompt(result) -> str:
         # For visual extraction, we focus on layout and specific field detection
         # This prototype uses LLM to structure the OCR output into visual entities
-        
-        prompt = f"""
+        return f"""
         Extract the visual entities and key-value pairs from this document layout.
         Document Content:
         {result.content[:14000]}
@@ -47,12 +63,9 @@ class StreamCProcessor:
         Focus on semi-structured elements like tables, amounts, dates, and identifiers.
         Return the result as a strictly valid JSON object. Do not include markdown formatting or explanations.
         """
-        
-        extraction = await self.openai.generate_completion(
-            system_prompt="You are a Visual Extraction Specialist. Your output must be strictly a JSON object.",
-            user_prompt=prompt
-        )
 
+    @staticmethod
+    def parse_extraction(extraction: str):
         # Clean up response in case model still includes markdown
         clean_json = extraction
         if "```json" in clean_json:
@@ -61,14 +74,33 @@ class StreamCProcessor:
             clean_json = clean_json.split("```")[1].split("```")[0].strip()
 
         try:
-            data = json.loads(clean_json)
+            return json.loads(clean_json)
         except:
-            data = {"raw_extraction": extraction, "error": "Failed to parse as JSON"}
+            return {"raw_extraction": extraction, "error": "Failed to parse as JSON"}
 
-        return {
-            "status": "success",
-            "data": data,
-            "filename": filename
-        }
+    async def stream(self, document: ParsedDocument, query: str = None) -> AsyncIterator[Tuple[str, dict]]:
+        """
+        Streaming variant of process(): yields ("context", ...) once the layout is extracted,
+        then ("token", ...) per LLM delta and a final ("done", ...) with the parsed JSON.
+        """
+        result, error = await self.extract_visual_data(document.content, document.sha256)
+        if error:
+            yield "done", {
+                "status": "error",
+                "message": error,
+                "note": "Stream C requires active Azure Document Intelligence credentials."
+            }
+            return
+        yield "context", {"filename": document.filename, "pages": len(result.pages or []),
+                          "tables": len(result.tables or []), "content_preview": result.content[:500]}
+
+        parts = []
+        async for delta in self.openai.stream_completion(
+            system_prompt=SYSTEM_PROMPT,
+            user_prompt=self.extraction_prompt(result)
+        ):
+            parts.append(delta)
+            yield "token", {"text": delta}
+        yield "done", {"status": "success", "data": self.parse_extraction("".join(parts)), "filename": document.filename}
 
 stream_c = StreamCProcessor()
@@ -1,21 +1,86 @@
+import os
+import asyncio
+from contextlib import ExitStack
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
 from app.models.schemas import ProcessRequest, ProcessResponse
-from app.clients.fal_client import fal_client_instance as fal_client
+from app.clients.fal_client import cached_fal_client as fal_client
 from app.clients.azure_client import azure_client
-import chromadb
-from chromadb.utils import embedding_functions
+from app.core.document import ParsedDocument
+from app.core.executors import executors
+from app.streams.document_index import DocumentIndex
+from app.streams.retrievers import InMemoryRetriever, Retriever
+from app.streams.vector_store import MemmapRetriever
+from app.streams.bm25 import BM25Index
+from app.streams.chunking import count_tokens, iter_chunks, batched
+
+# "external" (the LLM client's embeddings) or "local" (offline hashing embeddings, no downloads)
+EMBEDDING_BACKEND = os.getenv("STREAM_D_EMBEDDINGS", "external").lower()
+CHUNK_TOKENS = int(os.getenv("STREAM_D_CHUNK_TOKENS", "400"))
+CHUNK_OVERLAP = int(os.getenv("STREAM_D_CHUNK_OVERLAP", "50"))
+# Chunks embedded and written per round trip while indexing
+INDEX_BATCH_SIZE = int(os.getenv("STREAM_D_INDEX_BATCH", "64"))
+# "auto" keeps documents of up to STREAM_D_MEMORY_MAX_CHUNKS (estimated) in the in-memory
+# exact retriever and larger ones in STREAM_D_LARGE_RETRIEVER; "memory" / "chroma" / "memmap" force one
+RETRIEVER = os.getenv("STREAM_D_RETRIEVER", "auto").lower()
+MEMORY_MAX_CHUNKS = int(os.getenv("STREAM_D_MEMORY_MAX_CHUNKS", "5000"))
+# Persistent backend for large documents in auto mode: "chroma" or "memmap" (quantized memory-mapped vectors)
+LARGE_RETRIEVER = os.getenv("STREAM_D_LARGE_RETRIEVER", "chroma").lower()
+ANSWER_SYSTEM_PROMPT = "You are a precise legal/document analyst."
+# Concurrent answer LLM calls in multi-question mode
+ANSWER_CONCURRENCY = int(os.getenv("STREAM_D_ANSWER_CONCURRENCY", "8"))
 
 class StreamDProcessor:
     def __init__(self):
         self.azure = azure_client
         self.openai = fal_client
-        self.chroma = chromadb.Client()
-        # In a real app, use a persistent path
-        self.collection = self.chroma.create_collection(
-            name="temp_docs_d", 
-            get_or_create=True
-        )
+        self._index = None
+        self._memory = None
+        self._vectors = None
+        # Concurrent first requests for the same document share one indexing pass
+        self._indexing: Dict[str, asyncio.Future] = {}
+
+    @property
+    def index(self) -> DocumentIndex:
+        # Opened on first use so importing the stream does not touch the disk
+        if self._index is None:
+            self._index = DocumentIndex.from_env()
+        return self._index
+
+    @property
+    def memory(self) -> InMemoryRetriever:
+        if self._memory is None:
+            self._memory = InMemoryRetriever.from_env()
+        return self._memory
+
+    @property
+    def vectors(self) -> MemmapRetriever:
+        if self._vectors is None:
+            self._vectors = MemmapRetriever.from_env()
+        return self._vectors
+
+    def _persistent(self, name: str) -> Retriever:
+        return self.vectors if name == "memmap" else self.index
 
-    async def extract_markdown(self, file_content: bytes, filename: str = ""):
+    def retrievers(self) -> List[Retriever]:
+        """
+        Backends a document may live in, checked in this order.
+        """
+        if RETRIEVER == "memory":
+            return [self.memory]
+        if RETRIEVER in ("chroma", "memmap"):
+            return [self._persistent(RETRIEVER)]
+        return [self.memory, self._persistent(LARGE_RETRIEVER)]
+
+    def retriever_for(self, content: str) -> Retriever:
+        if RETRIEVER == "memory":
+            return self.memory
+        if RETRIEVER in ("chroma", "memmap"):
+            return self._persistent(RETRIEVER)
+        estimated_chunks = count_tokens(content) / max(1, CHUNK_TOKENS - CHUNK_OVERLAP)
+        return self.memory if estimated_chunks <= MEMORY_MAX_CHUNKS else self._persistent(LARGE_RETRIEVER)
+
+    async def extract_markdown(self, file_content: bytes, filename: str = "", sha256: str = None):
         """
         Uses Azure to get Markdown content or falls back to text decoding for testing.
         """
@@ -27,8 +92,7 @@ class StreamDProcessor:
 
         if self.azure.client:
             try:
-                poller = self.azure.analyze_layout(file_content)
-                result = poller.result()
+                result = await self.azure.analyze_layout_cached(file_content, sha256)
                 return result.content
             except Exception as e:
                 print(f"Azure Extraction Error: {e}")
@@ -37,56 +101,120 @@ class StreamDProcessor:
         return f"Error: Could not extract content from {filename}."
 
     async def get_embeddings(self, text_chunks: list):
-        embeddings = []
-        for chunk in text_chunks:
-            emb = await self.openai.get_embedding(chunk)
-            embeddings.append(emb)
-        return embeddings
+        """
+        One batched call returning an (n_chunks, dim) matrix, or None when this deployment
+        uses the local backend (the index then embeds texts with its local embedding function).
+        """
+        if EMBEDDING_BACKEND == "local":
+            return None
+        return await self.openai.get_embeddings(text_chunks)
 
-    async def process(self, file_content: bytes, filename: str, query: str):
-        # 1. Extract
-        content = await self.extract_markdown(file_content, filename)
-        
-        # 2. Chunk (Naive splitting by paragraphs for demo)
-        chunks = [c for c in content.split("\n\n") if len(c.strip()) > 50]
-        if not chunks:
-            chunks = [content]
+    async def index_document(self, document: ParsedDocument):
+        """
+        Extracts, chunks, embeds and stores a document unless a retriever already holds it.
+        Returns (retriever, None) once indexed, or (None, error text) when there is nothing to index.
+        """
+        doc_id = document.sha256
+        inflight = self._indexing.get(doc_id)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
 
-        # 3. Embed & Index
-        chunk_ids = [f"{filename}_{i}" for i in range(len(chunks))]
-        
+        future = asyncio.get_running_loop().create_future()
+        self._indexing[doc_id] = future
         try:
-            embeddings = await self.get_embeddings(chunks)
-            self.collection.add(
-                documents=chunks,
-                embeddings=embeddings,
-                ids=chunk_ids
-            )
+            result = await self._index_document(document)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
         except Exception as e:
-            print(f"External embeddings failed, falling back to local: {e}")
-            self.collection.add(
-                documents=chunks,
-                ids=chunk_ids
-            )
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            del self._indexing[doc_id]
+
+    async def _index_document(self, document: ParsedDocument) -> Tuple[Optional[Retriever], Optional[str]]:
+        doc_id = document.sha256
+        for retriever in self.retrievers():
+            if await executors.run_io(retriever.has, doc_id):
+                return retriever, None
+
+        # 1. Extract
+        content = await self.extract_markdown(document.content, document.filename, doc_id)
+        if content.startswith("Error: Could not extract"):
+            # Never persist a failed extraction
+            return None, content
+        retriever = self.retriever_for(content)
 
-        # 4. Semantic Search (Pruning)
+        # 2-3. Chunk, embed and index batch by batch so memory stays flat on large documents
+        bm25 = BM25Index({}, [])
+        local = None
+        count = 0
         try:
-            query_embedding = await self.openai.get_embedding(query)
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=3
-            )
+            for chunks in batched(iter_chunks(content, CHUNK_TOKENS, CHUNK_OVERLAP), INDEX_BATCH_SIZE):
+                embeddings = None
+                if not local:
+                    try:
+                        embeddings = await self.get_embeddings(chunks)
+                    except Exception as e:
+                        if local is False:
+                            raise
+                        print(f"External embeddings failed, falling back to local: {e}")
+                local = embeddings is None
+                await executors.run_io(retriever.add_chunks, doc_id, document.filename, count, chunks, embeddings)
+                bm25.extend(chunks)
+                count += len(chunks)
+            if count == 0:
+                # Nothing chunkable (e.g. blank text): index the raw content as a single chunk
+                return await self._index_single(retriever, document, content), None
+            await executors.run_io(retriever.commit_document, doc_id, document.filename, count, local, bm25)
+        except BaseException:
+            # Drop a partially indexed document
+            await executors.run_io(retriever.delete, doc_id)
+            raise
+        return retriever, None
+
+    async def _index_single(self, retriever: Retriever, document: ParsedDocument, content: str) -> Retriever:
+        try:
+            embeddings = await self.get_embeddings([content])
         except Exception as e:
-            print(f"External query embedding failed, using local search: {e}")
-            results = self.collection.query(
-                query_texts=[query],
-                n_results=3
+            print(f"External embeddings failed, falling back to local: {e}")
+            embeddings = None
+        await executors.run_io(retriever.add, document.sha256, document.filename, [content], embeddings)
+        return retriever
+
+    async def retrieve(self, document: ParsedDocument, queries: List[str], retrieval_mode: str = "hybrid") -> List[List[str]]:
+        """
+        Indexes the document if needed, then returns the top chunks for every query.
+        All query embeddings come from one batch call and all searches from one index query.
+        """
+        # The lease keeps this document's chunks out of eviction until the search is done
+        with ExitStack() as leases:
+            for candidate in self.retrievers():
+                leases.enter_context(candidate.lease(document.sha256))
+            retriever, extraction_error = await self.index_document(document)
+            if extraction_error is not None:
+                return [[extraction_error] for _ in queries]
+
+            # 4. Semantic Search (Pruning), scoped to this document
+            query_embeddings = None
+            if retrieval_mode != "bm25":
+                try:
+                    query_embeddings = await self.get_embeddings(queries)
+                except Exception as e:
+                    print(f"External query embedding failed, using local search: {e}")
+            return await executors.run_io(
+                retriever.search, document.sha256, queries, query_embeddings, 3, retrieval_mode
             )
-        
-        relevant_context = "\n---\n".join(results['documents'][0])
+
+    @staticmethod
+    def answer_prompt(query: str, snippets: List[str]) -> str:
+        relevant_context = "\n---\n".join(snippets)
         
         # 5. Final Answer
-        prompt = f"""
+        return f"""
         Answer the user's question based ONLY on the following context.
         
         Context:
@@ -94,19 +222,60 @@ class StreamDProcessor:
         
         Question: {query}
         """
-        
-        answer = await self.openai.generate_completion(
-            system_prompt="You are a precise legal/document analyst.",
-            user_prompt=prompt
+
+    async def answer(self, query: str, snippets: List[str]) -> str:
+        return await self.openai.generate_completion(
+            system_prompt=ANSWER_SYSTEM_PROMPT,
+            user_prompt=self.answer_prompt(query, snippets)
         )
-        
-        # Cleanup (ephemeral)
-        self.collection.delete(ids=chunk_ids)
+
+    async def process(self, document: ParsedDocument, query: str, retrieval_mode: str = "hybrid"):
+        """
+        Answers `query` from the document's most relevant chunks.
+        `retrieval_mode` is "vector", "bm25" or "hybrid" (reciprocal-rank fusion of both).
+        """
+        snippets = (await self.retrieve(document, [query], retrieval_mode))[0]
+        answer = await self.answer(query, snippets)
 
         return {
             "status": "success",
             "answer": answer,
-            "relevant_context_snippets": results['documents'][0]
+            "relevant_context_snippets": snippets
+        }
+
+    async def stream(self, document: ParsedDocument, query: str, retrieval_mode: str = "hybrid") -> AsyncIterator[Tuple[str, dict]]:
+        """
+        Streaming variant of process(): yields ("context", ...) as soon as retrieval is done,
+        then ("token", ...) per LLM delta and a final ("done", ...) with the full answer.
+        """
+        snippets = (await self.retrieve(document, [query], retrieval_mode))[0]
+        yield "context", {"relevant_context_snippets": snippets}
+
+        parts = []
+        async for delta in self.openai.stream_completion(
+            system_prompt=ANSWER_SYSTEM_PROMPT,
+            user_prompt=self.answer_prompt(query, snippets)
+        ):
+            parts.append(delta)
+            yield "token", {"text": delta}
+        yield "done", {"status": "success", "answer": "".join(parts), "relevant_context_snippets": snippets}
+
+    async def process_many(self, document: ParsedDocument, queries: List[str], retrieval_mode: str = "hybrid"):
+        """
+        Answers a list of questions about one document: extraction and indexing happen once,
+        retrieval is batched, and the answer calls run concurrently (at most ANSWER_CONCURRENCY at a time).
+        """
+        contexts = await self.retrieve(document, queries, retrieval_mode)
+        semaphore = asyncio.Semaphore(ANSWER_CONCURRENCY)
+
+        async def answer_one(query: str, snippets: List[str]):
+            async with semaphore:
+                return {"query": query, "answer": await self.answer(query, snippets), "relevant_context_snippets": snippets}
+
+        answers = await asyncio.gather(*(answer_one(q, snippets) for q, snippets in zip(queries, contexts)))
+        return {
+            "status": "success",
+            "answers": list(answers)
         }
 
 stream_d = StreamDProcessor()
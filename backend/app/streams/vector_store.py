@@ -0,0 +1,265 @@
+import os
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+from app.clients.local_embeddings import LocalEmbeddingFunction
+from app.streams.bm25 import BM25Index
+from app.streams.retrievers import Retriever, normalize, top_k_indices
+
+DEFAULT_VECTOR_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "cache", "stream_d_vectors")
+
+PRECISIONS = ("float32", "int8")
+
+
+def quantize(vectors: np.ndarray):
+    """
+    Symmetric per-row int8 quantization: returns (codes, scales) with vectors ~= codes * scales[:, None].
+    """
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class MemmapRetriever(Retriever):
+    """
+    Persistent Stream D retriever that keeps vectors in memory-mapped NumPy files
+    instead of Python lists or a resident matrix, so large documents fit on small nodes.
+    Vectors are stored once as normalized float32 rows (4 bytes per dimension, half of
+    the float64 lists the embedding clients return). With `precision="int8"` a second
+    file of int8 codes (1 byte per dimension) is what gets scanned: the top
+    k * `rescore_factor` candidates by approximate score are then re-scored against
+    the float32 rows, so only those rows are ever paged in at full precision.
+    Scans run in blocks of `block_rows`, bounding the working set regardless of size.
+    Chunk texts, BM25 indexes and the document registry live in SQLite; eviction
+    (TTL, then LRU beyond `max_documents`) never removes a leased document.
+    """
+
+    def __init__(self, path: str, precision: str = "int8", rescore_factor: int = 4, ttl_seconds: float = 7 * 86400,
+                 max_documents: int = 1000, block_rows: int = 8192, bm25_cache_size: int = 64):
+        super().__init__()
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown vector precision '{precision}'. Use one of {', '.join(PRECISIONS)}.")
+        self.path = path
+        self.precision = precision
+        self.rescore_factor = max(1, rescore_factor)
+        self.ttl_seconds = ttl_seconds
+        self.max_documents = max_documents
+        self.block_rows = block_rows
+        os.makedirs(os.path.join(path, "vectors"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._registry = sqlite3.connect(os.path.join(path, "registry.db"), check_same_thread=False)
+        self._registry.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "doc_id TEXT PRIMARY KEY, filename TEXT, chunk_count INTEGER, dim INTEGER, local INTEGER, "
+            "precision TEXT, indexed_at REAL, last_access REAL)"
+        )
+        self._registry.execute("CREATE TABLE IF NOT EXISTS chunks (doc_id TEXT, chunk INTEGER, text TEXT, PRIMARY KEY (doc_id, chunk))")
+        self._registry.execute("CREATE TABLE IF NOT EXISTS bm25 (doc_id TEXT PRIMARY KEY, data TEXT)")
+        self._registry.commit()
+        self._bm25: OrderedDict = OrderedDict()
+        self.bm25_cache_size = bm25_cache_size
+        self._embedding_function: Optional[LocalEmbeddingFunction] = None
+
+    @classmethod
+    def from_env(cls) -> "MemmapRetriever":
+        return cls(
+            path=os.getenv("STREAM_D_VECTOR_DIR", DEFAULT_VECTOR_DIR),
+            precision=os.getenv("STREAM_D_VECTOR_PRECISION", "int8").lower(),
+            rescore_factor=int(os.getenv("STREAM_D_RESCORE_FACTOR", "4")),
+            ttl_seconds=float(os.getenv("STREAM_D_INDEX_TTL", str(7 * 86400))),
+            max_documents=int(os.getenv("STREAM_D_INDEX_MAX_DOCS", "1000")),
+        )
+
+    def _local_embed(self, texts: List[str]) -> np.ndarray:
+        if self._embedding_function is None:
+            self._embedding_function = LocalEmbeddingFunction.from_env()
+        return self._embedding_function.embedder.embed(texts)
+
+    def _directory(self, doc_id: str, partial: bool = False) -> str:
+        # Document ids are hashed so any id is a safe directory name
+        name = hashlib.sha256(doc_id.encode()).hexdigest()[:32]
+        return os.path.join(self.path, "vectors", name + (".partial" if partial else ""))
+
+    def has(self, doc_id: str) -> bool:
+        with self._lock:
+            row = self._registry.execute("SELECT indexed_at FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+            if row is None:
+                return False
+            if time.time() - row[0] > self.ttl_seconds and not self._is_leased(doc_id):
+                self._delete(doc_id)
+                return False
+            self._registry.execute("UPDATE documents SET last_access = ? WHERE doc_id = ?", (time.time(), doc_id))
+            self._registry.commit()
+            return True
+
+    def add_chunks(self, doc_id: str, filename: str, start: int, chunks: List[str], embeddings=None):
+        """
+        Appends one batch of vectors to the document's partial files. The document stays
+        invisible to has() until commit_document() moves the files into place.
+        """
+        vectors = self._local_embed(chunks) if embeddings is None else normalize(embeddings)
+        directory = self._directory(doc_id, partial=True)
+        if start == 0:
+            # A fresh pass replaces whatever an interrupted one left behind
+            shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "full.f32"), "ab") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        if self.precision == "int8":
+            codes, scales = quantize(vectors)
+            with open(os.path.join(directory, "codes.i8"), "ab") as f:
+                f.write(codes.tobytes())
+            with open(os.path.join(directory, "scales.f32"), "ab") as f:
+                f.write(scales.tobytes())
+        with self._lock:
+            self._registry.executemany(
+                "INSERT OR REPLACE INTO chunks (doc_id, chunk, text) VALUES (?, ?, ?)",
+                [(doc_id, start + i, chunk) for i, chunk in enumerate(chunks)]
+            )
+            self._registry.commit()
+
+    def commit_document(self, doc_id: str, filename: str, chunk_count: int, local: bool, bm25: BM25Index):
+        partial, final = self._directory(doc_id, partial=True), self._directory(doc_id)
+        full_path = os.path.join(partial, "full.f32")
+        size = os.path.getsize(full_path) if os.path.exists(full_path) else 0
+        dim = size // (4 * chunk_count) if chunk_count else 0
+        now = time.time()
+        with self._lock:
+            shutil.rmtree(final, ignore_errors=True)
+            if os.path.exists(partial):
+                os.replace(partial, final)
+            self._registry.execute("INSERT OR REPLACE INTO bm25 (doc_id, data) VALUES (?, ?)",
+                                   (doc_id, json.dumps(bm25.to_dict())))
+            self._remember_bm25(doc_id, bm25)
+            self._registry.execute(
+                "INSERT OR REPLACE INTO documents (doc_id, filename, chunk_count, dim, local, precision, indexed_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (doc_id, filename, chunk_count, dim, int(local), self.precision, now, now),
+            )
+            self._registry.commit()
+            self._evict()
+
+    def _document(self, doc_id: str):
+        with self._lock:
+            row = self._registry.execute(
+                "SELECT chunk_count, dim, local, precision FROM documents WHERE doc_id = ?", (doc_id,)
+            ).fetchone()
+        if row is None:
+            raise KeyError(f"Document {doc_id} is not indexed.")
+        return row
+
+    def _open(self, doc_id: str, name: str, dtype, shape) -> np.ndarray:
+        return np.memmap(os.path.join(self._directory(doc_id), name), dtype=dtype, mode="r", shape=shape)
+
+    def _scan(self, matrix: np.ndarray, queries: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        (queries x rows) scores, computed block by block so only `block_rows` rows are converted at a time.
+        """
+        scores = np.empty((len(queries), matrix.shape[0]), dtype=np.float32)
+        for start in range(0, matrix.shape[0], self.block_rows):
+            block = np.asarray(matrix[start:start + self.block_rows], dtype=np.float32)
+            scores[:, start:start + len(block)] = queries @ block.T
+            if scales is not None:
+                scores[:, start:start + len(block)] *= scales[start:start + len(block)]
+        return scores
+
+    def vector_rankings(self, doc_id: str, query_texts: List[str], query_embeddings, k: int) -> List[List[int]]:
+        chunk_count, dim, local, precision = self._document(doc_id)
+        if local:
+            queries = self._local_embed(query_texts)
+        elif query_embeddings is None:
+            raise ValueError(f"Document {doc_id} was indexed with external embeddings; query embeddings are required.")
+        else:
+            queries = normalize(query_embeddings)
+        if chunk_count == 0:
+            return [[] for _ in range(len(queries))]
+
+        full = self._open(doc_id, "full.f32", np.float32, (chunk_count, dim))
+        if precision == "float32":
+            return top_k_indices(self._scan(full, queries), k)
+
+        codes = self._open(doc_id, "codes.i8", np.int8, (chunk_count, dim))
+        scales = self._open(doc_id, "scales.f32", np.float32, (chunk_count,))
+        candidates = top_k_indices(self._scan(codes, queries, scales), k * self.rescore_factor)
+        rankings = []
+        for query, rows in zip(queries, candidates):
+            # Sorted row order keeps the reads from the float32 file sequential
+            rows = np.sort(np.asarray(rows, dtype=np.int64))
+            exact = np.asarray(full[rows], dtype=np.float32) @ query
+            rankings.append(rows[np.argsort(-exact)[:k]].tolist())
+        return rankings
+
+    def chunks(self, doc_id: str, indices: List[int]) -> List[str]:
+        if not indices:
+            return []
+        with self._lock:
+            placeholders = ", ".join("?" for _ in indices)
+            rows = self._registry.execute(
+                f"SELECT chunk, text FROM chunks WHERE doc_id = ? AND chunk IN ({placeholders})", (doc_id, *indices)
+            ).fetchall()
+        by_index = dict(rows)
+        return [by_index[i] for i in indices if i in by_index]
+
+    def _remember_bm25(self, doc_id: str, bm25: BM25Index):
+        self._bm25[doc_id] = bm25
+        self._bm25.move_to_end(doc_id)
+        while len(self._bm25) > self.bm25_cache_size:
+            self._bm25.popitem(last=False)
+
+    def bm25(self, doc_id: str) -> BM25Index:
+        with self._lock:
+            bm25 = self._bm25.get(doc_id)
+            if bm25 is None:
+                row = self._registry.execute("SELECT data FROM bm25 WHERE doc_id = ?", (doc_id,)).fetchone()
+                if row is None:
+                    raise KeyError(f"Document {doc_id} is not indexed.")
+                bm25 = BM25Index.from_dict(json.loads(row[0]))
+            self._remember_bm25(doc_id, bm25)
+            return bm25
+
+    def is_local(self, doc_id: str) -> bool:
+        with self._lock:
+            row = self._registry.execute("SELECT local FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+        return bool(row and row[0])
+
+    def delete(self, doc_id: str):
+        with self._lock:
+            self._delete(doc_id)
+
+    def _delete(self, doc_id: str):
+        shutil.rmtree(self._directory(doc_id), ignore_errors=True)
+        shutil.rmtree(self._directory(doc_id, partial=True), ignore_errors=True)
+        self._registry.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+        self._registry.execute("DELETE FROM chunks WHERE doc_id = ?", (doc_id,))
+        self._registry.execute("DELETE FROM bm25 WHERE doc_id = ?", (doc_id,))
+        self._bm25.pop(doc_id, None)
+        self._registry.commit()
+
+    def _evict(self):
+        cutoff = time.time() - self.ttl_seconds
+        expired = [r[0] for r in self._registry.execute("SELECT doc_id FROM documents WHERE indexed_at < ?", (cutoff,))]
+        overflow = [r[0] for r in self._registry.execute(
+            "SELECT doc_id FROM documents ORDER BY last_access DESC LIMIT -1 OFFSET ?", (self.max_documents,)
+        )]
+        for doc_id in dict.fromkeys(expired + overflow):
+            if not self._is_leased(doc_id):
+                self._delete(doc_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            documents, chunks, float32_bytes, int8_bytes = self._registry.execute(
+                "SELECT COUNT(*), COALESCE(SUM(chunk_count), 0), COALESCE(SUM(chunk_count * dim * 4), 0), "
+                "COALESCE(SUM(CASE WHEN precision = 'int8' THEN chunk_count * (dim + 4) ELSE 0 END), 0) FROM documents"
+            ).fetchone()
+        return {"documents": documents, "chunks": chunks, "leased": self._leased_count(), "precision": self.precision,
+                "rescore_factor": self.rescore_factor, "float32_bytes": float32_bytes, "int8_bytes": int8_bytes,
+                "max_documents": self.max_documents, "ttl_seconds": self.ttl_seconds}
@@ -0,0 +1,133 @@
+"""
+Concurrency benchmark for the executor layer.
+
+Runs N in-flight Stream B (PyMuPDF) and Stream C (Azure) requests against a
+simulated slow Azure poll and LLM, while a probe issues lightweight Gatekeeper
+routes every few milliseconds. Compares blocking work inline on the event loop
+against the thread/process pools in app.core.executors.
+
+Usage: python bench_concurrency.py [--pages 40] [--azure-latency 0.5] [--levels 1,4,16,32]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import fitz
+
+from app.core.document import ParsedDocument
+from app.core.executors import executors
+from app.core.gatekeeper import gatekeeper
+from app.clients.azure_client import azure_client
+from app.clients.fal_client import fal_client_instance
+from app.streams.stream_b import stream_b
+from app.streams.stream_c import stream_c
+
+
+def make_pdf(pages: int) -> bytes:
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        text = f"Form 1040 page {i}. Wages, salaries, tips 48,250.00. Adjusted gross income 52,000.00. " * 12
+        page.insert_textbox(fitz.Rect(36, 36, 560, 800), text, fontsize=8)
+    content = doc.tobytes()
+    doc.close()
+    return content
+
+
+class FakeLayoutResult:
+    def __init__(self, content):
+        self.content = content
+
+
+def install_fakes(azure_latency: float, llm_latency: float):
+    azure_client.client = object()
+    azure_client.layout_cache = None
+
+    def slow_layout(file_content: bytes):
+        time.sleep(azure_latency)
+        return FakeLayoutResult("Invoice 42 Total 100.00")
+
+    async def fake_completion(system_prompt, user_prompt, model="", **kwargs):
+        await asyncio.sleep(llm_latency)
+        return "{}"
+
+    azure_client.analyze_layout_result = slow_layout
+    fal_client_instance.generate_completion = fake_completion
+
+
+def install_inline_executors():
+    """
+    Baseline: blocking calls run directly on the event loop, as before the executor layer.
+    """
+    async def inline(fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+    executors.run_io = inline
+    executors.run_cpu = inline
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def heavy_request(i: int, pdf: bytes) -> float:
+    start = time.perf_counter()
+    if i % 2 == 0:
+        await stream_b.process(ParsedDocument(pdf, f"return_{i}.pdf"))
+    else:
+        await stream_c.process(ParsedDocument(b"\x89PNG", f"invoice_{i}.png"), "Extract totals")
+    return time.perf_counter() - start
+
+
+async def probe(stop: asyncio.Event, interval: float):
+    latencies = []
+    light = ParsedDocument(b"a,b\n1,2\n", "data.csv")
+    while not stop.is_set():
+        start = time.perf_counter()
+        await gatekeeper.route(light)
+        await asyncio.sleep(0)
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def run_level(n: int, pdf: bytes, probe_interval: float):
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(stop, probe_interval))
+    heavy = await asyncio.gather(*(heavy_request(i, pdf) for i in range(n)))
+    stop.set()
+    light = await probe_task
+    return heavy, light
+
+
+async def main(args):
+    install_fakes(args.azure_latency, args.llm_latency)
+    if args.mode == "inline":
+        install_inline_executors()
+    pdf = make_pdf(args.pages)
+
+    # Warm the pools so process start-up is not counted
+    await run_level(1, pdf, args.probe_interval)
+
+    print(f"mode={args.mode} pages={args.pages} azure_latency={args.azure_latency}s "
+          f"io_workers={executors.io_workers} cpu_workers={executors.cpu_workers}")
+    print(f"{'N':>4} | {'heavy p50':>10} {'heavy p99':>10} | {'probe p50':>10} {'probe p99':>10} {'probes':>7}")
+    for n in args.levels:
+        heavy, light = await run_level(n, pdf, args.probe_interval)
+        print(f"{n:>4} | {statistics.median(heavy)*1000:>8.1f}ms {percentile(heavy, 99)*1000:>8.1f}ms | "
+              f"{statistics.median(light)*1000:>8.2f}ms {percentile(light, 99)*1000:>8.2f}ms {len(light):>7}")
+    executors.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["executor", "inline"], default="executor")
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--azure-latency", type=float, default=0.5)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--probe-interval", type=float, default=0.005)
+    parser.add_argument("--levels", type=lambda s: [int(x) for x in s.split(",")], default=[1, 4, 16, 32])
+    asyncio.run(main(parser.parse_args()))
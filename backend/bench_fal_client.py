@@ -0,0 +1,100 @@
+"""
+Benchmark for the pooled FalClient HTTP client.
+
+Starts a local stub of the fal.run/fal-ai/any-llm endpoint and compares the
+shared keep-alive client against creating a new httpx.AsyncClient per call
+(the previous behaviour).
+
+Usage: python bench_fal_client.py [--requests 500] [--concurrency 32] [--stub-latency 0.01]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import threading
+import time
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+
+def build_stub(latency: float) -> FastAPI:
+    stub = FastAPI()
+
+    @stub.post("/fal-ai/any-llm")
+    async def any_llm(payload: dict):
+        await asyncio.sleep(latency)
+        return {"output": "ok"}
+
+    return stub
+
+
+def start_stub(latency: float) -> str:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+
+    server = uvicorn.Server(uvicorn.Config(build_stub(latency), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+async def per_call_client(base_url: str):
+    async with httpx.AsyncClient() as client:
+        resp = await client.post(f"{base_url}/fal-ai/any-llm", json={"prompt": "hi"}, timeout=30.0)
+        return resp.json().get("output", "")
+
+
+async def measure(call, total: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "throughput": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))] * 1000,
+    }
+
+
+async def main(args):
+    base_url = start_stub(args.stub_latency)
+    os.environ["FAL_KEY"] = "bench"
+    os.environ["FAL_BASE_URL"] = base_url
+
+    from app.clients.fal_client import FalClient
+    pooled = FalClient()
+    await pooled.startup()
+
+    runs = {
+        "per-call AsyncClient": lambda: per_call_client(base_url),
+        "pooled FalClient": lambda: pooled.generate_completion("system", "user"),
+    }
+    print(f"stub={base_url} requests={args.requests} concurrency={args.concurrency} stub_latency={args.stub_latency}s")
+    for name, call in runs.items():
+        await measure(call, min(50, args.requests), args.concurrency)  # warm-up
+        stats = await measure(call, args.requests, args.concurrency)
+        print(f"{name:>22}: {stats['throughput']:8.1f} req/s  p50 {stats['p50_ms']:7.2f}ms  p99 {stats['p99_ms']:7.2f}ms")
+    await pooled.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--stub-latency", type=float, default=0.01)
+    asyncio.run(main(parser.parse_args()))
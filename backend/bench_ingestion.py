@@ -0,0 +1,113 @@
+"""
+Ingestion throughput benchmark for Stream A.
+
+Builds one synthetic table of N nested order records and encodes it as CSV, JSON,
+NDJSON, XML and a 12-sheet XLSX workbook, then times the Stream A readers against the
+pandas one-liners they replace:
+  - JSON / NDJSON: streaming decode + json_normalize vs json.loads + json_normalize
+  - XML: iterparse over the records vs pd.read_xml(parser="etree")
+  - XLSX: calamine vs openpyxl, one referenced sheet vs every sheet
+  - a bounded PROMPT_SAMPLE_ROWS-style read of each format
+Reports seconds (best of R runs), rows/s and MB/s of input.
+
+Usage: python bench_ingestion.py [--rows 200000] [--sheet-rows 20000] [--sample 200] [--repeat 3]
+"""
+import argparse
+import io
+import json
+import time
+
+import pandas as pd
+
+from app.streams import ingestion
+
+
+def make_records(n: int):
+    cities = ["Oslo", "Rome", "Lima", "Pune", "Kyiv"]
+    return [{"id": i, "total": round(i * 0.37 % 500, 2), "status": "paid" if i % 3 else "open",
+             "customer": {"name": f"customer {i % 997}", "address": {"city": cities[i % 5], "zip": f"{i % 90000:05d}"}}}
+            for i in range(n)]
+
+
+def encode(records, sheet_rows: int):
+    flat = pd.json_normalize(records)
+    xml = io.StringIO()
+    xml.write("<orders>")
+    for r in records:
+        c = r["customer"]
+        xml.write(f'<order id="{r["id"]}"><total>{r["total"]}</total><status>{r["status"]}</status>'
+                  f'<customer><name>{c["name"]}</name><address><city>{c["address"]["city"]}</city>'
+                  f'<zip>{c["address"]["zip"]}</zip></address></customer></order>')
+    xml.write("</orders>")
+    workbook = io.BytesIO()
+    with pd.ExcelWriter(workbook, engine="openpyxl") as writer:
+        for month in ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]:
+            flat.head(sheet_rows).to_excel(writer, sheet_name=month, index=False)
+    return {
+        "csv": flat.to_csv(index=False).encode(),
+        "json": json.dumps(records).encode(),
+        "ndjson": "\n".join(json.dumps(r) for r in records).encode(),
+        "xml": xml.getvalue().encode(),
+        "xlsx": workbook.getvalue(),
+    }
+
+
+def best(fn, repeat: int):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = fn()
+        times.append(time.perf_counter() - start)
+        del df
+    return min(times)
+
+
+def report(label: str, seconds: float, rows: int, size: int):
+    print(f"{label:<42} {seconds:>8.3f}s {rows / seconds:>12,.0f} {size / seconds / 2**20:>8.1f}")
+
+
+def main(args):
+    files = encode(make_records(args.rows), args.sheet_rows)
+    print(f"rows={args.rows} sheet_rows={args.sheet_rows} x 12 sheets  sizes: "
+          + ", ".join(f"{k}={len(v) / 2**20:.1f}MB" for k, v in files.items()))
+    print(f"{'reader':<42} {'best':>9} {'rows/s':>12} {'MB/s':>8}")
+
+    cases = [
+        ("csv  pd.read_csv", "csv", args.rows, lambda c: pd.read_csv(io.BytesIO(c))),
+        ("json json.loads + json_normalize", "json", args.rows, lambda c: pd.json_normalize(json.loads(c))),
+        ("json streaming reader", "json", args.rows, lambda c: ingestion.read_table(c, "x.json")),
+        ("ndjson pd.read_json(lines) + normalize", "ndjson", args.rows,
+         lambda c: pd.json_normalize(pd.read_json(io.BytesIO(c), lines=True).to_dict(orient="records"))),
+        ("ndjson streaming reader", "ndjson", args.rows, lambda c: ingestion.read_table(c, "x.ndjson")),
+        ("xml  pd.read_xml(parser=etree)", "xml", args.rows, lambda c: pd.read_xml(io.BytesIO(c), parser="etree")),
+        ("xml  iterparse reader", "xml", args.rows, lambda c: ingestion.read_table(c, "x.xml")),
+    ]
+    for label, fmt, rows, fn in cases:
+        report(label, best(lambda: fn(files[fmt]), args.repeat), rows, len(files[fmt]))
+
+    workbook = files["xlsx"]
+    sheets = ingestion.sheet_names(workbook)
+    for engine in ("openpyxl", "calamine"):
+        ingestion.EXCEL_ENGINE = engine
+        try:
+            report(f"xlsx {engine} all 12 sheets", best(lambda: ingestion.read_table(workbook, "x.xlsx", sheets=sheets),
+                                                         args.repeat), args.sheet_rows * 12, len(workbook))
+            report(f"xlsx {engine} referenced sheet only", best(lambda: ingestion.read_table(workbook, "x.xlsx", sheets=["Mar"]),
+                                                                 args.repeat), args.sheet_rows, len(workbook))
+        except ImportError as e:
+            print(f"xlsx {engine}: skipped ({e})")
+    ingestion.EXCEL_ENGINE = "auto"
+
+    print(f"bounded sample reads (nrows={args.sample}):")
+    for fmt in ("csv", "json", "ndjson", "xml", "xlsx"):
+        report(f"  {fmt}", best(lambda: ingestion.read_table(files[fmt], f"x.{fmt}", nrows=args.sample), args.repeat),
+               args.sample, len(files[fmt]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--sheet-rows", type=int, default=20000)
+    parser.add_argument("--sample", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,85 @@
+"""
+Retriever crossover benchmark for Stream D.
+
+Indexes one synthetic document of N chunks into the in-memory NumPy retriever and
+into the persistent Chroma index, then runs vector queries against each. Reports
+index time, per-query latency and the time to answer Q questions about a freshly
+uploaded document (index + Q queries), which is the cost an ephemeral upload pays.
+
+Usage: python bench_retrievers.py [--sizes 10,50,200,1000,5000,20000] [--dim 1536] [--queries 10]
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from app.streams.bm25 import BM25Index
+from app.streams.document_index import DocumentIndex
+from app.streams.retrievers import InMemoryRetriever
+
+
+def make_document(n: int, dim: int, seed: int):
+    rng = np.random.default_rng(seed)
+    chunks = [f"Clause {i}: obligations of the supplier number {i} in detail." for i in range(n)]
+    embeddings = rng.normal(size=(n, dim)).astype(np.float32)
+    return chunks, embeddings
+
+
+def time_backend(retriever, doc_id: str, chunks, embeddings, queries, batch: int = 64):
+    """
+    Returns (index seconds, median query seconds).
+    """
+    start = time.perf_counter()
+    for offset in range(0, len(chunks), batch):
+        retriever.add_chunks(doc_id, "bench.pdf", offset, chunks[offset:offset + batch], embeddings[offset:offset + batch])
+    retriever.commit_document(doc_id, "bench.pdf", len(chunks), False, BM25Index.build(chunks))
+    index_seconds = time.perf_counter() - start
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        retriever.search(doc_id, ["supplier obligations"], query.reshape(1, -1), n_results=3, mode="vector")
+        latencies.append(time.perf_counter() - start)
+    return index_seconds, float(np.median(latencies))
+
+
+def main(args):
+    print(f"dim={args.dim} queries={args.queries}")
+    print(f"{'chunks':>7} | {'memory index':>12} {'query':>9} {'total':>9} | "
+          f"{'chroma index':>12} {'query':>9} {'total':>9} | {'RAM':>7} | winner")
+    crossover = None
+    for n in args.sizes:
+        chunks, embeddings = make_document(n, args.dim, seed=n)
+        queries = np.random.default_rng(0).normal(size=(args.queries, args.dim)).astype(np.float32)
+
+        memory_index, memory_query = time_backend(InMemoryRetriever(), f"doc-{n}", chunks, embeddings, queries)
+
+        path = tempfile.mkdtemp(prefix="bench_chroma_")
+        try:
+            chroma_index, chroma_query = time_backend(DocumentIndex(path), f"doc-{n}", chunks, embeddings, queries)
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+        memory_total = memory_index + args.queries * memory_query
+        chroma_total = chroma_index + args.queries * chroma_query
+        winner = "memory" if memory_total <= chroma_total else "chroma"
+        if winner == "chroma" and crossover is None:
+            crossover = n
+        print(f"{n:>7} | {memory_index*1000:>10.1f}ms {memory_query*1000:>7.2f}ms {memory_total*1000:>7.1f}ms | "
+              f"{chroma_index*1000:>10.1f}ms {chroma_query*1000:>7.2f}ms {chroma_total*1000:>7.1f}ms | "
+              f"{embeddings.nbytes / 2**20:>5.1f}MB | {winner}")
+    if crossover:
+        print(f"Chroma starts winning at ~{crossover} chunks for {args.queries} questions per upload.")
+    else:
+        print("The in-memory retriever won at every size tested; its limit is the RAM column, "
+              "which is what STREAM_D_MEMORY_MAX_CHUNKS / STREAM_D_MEMORY_MAX_MB bound.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=[10, 50, 200, 1000, 5000, 20000])
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=10)
+    main(parser.parse_args())
@@ -0,0 +1,88 @@
+"""
+Recall-vs-memory benchmark for the memory-mapped Stream D vector store.
+
+Indexes N synthetic, clustered embeddings (closer to real text embeddings than pure
+noise) and compares, against exact float32 search:
+  - float32 memmap: exact, 4 bytes per dimension
+  - int8 memmap at several rescore factors: 1 byte per dimension scanned, top
+    k * factor candidates re-scored against the float32 rows
+Reports recall@k, median query latency and bytes per stored vector, next to the
+float64 Python lists the embedding clients return.
+
+Usage: python bench_vector_store.py [--chunks 100000] [--dim 1536] [--queries 50] [--k 10] [--factors 1,2,4,8]
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from app.streams.bm25 import BM25Index
+from app.streams.vector_store import MemmapRetriever
+
+
+def make_embeddings(n: int, dim: int, seed: int = 0, clusters: int = 256):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, size=n)] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def build(path: str, precision: str, vectors: np.ndarray, batch: int = 4096) -> MemmapRetriever:
+    store = MemmapRetriever(path, precision=precision)
+    chunks = [f"chunk {i}" for i in range(len(vectors))]
+    for offset in range(0, len(vectors), batch):
+        store.add_chunks("bench", "bench.pdf", offset, chunks[offset:offset + batch], vectors[offset:offset + batch])
+    store.commit_document("bench", "bench.pdf", len(vectors), False, BM25Index.build([]))
+    return store
+
+
+def evaluate(store: MemmapRetriever, queries: np.ndarray, truth: list, k: int):
+    hits, latencies = 0, []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        ranking = store.vector_rankings("bench", ["q"], query.reshape(1, -1), k)[0]
+        latencies.append(time.perf_counter() - start)
+        hits += len(set(ranking) & set(expected))
+    return hits / (k * len(queries)), float(np.median(latencies))
+
+
+def main(args):
+    vectors = make_embeddings(args.chunks, args.dim)
+    queries = make_embeddings(args.queries, args.dim, seed=1)
+    truth = (queries @ vectors.T).argsort(axis=1)[:, ::-1][:, :args.k].tolist()
+
+    float64_list_bytes = sys.getsizeof([0.0] * args.dim) + args.dim * sys.getsizeof(0.0)
+    print(f"chunks={args.chunks} dim={args.dim} queries={args.queries} k={args.k}")
+    print(f"{'storage':<22} {'recall@k':>8} {'query':>9} {'scanned/vec':>12} {'total scanned':>14}")
+    print(f"{'float64 python lists':<22} {1.0:>8.3f} {'-':>9} {float64_list_bytes:>10}B "
+          f"{float64_list_bytes * args.chunks / 2**20:>12.1f}MB")
+
+    path = tempfile.mkdtemp(prefix="bench_vectors_")
+    try:
+        store = build(path + "/f32", "float32", vectors)
+        recall, latency = evaluate(store, queries, truth, args.k)
+        print(f"{'float32 memmap':<22} {recall:>8.3f} {latency*1000:>7.2f}ms {args.dim * 4:>10}B "
+              f"{args.dim * 4 * args.chunks / 2**20:>12.1f}MB")
+
+        store = build(path + "/i8", "int8", vectors)
+        for factor in args.factors:
+            store.rescore_factor = factor
+            recall, latency = evaluate(store, queries, truth, args.k)
+            print(f"{f'int8 memmap x{factor} rescore':<22} {recall:>8.3f} {latency*1000:>7.2f}ms {args.dim + 4:>10}B "
+                  f"{(args.dim + 4) * args.chunks / 2**20:>12.1f}MB")
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+    print("int8 keeps the float32 file on disk for re-scoring; only k * factor rows per query are read from it.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--factors", type=lambda s: [int(x) for x in s.split(",")], default=[1, 2, 4, 8])
+    main(parser.parse_args())
@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
@@ -6,17 +7,47 @@ import os
 # Load environment variables
 load_dotenv()
 
+from app.core.executors import executors
+from app.core.sandbox import sandbox_pool
+from app.clients.fal_client import fal_client_instance
+from app.services.transaction_log import transaction_logger
+from app.services.jobs import job_manager
+from app.services.corpus import corpus_indexer
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled, keep-alive HTTP client for all Fal.ai calls in this process
+    await fal_client_instance.startup()
+    await transaction_logger.start()
+    await job_manager.start()
+    await corpus_indexer.start()
+    # Pre-warm the Stream A code sandbox so the first transform does not pay process start-up
+    await sandbox_pool.start()
+    yield
+    await sandbox_pool.stop()
+    await corpus_indexer.stop()
+    await job_manager.stop()
+    await transaction_logger.stop()
+    await fal_client_instance.aclose()
+    # Release the blocking-work thread / process pools on shutdown
+    executors.shutdown()
+
 app = FastAPI(
     title="DocuMind API",
     description="Enterprise-Grade Hybrid AI Document Orchestrator",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 from app.api import router as api_router
 from app.routers.testing import router as testing_router
+from app.routers.jobs import router as jobs_router
+from app.routers.corpora import router as corpora_router
 
 app.include_router(api_router, prefix="/api/v1")
 app.include_router(testing_router, prefix="/api/v1/testing")
+app.include_router(jobs_router, prefix="/api/v1/jobs")
+app.include_router(corpora_router, prefix="/api/v1/corpora")
 
 # Configure CORS
 origins = [
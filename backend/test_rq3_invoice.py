@@ -4,6 +4,7 @@ load_dotenv()
 import asyncio
 import json
 from app.core.gatekeeper import gatekeeper
+from app.core.document import ParsedDocument
 from app.streams.stream_c import stream_c
 from app.streams.stream_b import stream_b
 
@@ -17,15 +18,16 @@ async def main():
 
     # 1. Test Gatekeeper routing
     print("=== Step 1: Gatekeeper Routing ===")
-    stream = await gatekeeper.route(content, FILENAME)
+    document = ParsedDocument(content, FILENAME)
+    stream = await gatekeeper.route(document)
     print(f"Routed to Stream: {stream}")
 
     # 2. Run through the routed stream
     print(f"\n=== Step 2: Processing via Stream {stream} ===")
     if stream == "C":
-        result = await stream_c.process(content, FILENAME, EXTRACTION_QUERY)
+        result = await stream_c.process(document, EXTRACTION_QUERY)
     elif stream == "B":
-        result = await stream_b.process(content, FILENAME)
+        result = await stream_b.process(document)
     else:
         print(f"Unexpected stream: {stream}")
         return
@@ -4,6 +4,7 @@ load_dotenv()
 import asyncio
 import json
 from app.core.gatekeeper import gatekeeper
+from app.core.document import ParsedDocument
 from app.streams.stream_b import stream_b
 from app.streams.stream_c import stream_c
 from app.streams.stream_d import stream_d
@@ -48,16 +49,17 @@ async def test_sample(sample):
         print(f"Ground Truth: {json.dumps(gt, indent=2)}")
 
     # Routing
-    stream = await gatekeeper.route(content, filename)
+    document = ParsedDocument(content, filename)
+    stream = await gatekeeper.route(document)
     print(f"\n→ Gatekeeper routed to: Stream {stream}")
 
     # Process
     if stream == "B":
-        result = await stream_b.process(content, filename)
+        result = await stream_b.process(document)
     elif stream == "C":
-        result = await stream_c.process(content, filename, query)
+        result = await stream_c.process(document, query)
     elif stream == "D":
-        result = await stream_d.process(content, filename, query)
+        result = await stream_d.process(document, query)
     else:
         result = {"status": "error", "message": f"Unexpected stream: {stream}"}
 
@@ -4,6 +4,7 @@ load_dotenv()
 import asyncio
 import json
 from app.core.gatekeeper import gatekeeper
+from app.core.document import ParsedDocument
 from app.streams.stream_b import stream_b
 
 PDF_PATH = r"D:\Projects\DocuMind\datasources\Test\RQ2_Cost_Optimization\f1040--2025.pdf"
@@ -14,7 +15,8 @@ async def main():
 
     # 1. Test routing
     print("=== Step 1: Gatekeeper Routing ===")
-    stream = await gatekeeper.route(content, filename)
+    document = ParsedDocument(content, filename)
+    stream = await gatekeeper.route(document)
     print(f"Routed to Stream: {stream}")
     
     if stream != "B":
@@ -23,7 +25,7 @@ async def main():
     
     # 2. Test Stream B process
     print("\n=== Step 2: Stream B Processing ===")
-    result = await stream_b.process(content, filename)
+    result = await stream_b.process(document)
 
     extracted = result.get("extracted", {})
     metadata = extracted.get("_metadata", {})
@@ -1,6 +1,7 @@
 import asyncio
 import sys
 from app.streams.stream_b import stream_b
+from app.core.document import ParsedDocument
 import json
 
 async def main():
@@ -8,7 +9,7 @@ async def main():
         path = r"D:\Projects\DocuMind\datasources\Test\RQ2_Cost_Optimization\Digital_Native\f1040--2025.pdf"
         with open(path, 'rb') as f:
             content = f.read()
-        res = await stream_b.process(content, "f1040--2025.pdf")
+        res = await stream_b.process(ParsedDocument(content, "f1040--2025.pdf"))
         print(json.dumps(res, indent=2))
     except Exception as e:
         import traceback
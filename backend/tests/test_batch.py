@@ -0,0 +1,77 @@
+import asyncio
+import io
+import os
+import sys
+import zipfile
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from app.services import batch as batch_module
+from app.services.batch import expand_uploads, run_batch
+
+
+def test_zip_members_are_expanded():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("leases/a.csv", "a,b\n1,2\n")
+        archive.writestr("__MACOSX/._a.csv", "junk")
+        archive.writestr("notes.txt", "hello")
+    files = expand_uploads([("batch.zip", buffer.getvalue()), ("single.csv", b"x\n1\n")])
+    assert [name for name, _ in files] == ["leases/a.csv", "notes.txt", "single.csv"]
+
+
+def test_zip_limits_are_checked_before_decompressing(monkeypatch):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("bomb.csv", b"0" * (4 * 1024 * 1024))
+        archive.writestr("small.csv", b"a\n1\n")
+    content = buffer.getvalue()
+    assert len(content) < 64 * 1024
+
+    reads = []
+    real_open = zipfile.ZipFile.open
+    monkeypatch.setattr(zipfile.ZipFile, "open", lambda self, *a, **k: reads.append(a) or real_open(self, *a, **k))
+    monkeypatch.setattr(batch_module, "MAX_UNCOMPRESSED_BYTES", 1024 * 1024)
+    with pytest.raises(ValueError, match="uncompressed"):
+        expand_uploads([("bomb.zip", content)])
+
+    monkeypatch.setattr(batch_module, "MAX_UNCOMPRESSED_BYTES", 8 * 1024 * 1024)
+    monkeypatch.setattr(batch_module, "MAX_BATCH_FILES", 1)
+    with pytest.raises(ValueError, match="limit of 1 documents"):
+        expand_uploads([("bomb.zip", content)])
+    assert reads == []
+
+    with pytest.raises(ValueError, match="not a valid zip"):
+        expand_uploads([("broken.zip", b"not a zip")])
+
+
+def test_results_stream_per_document_with_summary(monkeypatch):
+    calls = []
+    in_flight = [0, 0]
+
+    async def fake_run_stream(stream_type, document, *args):
+        calls.append(document.filename)
+        in_flight[0] += 1
+        in_flight[1] = max(in_flight[1], in_flight[0])
+        await asyncio.sleep(0.02)
+        in_flight[0] -= 1
+        return {"status": "success"}
+
+    monkeypatch.setattr(batch_module, "run_stream", fake_run_stream)
+    monkeypatch.setattr(batch_module, "log_orchestration", lambda *args: None)
+
+    uploads = [(f"file_{i}.csv", f"a\n{i}\n".encode()) for i in range(6)] + [("copy.csv", b"a\n0\n")]
+
+    async def run():
+        return [record async for record in run_batch(uploads, concurrency=2)]
+
+    records = asyncio.run(run())
+    results = [r for r in records if r["type"] == "result"]
+    summary = records[-1]
+    assert len(results) == 7
+    assert len(calls) == 6  # copy.csv shares file_0.csv's run
+    assert in_flight[1] <= 2
+    assert summary["type"] == "summary"
+    assert summary["succeeded"] == 7 and summary["by_stream"] == {"A": 7}
@@ -0,0 +1,52 @@
+import os
+import sys
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from app.streams.bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+from app.streams.document_index import DocumentIndex
+
+CHUNKS = [
+    "This Agreement shall be governed by the laws of the State of Delaware.",
+    "Either party may terminate this Agreement upon thirty days written notice.",
+    "The Supplier's total liability shall not exceed the fees paid in the prior twelve months.",
+    "Invoices are payable within 45 days of receipt.",
+]
+
+
+def test_bm25_ranks_keyword_matches():
+    bm25 = BM25Index.build(CHUNKS)
+    assert bm25.top_k("What is the governing law?", 2)[0] == 0
+    assert bm25.top_k("termination notice period", 2)[0] == 1
+    assert bm25.top_k("cap on liability", 4)[0] == 2
+    # Chunks sharing no term with the query are not returned
+    assert bm25.top_k("zebra", 4) == []
+
+    restored = BM25Index.from_dict(bm25.to_dict())
+    assert np.allclose(restored.scores("liability fees"), bm25.scores("liability fees"))
+
+
+def test_tokenize_keeps_numbers_and_drops_stopwords():
+    assert tokenize("The fees are $1,250.00 of the total") == ["fee", "1,250.00", "total"]
+    assert tokenize("governed governing terminated termination") == ["govern", "govern", "termin", "termin"]
+
+
+def test_reciprocal_rank_fusion_prefers_agreement():
+    assert reciprocal_rank_fusion([[3, 1, 2], [1, 0, 3]])[:2] == [1, 3]
+
+
+def test_hybrid_search_recovers_keyword_match_from_noisy_vectors(tmp_path):
+    index = DocumentIndex(str(tmp_path))
+    rng = np.random.default_rng(7)
+    index.add("contract", "contract.pdf", CHUNKS, rng.normal(size=(4, 16)).astype(np.float32))
+    # A query vector that points at the wrong chunk
+    query_vector = index.collection.get(ids=["contract:3"], include=["embeddings"])["embeddings"]
+
+    vector = index.search("contract", ["governing law"], query_vector, n_results=1, mode="vector")
+    keyword = index.search("contract", ["governing law"], query_vector, n_results=1, mode="bm25")
+    hybrid = index.search("contract", ["governing law"], query_vector, n_results=2, mode="hybrid")
+    assert vector == [[CHUNKS[3]]]
+    assert keyword == [[CHUNKS[0]]]
+    assert set(hybrid[0]) == {CHUNKS[0], CHUNKS[3]}
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import sys
+import types
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.document import ParsedDocument
+from app.clients.fal_client import FalClient
+from app.streams import stream_d as stream_d_module
+from app.streams.chunking import count_tokens, iter_chunks
+from app.streams.document_index import DocumentIndex
+
+MARKDOWN = """# Master Services Agreement
+
+## Termination
+
+Either party may terminate this Agreement upon thirty days written notice to the other party.
+
+## Liability
+
+The Supplier's total liability shall not exceed the fees paid in the prior twelve months.
+"""
+
+
+def test_chunks_follow_headings():
+    chunks = list(iter_chunks(MARKDOWN, max_tokens=100, overlap=10))
+    assert len(chunks) == 2
+    assert chunks[0].startswith("# Master Services Agreement\n## Termination\n\n")
+    assert chunks[1].startswith("# Master Services Agreement\n## Liability\n\n")
+    assert "liability" not in chunks[0]
+
+
+def test_chunks_respect_budget_and_overlap():
+    # One 200k-character paragraph with no blank lines, like a scanned page dump
+    text = " ".join(f"word{i}" for i in range(30000))
+    chunks = iter_chunks(text, max_tokens=200, overlap=20)
+    assert isinstance(chunks, types.GeneratorType)
+    chunks = list(chunks)
+    assert all(count_tokens(chunk) <= 200 for chunk in chunks)
+    assert 150 <= len(chunks) <= 170
+    # Consecutive chunks share their boundary tokens
+    assert chunks[1].split()[0] in chunks[0].split()[-20:]
+
+
+def test_long_heading_chains_stay_within_budget():
+    deep = "\n".join(f"{'#' * level} Part {level} of the master agreement schedules" for level in range(1, 7))
+    long_title = "# " + " ".join(f"clause{i}" for i in range(300))
+    body = " ".join(f"word{i}." for i in range(400))
+    for heading in (deep, long_title):
+        chunks = list(iter_chunks(f"{heading}\n\n{body}", max_tokens=100, overlap=10))
+        assert chunks and all(count_tokens(chunk) <= 100 for chunk in chunks)
+    # Outer headings are dropped first; the most specific ones are kept
+    first = list(iter_chunks(f"{deep}\n\n{body}", max_tokens=100, overlap=10))[0]
+    assert "###### Part 6" in first and "# Part 1 " not in first
+
+
+def test_small_paragraphs_are_packed_not_dropped():
+    text = "\n\n".join(f"Item {i}." for i in range(50))
+    chunks = list(iter_chunks(text, max_tokens=400, overlap=0))
+    assert len(chunks) == 1
+    assert "Item 0." in chunks[0] and "Item 49." in chunks[0]
+
+
+class _BatchClient:
+    def __init__(self):
+        self.batches = []
+
+    async def get_embeddings(self, texts, model="text-embedding-3-small"):
+        self.batches.append(len(texts))
+        return FalClient._synthetic_embeddings(texts, dim=32)
+
+    async def generate_completion(self, system_prompt, user_prompt, model=""):
+        return "answer"
+
+
+def test_stream_d_indexes_large_documents_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(stream_d_module, "RETRIEVER", "chroma")
+    monkeypatch.setattr(stream_d_module, "INDEX_BATCH_SIZE", 8)
+    monkeypatch.setattr(stream_d_module, "CHUNK_TOKENS", 50)
+    processor = stream_d_module.StreamDProcessor()
+    processor._index = DocumentIndex(str(tmp_path))
+    processor.openai = client = _BatchClient()
+    text = "\n\n".join(f"Section {i} sets out obligation number {i} of the supplier in detail." for i in range(100))
+
+    result = asyncio.run(processor.process(ParsedDocument(text.encode(), "large.txt"), "obligation number 42"))
+    indexing_batches = client.batches[:-1]
+    assert max(indexing_batches) == 8 and len(indexing_batches) > 1
+    assert processor.index.stats()["chunks"] == sum(indexing_batches)
+    assert any("obligation number 42" in snippet for snippet in result["relevant_context_snippets"])
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import sys
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from app.clients.fal_client import FalClient
+from app.services.corpus import CorpusIndexer
+from app.streams import stream_d as stream_d_module
+from app.streams.corpus import CorpusStore
+from app.streams.stream_d import stream_d
+
+
+class _CountingClient:
+    def __init__(self):
+        self.embedded = 0
+
+    async def get_embeddings(self, texts, model="text-embedding-3-small"):
+        self.embedded += len(texts)
+        return FalClient._synthetic_embeddings(texts, dim=32)
+
+    async def generate_completion(self, system_prompt, user_prompt, model=""):
+        return "answer"
+
+
+@pytest.fixture
+def indexer(tmp_path, monkeypatch):
+    monkeypatch.setattr(stream_d_module, "EMBEDDING_BACKEND", "external")
+    monkeypatch.setattr(stream_d_module, "CHUNK_TOKENS", 40)
+    monkeypatch.setattr(stream_d_module, "CHUNK_OVERLAP", 0)
+    monkeypatch.setattr(stream_d, "openai", _CountingClient())
+    indexer = CorpusIndexer(workers=2)
+    indexer._store = CorpusStore(str(tmp_path))
+    return indexer
+
+
+def _sections(*bodies):
+    return "\n\n".join(f"# Section {i}\n\n{body}" for i, body in enumerate(bodies)).encode()
+
+
+def test_readding_a_document_only_embeds_changed_chunks(indexer):
+    original = _sections("Rent is due monthly.", "The tenant maintains the garden.", "Notice period is sixty days.")
+    edited = _sections("Rent is due monthly.", "The landlord maintains the garden.", "Notice period is sixty days.")
+
+    async def run():
+        queued = await indexer.add_document("leases", "lease.md", original)
+        assert queued["status"] == "queued"
+        await indexer.join()
+        first = stream_d.openai.embedded
+        # Identical bytes and metadata: nothing is queued
+        await indexer.add_document("leases", "lease.md", original)
+        await indexer.join()
+        assert stream_d.openai.embedded == first
+        await indexer.add_document("leases", "lease.md", edited)
+        await indexer.join()
+        await indexer.stop()
+        return first
+
+    first = asyncio.run(run())
+    assert first == 3
+    assert stream_d.openai.embedded == 4
+    document = indexer.store.document("leases", "lease.md")
+    assert document["status"] == "indexed" and document["chunk_count"] == 3
+    texts = indexer.store.collection("leases").get()["documents"]
+    assert len(texts) == 3 and not any("tenant" in text for text in texts)
+
+
+def test_metadata_filtered_query_and_delete(indexer):
+    async def run():
+        await indexer.add_document("contracts", "a.md", _sections("Payment within thirty days."),
+                                   metadata={"domain": "lease", "year": 2023})
+        await indexer.add_document("contracts", "b.md", _sections("Payment within ten days."),
+                                   metadata={"domain": "loan", "year": 2024})
+        await indexer.join()
+        filtered = await indexer.query("contracts", "payment terms", where={"domain": "loan"})
+        by_year = await indexer.query("contracts", "payment terms", where={"year": {"$gte": 2023}}, answer=False)
+        removed = await indexer.remove_document("contracts", "b.md")
+        remaining = await indexer.query("contracts", "payment terms", answer=False)
+        await indexer.stop()
+        return filtered, by_year, removed, remaining
+
+    filtered, by_year, removed, remaining = asyncio.run(run())
+    assert [m["document_id"] for m in filtered["matches"]] == ["b.md"]
+    assert filtered["answer"] == "answer"
+    assert sorted(m["document_id"] for m in by_year["matches"]) == ["a.md", "b.md"]
+    assert removed
+    assert [m["document_id"] for m in remaining["matches"]] == ["a.md"]
+    assert [d["document_id"] for d in indexer.store.list_documents("contracts")] == ["a.md"]
+
+
+def test_failed_extraction_and_invalid_input(indexer):
+    async def run():
+        await indexer.add_document("scans", "scan.pdf", b"%PDF-1.4 not really")
+        await indexer.join()
+        with pytest.raises(ValueError):
+            await indexer.add_document("x", "a.md", b"too short a corpus name")
+        with pytest.raises(ValueError):
+            await indexer.add_document("scans", "a.md", b"text", metadata={"chunk": 1})
+        await indexer.stop()
+
+    asyncio.run(run())
+    document = indexer.store.document("scans", "scan.pdf")
+    assert document["status"] == "failed" and "Could not extract" in document["error"]
+
+
+def test_full_queue_rolls_back_the_registry_row(tmp_path):
+    indexer = CorpusIndexer(workers=0, max_queue=1)
+    indexer._store = CorpusStore(str(tmp_path))
+
+    async def run():
+        first = await indexer.add_document("notes", "a.md", b"# A\n\nfirst")
+        with pytest.raises(asyncio.QueueFull):
+            await indexer.add_document("notes", "b.md", b"# B\n\nsecond")
+        with pytest.raises(asyncio.QueueFull):
+            await indexer.add_document("notes", "a.md", b"# A\n\nchanged")
+        return first, await indexer.list_documents("notes")
+
+    first, documents = asyncio.run(run())
+    # b.md never made it in, and a.md still points at the queued revision
+    assert [(d["document_id"], d["revision"], d["status"]) for d in documents] == [("a.md", first["revision"], "queued")]
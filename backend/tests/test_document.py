@@ -0,0 +1,84 @@
+import asyncio
+import os
+import sys
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import fitz
+from app.core.document import ParsedDocument
+from app.streams.stream_b import stream_b
+
+
+def _make_pdf(pages):
+    doc = fitz.open()
+    for text in pages:
+        page = doc.new_page()
+        page.insert_text((72, 72), text)
+    content = doc.tobytes()
+    doc.close()
+    return content
+
+
+def test_pdf_is_opened_once(monkeypatch):
+    content = _make_pdf([
+        "Form 1040 U.S. Individual Income Tax Return. Wages, salaries, tips 48,250.00",
+        "Adjusted Gross Income 52,000.00. Taxable Income 38,150.00. Total Tax 4,210.00",
+    ])
+    opens = []
+    real_open = fitz.open
+
+    def counting_open(*args, **kwargs):
+        opens.append(args)
+        return real_open(*args, **kwargs)
+
+    monkeypatch.setattr(fitz, "open", counting_open)
+
+    with ParsedDocument(content, "return.pdf") as document:
+        assert "Form 1040" in document.text_prefix(3000)
+        assert stream_b.is_digital_native(document)
+        result, error = stream_b.analyze_with_pymupdf(document)
+        assert error is None
+        assert "Adjusted Gross Income" in result.content
+        assert document.page_count == 2
+        assert [s["page_num"] for s in document.page_stats] == [1, 2]
+
+    assert len(opens) == 1
+
+
+def test_non_pdf_falls_back_to_raw_text():
+    document = ParsedDocument(b"plain text body", "notes.txt")
+    assert document.text_prefix(5) == "plain"
+    assert not stream_b.is_digital_native(document)
+
+
+def test_sha256_is_stable():
+    assert ParsedDocument(b"abc", "a.pdf").sha256 == ParsedDocument(b"abc", "b.pdf").sha256
+
+
+def test_loaded_text_never_reopens_the_pdf(monkeypatch):
+    content = _make_pdf([
+        "Form 1040 U.S. Individual Income Tax Return. Wages, salaries, tips 48,250.00",
+        "Adjusted Gross Income 52,000.00. Taxable Income 38,150.00. Total Tax 4,210.00",
+    ])
+    with ParsedDocument(content, "return.pdf") as document:
+        asyncio.run(document.load_text())
+
+        def no_open(*args, **kwargs):
+            raise AssertionError("fitz.open called after load_text")
+
+        monkeypatch.setattr(fitz, "open", no_open)
+        assert "Form 1040" in document.text_prefix(3000)
+        assert document.open_error is None and document.page_count == 2
+        assert stream_b.is_digital_native(document)
+        result, error = stream_b.analyze_with_pymupdf(document)
+        assert error is None and "Taxable Income" in result.content
+
+
+def test_load_errors_are_cached():
+    document = ParsedDocument(b"not a pdf at all", "broken.pdf")
+    asyncio.run(document.load_text())
+    assert document.open_error is not None and document.page_count == 0
+    assert document.text_prefix(3) == "not"
+    result, error = stream_b.analyze_with_pymupdf(document)
+    assert result is None and error.startswith("PyMuPDF Error")
@@ -0,0 +1,151 @@
+import asyncio
+import os
+import sys
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pytest
+from app.core.document import ParsedDocument
+from app.clients.fal_client import FalClient
+from app.streams.document_index import DocumentIndex
+from app.streams.chunking import iter_chunks
+from app.streams import stream_d as stream_d_module
+from app.streams.stream_d import StreamDProcessor, CHUNK_TOKENS, CHUNK_OVERLAP
+
+
+@pytest.fixture(autouse=True)
+def persistent_retriever(monkeypatch):
+    # These tests cover the persistent Chroma index, whatever the deployment default is
+    monkeypatch.setattr(stream_d_module, "RETRIEVER", "chroma")
+
+
+def _vectors(n, seed):
+    return np.random.default_rng(seed).normal(size=(n, 8)).astype(np.float32)
+
+
+def test_queries_are_scoped_to_one_document(tmp_path):
+    index = DocumentIndex(str(tmp_path))
+    a, b = _vectors(3, 0), _vectors(3, 1)
+    index.add("doc-a", "a.pdf", ["a0", "a1", "a2"], a)
+    index.add("doc-b", "b.pdf", ["b0", "b1", "b2"], b)
+    assert index.has("doc-a") and index.has("doc-b")
+
+    # Querying with b's own vector must still only return a's chunks
+    results = index.query("doc-a", query_embeddings=b[:1], n_results=3)
+    assert sorted(results["documents"][0]) == ["a0", "a1", "a2"]
+    assert index.stats()["chunks"] == 6
+
+
+def test_lru_and_ttl_eviction(tmp_path):
+    index = DocumentIndex(str(tmp_path), max_documents=2)
+    index.add("doc-1", "1.pdf", ["one"], _vectors(1, 1))
+    index.add("doc-2", "2.pdf", ["two"], _vectors(1, 2))
+    index.has("doc-1")  # doc-2 is now least recently used
+    index.add("doc-3", "3.pdf", ["three"], _vectors(1, 3))
+    assert index.has("doc-1") and index.has("doc-3") and not index.has("doc-2")
+    assert index.collection.get(where={"doc_id": "doc-2"})["ids"] == []
+
+    index.ttl_seconds = -1
+    assert not index.has("doc-1")
+
+
+class _CountingClient:
+    def __init__(self):
+        self.embedded = 0
+
+    async def get_embeddings(self, texts, model="text-embedding-3-small"):
+        self.embedded += len(texts)
+        return FalClient._synthetic_embeddings(texts, dim=32)
+
+    async def generate_completion(self, system_prompt, user_prompt, model=""):
+        return "answer"
+
+
+def test_stream_d_indexes_each_document_once(tmp_path):
+    processor = StreamDProcessor()
+    processor._index = DocumentIndex(str(tmp_path))
+    processor.openai = client = _CountingClient()
+    text = "\n\n".join(f"Clause {i}: the parties agree to terms that are long enough to be kept." for i in range(5))
+    document = ParsedDocument(text.encode(), "contract.txt")
+
+    async def ask_twice():
+        await processor.process(document, "What is clause 1?")
+        return await processor.process(document, "What is clause 2?")
+
+    result = asyncio.run(ask_twice())
+    stats = processor.index.stats()
+    # Chunks embedded once, plus one query embedding per question
+    assert stats["documents"] == 1
+    assert client.embedded == stats["chunks"] + 2
+    assert result["relevant_context_snippets"]
+
+
+class _EchoClient(_CountingClient):
+    async def generate_completion(self, system_prompt, user_prompt, model=""):
+        await asyncio.sleep(0)
+        return user_prompt
+
+
+def test_concurrent_same_named_files_stay_isolated(tmp_path):
+    # A tight document cap forces eviction while other requests are mid-query
+    processor = StreamDProcessor()
+    processor._index = DocumentIndex(str(tmp_path), max_documents=2)
+    processor.openai = client = _EchoClient()
+
+    def contract(owner):
+        return "\n\n".join(f"Owner {owner} clause {i}: obligations described at sufficient length here." for i in range(4))
+
+    documents = [ParsedDocument(contract(n).encode(), "contract.txt") for n in range(12)]
+
+    async def stress():
+        # Every document is asked about three times at once
+        requests = [processor.process(documents[n % 12], f"question {n}") for n in range(36)]
+        return await asyncio.gather(*requests)
+
+    results = asyncio.run(stress())
+    for n, result in enumerate(results):
+        owner = n % 12
+        assert result["relevant_context_snippets"]
+        assert all(s.startswith(f"Owner {owner} clause") for s in result["relevant_context_snippets"])
+    # Duplicate concurrent requests shared one indexing pass per document
+    chunks_per_document = sum(1 for _ in iter_chunks(contract(0), CHUNK_TOKENS, CHUNK_OVERLAP))
+    assert client.embedded == 12 * chunks_per_document + 36
+    stats = processor.index.stats()
+    assert stats["leased"] == 0 and stats["documents"] <= 12
+
+
+class _ConcurrencyClient(_CountingClient):
+    def __init__(self):
+        super().__init__()
+        self.embedding_calls = 0
+        self.active = 0
+        self.peak = 0
+
+    async def get_embeddings(self, texts, model="text-embedding-3-small"):
+        self.embedding_calls += 1
+        return await super().get_embeddings(texts, model)
+
+    async def generate_completion(self, system_prompt, user_prompt, model=""):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return user_prompt.split("Question: ")[1].strip()
+
+
+def test_process_many_amortizes_indexing(tmp_path, monkeypatch):
+    monkeypatch.setattr(stream_d_module, "ANSWER_CONCURRENCY", 3)
+    processor = StreamDProcessor()
+    processor._index = DocumentIndex(str(tmp_path))
+    processor.openai = client = _ConcurrencyClient()
+    text = "\n\n".join(f"Clause {i}: the parties agree to terms that are long enough to be kept." for i in range(5))
+    queries = [f"What does clause {i} say?" for i in range(10)]
+
+    result = asyncio.run(processor.process_many(ParsedDocument(text.encode(), "contract.txt"), queries))
+    assert [a["query"] for a in result["answers"]] == queries
+    assert [a["answer"] for a in result["answers"]] == queries
+    # One indexing embedding call plus one batched call for all ten questions
+    assert client.embedding_calls == 2
+    assert client.peak == 3
@@ -0,0 +1,33 @@
+import asyncio
+import hashlib
+import os
+import sys
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from app.clients.fal_client import FalClient
+
+
+def _reference_embedding(text):
+    # The original per-component loop, kept as the reference for the vectorized path
+    hash_val = int(hashlib.md5(text.encode()).hexdigest(), 16)
+    embedding = [((hash_val >> (i % 32)) & 0xFF) / 255.0 * 2 - 1 for i in range(1536)]
+    magnitude = sum(x ** 2 for x in embedding) ** 0.5
+    return [x / magnitude for x in embedding] if magnitude > 0 else embedding
+
+
+def test_batch_matches_reference_embedding():
+    texts = ["termination clause", "governing law", "", "liability cap " * 50]
+    matrix = asyncio.run(FalClient().get_embeddings(texts))
+    assert matrix.shape == (4, 1536)
+    assert matrix.dtype == np.float32
+    expected = np.array([_reference_embedding(text) for text in texts])
+    assert np.allclose(matrix, expected, atol=1e-6)
+
+
+def test_single_embedding_is_a_list():
+    embedding = asyncio.run(FalClient().get_embedding("termination clause"))
+    assert isinstance(embedding, list) and len(embedding) == 1536
+    assert np.allclose(embedding, _reference_embedding("termination clause"), atol=1e-6)
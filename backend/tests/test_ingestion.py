@@ -0,0 +1,124 @@
+import asyncio
+import io
+import json
+import os
+import sys
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pandas as pd
+import pytest
+from app.clients.llm_cache import ResponseCache
+from app.core.document import ParsedDocument
+from app.services.result_store import ResultStore
+from app.streams import ingestion
+from app.streams import stream_a as stream_a_module
+from app.streams.stream_a import DataFrameCache, StreamAProcessor
+
+
+ORDERS = [
+    {"id": 1, "customer": {"name": "Ada", "address": {"city": "Oslo"}}, "total": 9.5, "tags": ["a"]},
+    {"id": 2, "customer": {"name": "Bo", "address": {"city": "Rome"}}, "total": 3.0, "tags": []},
+    {"id": 3, "customer": {"name": "Cy", "address": {"city": "Oslo"}}, "total": 7.25, "tags": ["b", "c"]},
+]
+
+
+def _workbook(**sheets):
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        for name, frame in sheets.items():
+            frame.to_excel(writer, sheet_name=name, index=False)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("content", [
+    json.dumps(ORDERS).encode(),
+    "\n".join(json.dumps(order) for order in ORDERS).encode(),
+    json.dumps({"meta": {"page": 1}, "orders": ORDERS}).encode(),
+])
+def test_json_layouts_are_flattened(content):
+    df = ingestion.read_table(content, "orders.json")
+    assert list(df.columns) == ["id", "total", "tags", "customer.name", "customer.address.city"]
+    assert df["customer.address.city"].tolist() == ["Oslo", "Rome", "Oslo"]
+    assert df["tags"].tolist() == [["a"], [], ["b", "c"]]
+
+    assert ingestion.read_table(content, "orders.ndjson", nrows=2)["id"].tolist() == [1, 2]
+
+
+def test_json_sample_read_stops_early(monkeypatch):
+    monkeypatch.setattr(ingestion, "RECORD_BATCH", 2)
+    # Everything after the third record is malformed; a bounded read never reaches it
+    content = (json.dumps(ORDERS)[:-1] + ", {broken").encode()
+    assert len(ingestion.read_table(content, "orders.json", nrows=3)) == 3
+    with pytest.raises(ValueError):
+        ingestion.read_table(content, "orders.json")
+
+
+def test_xml_records_become_rows():
+    content = b"""<?xml version="1.0"?>
+    <orders xmlns="urn:shop">
+      <order id="1"><total>9.5</total><customer><name>Ada</name><city>Oslo</city></customer><tag>a</tag></order>
+      <order id="2"><total>3</total><customer><name>Bo</name><city>Rome</city></customer></order>
+      <order id="3"><total>7.25</total><customer><name>Cy</name><city>Oslo</city></customer><tag>b</tag><tag>c</tag></order>
+    </orders>"""
+    df = ingestion.read_table(content, "orders.xml")
+    assert list(df.columns) == ["id", "total", "customer.name", "customer.city", "tag"]
+    assert df["id"].tolist() == [1, 2, 3] and df["total"].tolist() == [9.5, 3.0, 7.25]
+    assert df["customer.city"].tolist() == ["Oslo", "Rome", "Oslo"]
+    assert df["tag"].tolist()[2] == ["b", "c"]
+    assert len(ingestion.read_table(content, "orders.xml", nrows=1)) == 1
+
+
+def test_only_referenced_sheets_are_loaded():
+    names = ["Summary", "Jan", "Feb", "Notes"]
+    assert ingestion.referenced_sheets(names, "Total sales for jan and FEB") == ["Jan", "Feb"]
+    assert ingestion.referenced_sheets(names, "Total sales by region") == ["Summary"]
+    assert ingestion.referenced_sheets(names, "Combine all sheets") == names
+    # "Janet" does not name the Jan sheet
+    assert ingestion.referenced_sheets(names, "Rows for Janet") == ["Summary"]
+
+    content = _workbook(Summary=pd.DataFrame({"x": [0]}), Jan=pd.DataFrame({"sales": [1, 2]}),
+                        Feb=pd.DataFrame({"sales": [3]}))
+    assert ingestion.resolve_sheets(content, "book.xlsx", "jan vs feb") == ["Jan", "Feb"]
+    assert ingestion.resolve_sheets(content, "data.csv", "jan") is None
+    df = ingestion.read_table(content, "book.xlsx", sheets=["Jan", "Feb"])
+    assert df.to_dict(orient="list") == {"sheet": ["Jan", "Jan", "Feb"], "sales": [1, 2, 3]}
+    assert ingestion.read_table(content, "book.xlsx")["x"].tolist() == [0]
+
+
+def test_openpyxl_fallback_reads_the_same_workbook(monkeypatch):
+    content = _workbook(Jan=pd.DataFrame({"sales": [1, 2]}), Feb=pd.DataFrame({"sales": [3]}))
+    monkeypatch.setattr(ingestion, "EXCEL_ENGINE", "openpyxl")
+    assert ingestion.sheet_names(content) == ["Jan", "Feb"]
+    assert ingestion.read_table(content, "book.xlsx", sheets=["Feb"])["sales"].tolist() == [3]
+
+
+class CodeClient:
+    def __init__(self, code):
+        self.code = code
+        self.prompts = []
+
+    async def generate_completion(self, system_prompt, user_prompt, model=""):
+        self.prompts.append(user_prompt)
+        return self.code
+
+
+def test_stream_a_processes_json_and_selected_sheets(tmp_path, monkeypatch):
+    monkeypatch.setattr(stream_a_module, "result_store", ResultStore(str(tmp_path), legacy_dir=None))
+    processor = StreamAProcessor()
+    processor.client = client = CodeClient("result_df = df.groupby('customer.address.city', as_index=False)['total'].sum()")
+    processor.frames = DataFrameCache()
+    processor.code_cache = ResponseCache(max_entries=8, namespace="stream_a_code")
+
+    result = asyncio.run(processor.process(ParsedDocument(json.dumps(ORDERS).encode(), "orders.json"), "Total by city"))
+    assert result["status"] == "success"
+    assert result["preview"] == [{"customer.address.city": "Oslo", "total": 16.75},
+                                 {"customer.address.city": "Rome", "total": 3.0}]
+
+    client.code = "result_df = df.groupby('sheet', as_index=False)['sales'].sum()"
+    workbook = ParsedDocument(_workbook(Summary=pd.DataFrame({"x": [0]}), Jan=pd.DataFrame({"sales": [1, 2]}),
+                                        Feb=pd.DataFrame({"sales": [3]})), "book.xlsx")
+    result = asyncio.run(processor.process(workbook, "Compare Jan with Feb"))
+    assert result["preview"] == [{"sheet": "Feb", "sales": 3}, {"sheet": "Jan", "sales": 3}]
+    assert "Summary" not in client.prompts[-1] and "sheet" in client.prompts[-1]
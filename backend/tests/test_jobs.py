@@ -0,0 +1,125 @@
+import asyncio
+import os
+import sys
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from app.core.document import ParsedDocument
+from app.services import jobs as jobs_module
+from app.services.jobs import JobManager, QueueFullError
+
+
+@pytest.fixture
+def fake_streams(monkeypatch):
+    order = []
+
+    async def fake_run_stream(stream_type, document, **params):
+        order.append(document.filename)
+        await asyncio.sleep(0.05)
+        return {"status": "success", "stream": stream_type}
+
+    monkeypatch.setattr(jobs_module, "run_stream", fake_run_stream)
+    monkeypatch.setattr(jobs_module, "log_orchestration", lambda *args: None)
+    return order
+
+
+def test_priority_order_and_long_poll(fake_streams):
+    manager = JobManager(workers=1, max_queue=10)
+
+    async def run():
+        await manager.start()
+        blocker = await manager.submit(ParsedDocument(b"a,b\n1,2", "first.csv"))
+        await asyncio.sleep(0.01)
+        low = await manager.submit(ParsedDocument(b"a,b\n1,2", "low.csv"), priority=5)
+        high = await manager.submit(ParsedDocument(b"a,b\n1,2", "high.csv"), priority=0)
+        done = await manager.wait(low.id, timeout=5)
+        await manager.stop()
+        return blocker, high, done
+
+    blocker, high, done = asyncio.run(run())
+    assert done.status == "succeeded"
+    assert done.result == {"status": "success", "stream": "A"}
+    assert fake_streams == ["first.csv", "high.csv", "low.csv"]
+
+
+def test_cancel_and_bounded_queue(fake_streams):
+    manager = JobManager(workers=1, max_queue=2)
+
+    async def run():
+        await manager.start()
+        running = await manager.submit(ParsedDocument(b"x", "running.csv"))
+        await asyncio.sleep(0.01)
+        queued = await manager.submit(ParsedDocument(b"x", "queued.csv"))
+        await manager.submit(ParsedDocument(b"x", "other.csv"))
+        with pytest.raises(QueueFullError):
+            await manager.submit(ParsedDocument(b"x", "overflow.csv"))
+        await manager.cancel(queued.id)
+        await manager.cancel(running.id)
+        await asyncio.sleep(0.1)
+        await manager.stop()
+        return running, queued
+
+    running, queued = asyncio.run(run())
+    assert running.status == "cancelled"
+    assert queued.status == "cancelled"
+    assert "queued.csv" not in fake_streams
+
+
+def test_cancelled_jobs_free_their_queue_slots(fake_streams):
+    manager = JobManager(workers=0, max_queue=2)
+
+    async def run():
+        await manager.start()
+        first = await manager.submit(ParsedDocument(b"x", "first.csv"))
+        second = await manager.submit(ParsedDocument(b"x", "second.csv"))
+        await manager.cancel(first.id)
+        await manager.cancel(second.id)
+        # Both cancelled jobs are still in the PriorityQueue, but no longer count
+        third = await manager.submit(ParsedDocument(b"x", "third.csv"))
+        depth = manager.queue_depth
+        await manager.stop()
+        return third, depth
+
+    third, depth = asyncio.run(run())
+    assert third.status == "queued" and depth == 1
+
+
+def test_concurrent_submits_respect_max_queue(fake_streams, monkeypatch):
+    async def slow_route(document):
+        await asyncio.sleep(0.05)
+        return "A"
+
+    monkeypatch.setattr(jobs_module.gatekeeper, "route", slow_route)
+    manager = JobManager(workers=0, max_queue=2)
+
+    async def run():
+        await manager.start()
+        results = await asyncio.gather(
+            *(manager.submit(ParsedDocument(b"x", f"{i}.csv")) for i in range(5)), return_exceptions=True)
+        depth = manager.queue_depth
+        await manager.stop()
+        return results, depth
+
+    results, depth = asyncio.run(run())
+    assert sum(isinstance(r, QueueFullError) for r in results) == 3
+    assert depth == 2
+
+
+def test_sqlite_queue_recovers_pending_jobs(fake_streams, tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+
+    async def run():
+        first = JobManager(workers=0, db_path=db_path)
+        await first.start()
+        job = await first.submit(ParsedDocument(b"a,b\n1,2", "pending.csv"))
+        second = JobManager(workers=1, db_path=db_path)
+        await second.start()
+        finished = await second.wait(job.id, timeout=5)
+        await second.stop()
+        return finished
+
+    finished = asyncio.run(run())
+    assert finished.status == "succeeded"
+    assert fake_streams == ["pending.csv"]
@@ -0,0 +1,70 @@
+import asyncio
+import os
+import sys
+import time
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from azure.ai.formrecognizer import AnalyzeResult
+from app.clients.azure_client import AzureClient
+from app.clients.layout_cache import LayoutCache
+
+
+def _result(content):
+    return AnalyzeResult(api_version="2023-07-31", model_id="prebuilt-layout", content=content,
+                         pages=[], paragraphs=[], tables=[])
+
+
+def test_hit_skips_azure_and_concurrent_misses_share_one_call(tmp_path):
+    client = AzureClient()
+    client.layout_cache = LayoutCache(str(tmp_path), "prebuilt-layout-test", max_bytes=10 * 1024 * 1024)
+    calls = []
+
+    def fake_analyze(file_content):
+        calls.append(file_content)
+        time.sleep(0.05)
+        return _result("Invoice 42")
+
+    client.analyze_layout_result = fake_analyze
+
+    async def run():
+        first = await asyncio.gather(*(client.analyze_layout_cached(b"same bytes") for _ in range(5)))
+        again = await client.analyze_layout_cached(b"same bytes")
+        return first, again
+
+    first, again = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(r.content == "Invoice 42" for r in first)
+    assert again.content == "Invoice 42"
+
+
+def test_version_change_invalidates_and_size_cap_evicts(tmp_path):
+    old = LayoutCache(str(tmp_path), "v1", max_bytes=10 * 1024 * 1024)
+    old.put("a" * 64, {"content": "old"})
+
+    cache = LayoutCache(str(tmp_path), "v2", max_bytes=1)
+    assert not os.path.exists(os.path.join(str(tmp_path), "layout-v1"))
+    assert cache.get("a" * 64) is None
+
+    cache.put("b" * 64, {"content": "x" * 1000})
+    assert cache.stats()["bytes"] <= 1
+    assert cache.get("b" * 64) is None
+
+
+def test_purge_leaves_other_data_in_a_shared_directory(tmp_path):
+    (tmp_path / "corpora").mkdir()
+    (tmp_path / "corpora" / "registry.db").write_bytes(b"keep")
+    (tmp_path / "layout-unmarked").mkdir()
+    LayoutCache(str(tmp_path), "v1", max_bytes=1024)
+
+    LayoutCache(str(tmp_path), "v2", max_bytes=1024)
+    assert sorted(os.listdir(tmp_path)) == ["corpora", "layout-unmarked", "layout-v2"]
+    assert (tmp_path / "corpora" / "registry.db").read_bytes() == b"keep"
+
+
+def test_client_builds_the_cache_lazily(tmp_path, monkeypatch):
+    monkeypatch.setenv("AZURE_LAYOUT_CACHE_DIR", str(tmp_path / "layout"))
+    client = AzureClient()
+    assert not os.path.exists(tmp_path / "layout")
+    assert client.layout_cache is not None and os.path.isdir(tmp_path / "layout")
@@ -0,0 +1,80 @@
+import asyncio
+import os
+import sys
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.clients import llm_cache as llm_cache_module
+from app.clients.llm_cache import CachedLLMClient, ResponseCache, llm_cache_bypass
+
+
+class CountingClient:
+    def __init__(self, response="answer"):
+        self.calls = 0
+        self.response = response
+
+    async def generate_completion(self, system_prompt, user_prompt, model=""):
+        self.calls += 1
+        return self.response
+
+
+def test_identical_prompts_hit_cache():
+    client = CountingClient()
+    cached = CachedLLMClient(client, ResponseCache(max_entries=8))
+
+    async def run():
+        first = await cached.generate_completion("sys", "user")
+        second = await cached.generate_completion("sys", "user")
+        other = await cached.generate_completion("sys", "different")
+        return first, second, other
+
+    assert asyncio.run(run()) == ("answer", "answer", "answer")
+    assert client.calls == 2
+    assert cached.cache.stats()["hits"] == 1
+
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache_module.time, "time", lambda: now[0])
+    cache = ResponseCache(max_entries=2, ttl_seconds=10)
+
+    async def run():
+        await cache.set("a", 1)
+        await cache.set("b", 2)
+        await cache.get("a")  # "b" is now least recently used
+        await cache.set("c", 3)
+        evicted = await cache.get("b")
+        now[0] += 11
+        expired = await cache.get("a")
+        return evicted, expired
+
+    assert asyncio.run(run()) == (None, None)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_sqlite_tier_survives_restart(tmp_path):
+    db_path = str(tmp_path / "llm_cache.db")
+
+    async def run():
+        await ResponseCache(db_path=db_path).set("key", "persisted")
+        return await ResponseCache(db_path=db_path).get("key")
+
+    assert asyncio.run(run()) == "persisted"
+
+
+def test_bypass_and_errors_are_not_cached():
+    client = CountingClient(response="Error: Fal API returned 500")
+    cached = CachedLLMClient(client, ResponseCache())
+
+    async def run():
+        await cached.generate_completion("sys", "user")
+        await cached.generate_completion("sys", "user")
+        client.response = "ok"
+        with llm_cache_bypass():
+            await cached.generate_completion("sys", "user")
+        await cached.generate_completion("sys", "user", bypass_cache=True)
+
+    asyncio.run(run())
+    assert client.calls == 4
+    assert cached.cache.stats()["memory_entries"] == 0
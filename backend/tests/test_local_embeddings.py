@@ -0,0 +1,67 @@
+import asyncio
+import os
+import sys
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from app.clients.local_embeddings import HashingEmbedder, LocalEmbeddingFunction
+from app.core.document import ParsedDocument
+from app.streams import stream_d as stream_d_module
+from app.streams.document_index import DocumentIndex
+
+
+def test_embeddings_are_deterministic_and_normalized():
+    texts = ["Termination for convenience", "Governing law and jurisdiction", ""]
+    first = HashingEmbedder().embed(texts)
+    second = HashingEmbedder().embed(texts)
+    assert first.shape == (3, 1536) and first.dtype == np.float32
+    assert np.array_equal(first, second)
+    assert np.allclose(np.linalg.norm(first[:2], axis=1), 1.0)
+    assert not first[2].any()
+
+
+def test_similar_texts_score_higher():
+    embedder = HashingEmbedder()
+    query, related, unrelated = embedder.embed([
+        "When can the agreement be terminated?",
+        "Either party may terminate this agreement with thirty days notice.",
+        "Invoices are payable in euros within 45 days.",
+    ])
+    assert query @ related > query @ unrelated
+
+
+def test_collection_uses_local_function(tmp_path):
+    index = DocumentIndex(str(tmp_path))
+    assert index.local_collection._embedding_function.name() == LocalEmbeddingFunction.name()
+    restored = LocalEmbeddingFunction.build_from_config(LocalEmbeddingFunction(dim=64).get_config())
+    assert restored.dim == 64
+
+
+class _FailingClient:
+    async def get_embeddings(self, texts, model="text-embedding-3-small"):
+        raise RuntimeError("embedding service unreachable")
+
+    async def generate_completion(self, system_prompt, user_prompt, model=""):
+        return "answer"
+
+
+def _contract():
+    return "\n\n".join([
+        "## Termination\n\nEither party may terminate this Agreement upon thirty days written notice.",
+        "## Payment\n\nInvoices are payable within 45 days of receipt in euros.",
+        "## Governing Law\n\nThis Agreement is governed by the laws of Delaware.",
+    ])
+
+
+def test_local_backend_and_fallback_work_offline(tmp_path, monkeypatch):
+    for backend, client in (("local", None), ("external", _FailingClient())):
+        monkeypatch.setattr(stream_d_module, "EMBEDDING_BACKEND", backend)
+        processor = stream_d_module.StreamDProcessor()
+        processor._index = DocumentIndex(str(tmp_path / backend))
+        if client is not None:
+            processor.openai = client
+        document = ParsedDocument(_contract().encode(), "contract.txt")
+        result = asyncio.run(processor.process(document, "How can the agreement be terminated?", "vector"))
+        assert "terminate" in result["relevant_context_snippets"][0]
@@ -0,0 +1,77 @@
+import gzip
+import io
+import json
+import os
+import sys
+import time
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pandas as pd
+from app.services.result_store import ResultStore
+
+
+def _frame(rows=120):
+    return pd.DataFrame({"region": [["north", "south"][i % 2] for i in range(rows)], "sales": list(range(rows))})
+
+
+def _download(store, result_id, fmt, compress=False):
+    return b"".join(store.iter_download(store.get(result_id), fmt, compress))
+
+
+def test_save_writes_parquet_with_metadata(tmp_path):
+    store = ResultStore(str(tmp_path), legacy_dir=None)
+    saved = store.save(_frame(), "sales.csv")
+
+    assert saved["format"] == "parquet" and saved["rows"] == 120 and saved["source"] == "sales.csv"
+    assert saved["columns"] == ["region", "sales"]
+    assert saved["preview"][0] == {"region": "north", "sales": 0} and len(saved["preview"]) == 10
+    pd.testing.assert_frame_equal(pd.read_parquet(tmp_path / f"{saved['result_id']}.parquet"), _frame())
+
+
+def test_downloads_round_trip_in_every_format(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.services.result_store.DOWNLOAD_BATCH_ROWS", 50)
+    store = ResultStore(str(tmp_path), legacy_dir=None)
+    result_id = store.save(_frame())["result_id"]
+    expected = _frame()
+
+    # Batched CSV writes the header once
+    pd.testing.assert_frame_equal(pd.read_csv(io.BytesIO(_download(store, result_id, "csv"))), expected)
+    assert json.loads(_download(store, result_id, "json")) == expected.to_dict(orient="records")
+    pd.testing.assert_frame_equal(pd.read_excel(io.BytesIO(_download(store, result_id, "xlsx"))), expected)
+    pd.testing.assert_frame_equal(pd.read_parquet(io.BytesIO(_download(store, result_id, "parquet"))), expected)
+
+    compressed = _download(store, result_id, "csv", compress=True)
+    pd.testing.assert_frame_equal(pd.read_csv(io.BytesIO(gzip.decompress(compressed))), expected)
+
+
+def test_legacy_csv_results_are_still_served(tmp_path):
+    legacy = tmp_path / "legacy"
+    legacy.mkdir()
+    _frame(5).to_csv(legacy / "old-result.csv", index=False)
+    store = ResultStore(str(tmp_path / "store"), legacy_dir=str(legacy))
+
+    result = store.get("old-result")
+    assert result["legacy"] and result["format"] == "csv" and result["preview"] is None
+    pd.testing.assert_frame_equal(pd.read_csv(io.BytesIO(_download(store, "old-result", "csv"))), _frame(5))
+    assert store.get("../old-result") is not None and store.get("missing") is None
+
+
+def test_expired_and_over_quota_results_are_evicted(tmp_path):
+    store = ResultStore(str(tmp_path), ttl_seconds=3600, legacy_dir=None)
+    first = store.save(_frame())["result_id"]
+    second = store.save(_frame())["result_id"]
+    time.sleep(0.01)
+    store.get(first)
+
+    # Room for two results: the least recently accessed one goes
+    store.max_bytes = store.stats()["bytes"] + 10
+    third = store.save(_frame())["result_id"]
+    assert store.get(second) is None and not os.path.exists(tmp_path / f"{second}.parquet")
+    assert store.get(first) is not None and store.get(third) is not None
+
+    store.ttl_seconds = 0
+    assert store.get(first) is None
+    store.evict()
+    assert store.stats()["results"] == 0
@@ -0,0 +1,77 @@
+import asyncio
+import os
+import sys
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from app.clients.fal_client import FalClient
+from app.core.document import ParsedDocument
+from app.streams import stream_d as stream_d_module
+from app.streams.document_index import DocumentIndex
+from app.streams.retrievers import InMemoryRetriever
+
+CHUNKS = [f"Clause {i}: the supplier shall deliver item {i} on time." for i in range(40)]
+
+
+def test_memory_matches_exact_cosine_and_chroma(tmp_path):
+    rng = np.random.default_rng(3)
+    embeddings = rng.normal(size=(40, 32)).astype(np.float32)
+    # Unit vectors, as the embedding clients return, so Chroma's L2 ranking equals cosine
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    queries = rng.normal(size=(5, 32)).astype(np.float32)
+
+    memory = InMemoryRetriever()
+    memory.add("doc", "doc.pdf", CHUNKS, embeddings)
+    ranked = memory.vector_rankings("doc", ["q"] * 5, queries, k=5)
+
+    expected = np.argsort(-(queries @ embeddings.T), axis=1)[:, :5].tolist()
+    assert ranked == expected
+
+    chroma = DocumentIndex(str(tmp_path))
+    chroma.add("doc", "doc.pdf", CHUNKS, embeddings)
+    texts = ["item 7 delivery"] * 5
+    for mode in ("vector", "bm25", "hybrid"):
+        assert memory.search("doc", texts, queries, 3, mode) == chroma.search("doc", texts, queries, 3, mode)
+
+
+def test_memory_eviction_by_count_and_bytes():
+    memory = InMemoryRetriever(max_documents=2)
+    for i in range(3):
+        memory.add(f"doc-{i}", "d.pdf", ["text"], np.ones((1, 8), dtype=np.float32))
+    assert not memory.has("doc-0") and memory.has("doc-2")
+
+    memory = InMemoryRetriever(max_bytes=2 * 8 * 4)
+    with memory.lease("doc-0"):
+        for i in range(3):
+            memory.add(f"doc-{i}", "d.pdf", ["text"], np.ones((1, 8), dtype=np.float32))
+        # doc-0 is leased, so the next least recently used goes instead
+        assert memory.has("doc-0") and not memory.has("doc-1") and memory.has("doc-2")
+
+
+class _Client:
+    async def get_embeddings(self, texts, model="text-embedding-3-small"):
+        return FalClient._synthetic_embeddings(texts, dim=32)
+
+    async def generate_completion(self, system_prompt, user_prompt, model=""):
+        return "answer"
+
+
+def test_auto_routes_small_documents_to_memory(tmp_path, monkeypatch):
+    monkeypatch.setattr(stream_d_module, "RETRIEVER", "auto")
+    monkeypatch.setattr(stream_d_module, "MEMORY_MAX_CHUNKS", 3)
+    processor = stream_d_module.StreamDProcessor()
+    processor._index = DocumentIndex(str(tmp_path))
+    processor.openai = _Client()
+
+    small = ParsedDocument(b"The supplier shall deliver the goods within ten business days.", "small.txt")
+    large = ParsedDocument("\n\n".join(CHUNKS * 60).encode(), "large.txt")
+
+    async def run():
+        await processor.process(small, "delivery time")
+        await processor.process(large, "item 7")
+
+    asyncio.run(run())
+    assert processor.memory.has(small.sha256) and not processor.index.has(small.sha256)
+    assert processor.index.has(large.sha256) and not processor.memory.has(large.sha256)
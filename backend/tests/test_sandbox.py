@@ -0,0 +1,82 @@
+import asyncio
+import os
+import sys
+import time
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pandas as pd
+from app.core.sandbox import SandboxPool, decode_frame, encode_frame
+
+
+def test_frames_round_trip_through_arrow_and_pickle():
+    df = pd.DataFrame({"region": ["n", "s"], "sales": [1.5, 2.0], "when": pd.to_datetime(["2024-01-01", "2024-02-01"])})
+    kind, _ = encoded = encode_frame(df)
+    assert kind == "arrow"
+    pd.testing.assert_frame_equal(decode_frame(encoded), df)
+
+    mixed = pd.DataFrame({"value": [1, "two", 3.0]})
+    kind, _ = encoded = encode_frame(mixed)
+    assert kind == "pickle"
+    pd.testing.assert_frame_equal(decode_frame(encoded), mixed)
+
+
+def test_timeouts_kill_the_worker_without_blocking_other_work():
+    pool = SandboxPool(workers=2, timeout_seconds=1, memory_mb=512)
+    df = pd.DataFrame({"a": range(5)})
+
+    async def run():
+        await pool.start()
+        ticks = 0
+
+        async def heartbeat():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.05)
+                ticks += 1
+
+        beat = asyncio.create_task(heartbeat())
+        started = time.monotonic()
+        stuck, quick = await asyncio.gather(
+            pool.run(df, "while True: pass"),
+            pool.run(df, "print('quick'); result_df = df[df.a > 2]"),
+        )
+        elapsed = time.monotonic() - started
+        after = await pool.run(df, "result_df = df.a.sum()")
+        beat.cancel()
+        await pool.stop()
+        return stuck, quick, after, ticks, elapsed
+
+    stuck, quick, after, ticks, elapsed = asyncio.run(run())
+    assert "time limit" in stuck[1] and stuck[0] is None
+    assert quick[1] is None and quick[0]["a"].tolist() == [3, 4] and quick[2] == "quick\n"
+    assert after[0].iloc[0]["Result"] == 10
+    # The event loop kept ticking while the runaway transform spun
+    assert ticks >= 10 and elapsed < 5
+    assert pool.timeouts == 1 and pool.restarts == 1
+
+
+def test_memory_cap_and_isolated_stdout():
+    pool = SandboxPool(workers=2, timeout_seconds=10, memory_mb=256)
+    df = pd.DataFrame({"a": [1, 2]})
+
+    async def run():
+        results = await asyncio.gather(*(
+            pool.run(df, f"for _ in range(3): print('job {i}')\nresult_df = df * {i}") for i in range(4)
+        ))
+        hog = await pool.run(df, "x = bytearray(1024 ** 3)")
+        await pool.stop()
+        return results, hog
+
+    results, hog = asyncio.run(run())
+    for i, (result_df, error, stdout) in enumerate(results):
+        assert error is None and result_df["a"].tolist() == [i, 2 * i]
+        assert stdout == f"job {i}\n" * 3
+    assert hog[0] is None and "memory" in hog[1]
+
+
+def test_zero_workers_runs_in_process():
+    pool = SandboxPool(workers=0)
+    result_df, error, stdout = asyncio.run(pool.run(pd.DataFrame({"a": [1]}), "result_df = df.a"))
+    assert error is None and result_df.columns.tolist() == ["a"] and stdout == ""
@@ -0,0 +1,156 @@
+import asyncio
+import os
+import sys
+import time
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pandas as pd
+import pytest
+from app.clients.llm_cache import ResponseCache, llm_cache_bypass
+from app.core.document import ParsedDocument
+from app.services.result_store import ResultStore
+from app.streams import stream_a as stream_a_module
+from app.streams.stream_a import DataFrameCache, StreamAProcessor, schema_fingerprint
+
+
+@pytest.fixture(autouse=True)
+def results_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(stream_a_module, "result_store", ResultStore(str(tmp_path), legacy_dir=None))
+
+
+class CodeClient:
+    def __init__(self, code="result_df = df.groupby('region', as_index=False)['sales'].sum()"):
+        self.calls = 0
+        self.code = code
+
+    async def generate_completion(self, system_prompt, user_prompt, model=""):
+        self.calls += 1
+        return self.code
+
+
+def _processor(client):
+    processor = StreamAProcessor()
+    processor.client = client
+    processor.frames = DataFrameCache()
+    processor.code_cache = ResponseCache(max_entries=8, namespace="stream_a_code")
+    return processor
+
+
+def _export(rows):
+    return ("region,sales\n" + "\n".join(f"{region},{sales}" for region, sales in rows)).encode()
+
+
+def test_same_schema_and_instruction_reuses_code(monkeypatch):
+    parses = []
+    read_csv = stream_a_module.pd.read_csv
+
+    def counting_read_csv(*args, **kwargs):
+        # Full parses only; bounded prompt samples pass nrows
+        if kwargs.get("nrows") is None:
+            parses.append(1)
+        return read_csv(*args, **kwargs)
+
+    monkeypatch.setattr(stream_a_module.pd, "read_csv", counting_read_csv)
+    client = CodeClient()
+    processor = _processor(client)
+    january = ParsedDocument(_export([("north", 1), ("south", 2), ("north", 3)]), "january.csv")
+    february = ParsedDocument(_export([("north", 10), ("east", 5)]), "february.csv")
+
+    async def run():
+        first = await processor.process(january, "Total sales by region")
+        # Same bytes: parsed once; new export with the same columns: code reused, no LLM call
+        await processor.analyze_schema(january.content, january.filename, january.sha256)
+        second = await processor.process(february, "  Total  sales by region ")
+        with llm_cache_bypass():
+            third = await processor.process(february, "Total sales by region")
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert first["code_cached"] is False and second["code_cached"] is True and third["code_cached"] is False
+    assert client.calls == 2
+    assert len(parses) == 2
+    assert second["preview"] == [{"region": "east", "sales": 5}, {"region": "north", "sales": 10}]
+
+
+def test_failing_code_is_not_cached_and_stale_code_is_regenerated():
+    client = CodeClient("result_df = df['missing']")
+    processor = _processor(client)
+    document = ParsedDocument(_export([("north", 1)]), "sales.csv")
+
+    async def run():
+        failed = await processor.process(document, "Sum it")
+        client.code = "result_df = df"
+        await processor.process(document, "Sum it")
+        # Cached code that no longer runs falls back to generation
+        df, _ = await processor.analyze_schema(document.content, document.filename, document.sha256)
+        await processor.code_cache.set(processor.code_cache_key(df, "Sum it"), "result_df = df['gone']")
+        recovered = await processor.process(document, "Sum it")
+        return failed, recovered
+
+    failed, recovered = asyncio.run(run())
+    assert failed["status"] == "error"
+    assert recovered["status"] == "success" and recovered["code_cached"] is False
+    assert client.calls == 3
+
+
+def test_fingerprint_depends_on_columns_and_dtypes_only():
+    a = pd.DataFrame({"region": ["n"], "sales": [1]})
+    b = pd.DataFrame({"region": ["s", "e"], "sales": [7, 8]})
+    c = pd.DataFrame({"region": ["n"], "sales": [1.5]})
+    assert schema_fingerprint(a) == schema_fingerprint(b) != schema_fingerprint(c)
+
+
+class SlowClient(CodeClient):
+    async def generate_completion(self, system_prompt, user_prompt, model=""):
+        await asyncio.sleep(0.4)
+        return await super().generate_completion(system_prompt, user_prompt, model)
+
+
+def test_full_parse_overlaps_code_generation(monkeypatch):
+    read_csv = stream_a_module.pd.read_csv
+    sample_sizes = []
+
+    def slow_read_csv(*args, **kwargs):
+        sample_sizes.append(kwargs.get("nrows"))
+        if kwargs.get("nrows") is None:
+            time.sleep(0.4)
+        return read_csv(*args, **kwargs)
+
+    monkeypatch.setattr(stream_a_module.pd, "read_csv", slow_read_csv)
+    monkeypatch.setattr(stream_a_module, "PROMPT_SAMPLE_ROWS", 2)
+    client = SlowClient()
+    processor = _processor(client)
+    document = ParsedDocument(_export([("north", 1), ("south", 2), ("north", 3)]), "sales.csv")
+
+    started = time.monotonic()
+    result = asyncio.run(processor.process(document, "Total sales by region"))
+    elapsed = time.monotonic() - started
+
+    assert result["status"] == "success" and result["rows_processed"] == 2
+    assert sample_sizes == [2, None]
+    # Parse and LLM call each take 0.4s; run back to back they would need 0.8s
+    assert elapsed < 0.75
+
+
+def test_sample_read_errors_are_reported():
+    processor = _processor(CodeClient())
+    result = asyncio.run(processor.process(ParsedDocument(b"a,b\n1,2", "data.parquet"), "anything"))
+    assert result["status"] == "error" and "Unsupported" in result["message"]
+
+
+def test_repeat_upload_reuses_code_when_full_dtypes_differ(monkeypatch):
+    # qty is int64 in the 2-row prompt sample but float64 once the blank rows are parsed
+    monkeypatch.setattr(stream_a_module, "PROMPT_SAMPLE_ROWS", 2)
+    client = CodeClient("result_df = df[['region', 'qty']]")
+    processor = _processor(client)
+    document = ParsedDocument(b"region,qty\nnorth,1\nsouth,2\neast,\nwest,\n", "stock.csv")
+
+    async def run():
+        return [await processor.process(document, "Region and quantity") for _ in range(2)]
+
+    first, second = asyncio.run(run())
+    assert first["status"] == second["status"] == "success"
+    assert not first["code_cached"] and second["code_cached"]
+    assert client.calls == 1
@@ -0,0 +1,154 @@
+import asyncio
+import os
+import sys
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pandas as pd
+import pytest
+from app.clients.llm_cache import ResponseCache
+from app.core.document import ParsedDocument
+from app.core.sandbox import SandboxPool
+from app.services.result_store import ResultStore
+from app.streams import stream_a as stream_a_module
+from app.streams.large_files import is_row_local, referenced_columns
+from app.streams.stream_a import DataFrameCache, StreamAProcessor
+
+
+class CodeClient:
+    def __init__(self, code):
+        self.code = code
+        self.prompts = []
+
+    async def generate_completion(self, system_prompt, user_prompt, model=""):
+        self.prompts.append(user_prompt)
+        return self.code
+
+
+@pytest.fixture
+def large_mode(tmp_path, monkeypatch):
+    monkeypatch.setattr(stream_a_module, "LARGE_FILE_BYTES", 1024)
+    monkeypatch.setattr(stream_a_module, "SAMPLE_ROWS", 100)
+    monkeypatch.setattr(stream_a_module, "CHUNK_ROWS", 250)
+    monkeypatch.setattr(stream_a_module, "result_store", ResultStore(str(tmp_path / "results"), legacy_dir=None))
+    monkeypatch.setattr(stream_a_module, "SPOOL_DIR", str(tmp_path / "spool"))
+    monkeypatch.setattr(stream_a_module, "sandbox_pool", SandboxPool(workers=1, timeout_seconds=30, memory_mb=1024))
+    frame = pd.DataFrame({
+        "region": [["north", "south", "east"][i % 3] for i in range(1000)],
+        "sales": [i % 17 for i in range(1000)],
+        "notes": ["x" * 20] * 1000,
+    })
+    return tmp_path, frame, ParsedDocument(frame.to_csv(index=False).encode(), "export.csv")
+
+
+def _run(code, document):
+    processor = StreamAProcessor()
+    processor.client = client = CodeClient(code)
+    processor.frames = DataFrameCache()
+    processor.code_cache = ResponseCache(max_entries=8, namespace="stream_a_code")
+
+    async def run():
+        try:
+            return await processor.process(document, "instruction")
+        finally:
+            await stream_a_module.sandbox_pool.stop()
+
+    return asyncio.run(run()), client
+
+
+def test_row_local_code_streams_in_chunks(large_mode):
+    tmp_path, frame, document = large_mode
+    result, client = _run("result_df = df[df['sales'] > 10]\nresult_df['double'] = result_df['sales'] * 2", document)
+
+    assert result["status"] == "success" and result["execution_mode"] == "chunked"
+    expected = frame[frame["sales"] > 10].assign(double=lambda d: d["sales"] * 2).reset_index(drop=True)
+    written = pd.read_parquet(tmp_path / "results" / f"{result['result_id']}.parquet")
+    pd.testing.assert_frame_equal(written, expected)
+    assert result["rows_processed"] == len(expected) and len(result["preview"]) == 10
+    assert "first 100 rows" in client.prompts[0]
+    assert os.listdir(tmp_path / "spool") == []
+
+
+def test_chunk_dtypes_that_change_are_widened(large_mode):
+    tmp_path, _, _ = large_mode
+    # Chunks of 250 rows: "amount" is int until a decimal in the third chunk, "code" is int
+    # until text appears in the fourth
+    frame = pd.DataFrame({
+        "amount": [0.5 if i == 600 else i for i in range(1000)],
+        "code": [f"C{i}" if i >= 900 else str(i) for i in range(1000)],
+    })
+    document = ParsedDocument(frame.to_csv(index=False).encode(), "drift.csv")
+    result, _ = _run("df['double'] = df['amount'] * 2\nresult_df = df", document)
+
+    assert result["status"] == "success" and result["execution_mode"] == "chunked"
+    written = pd.read_parquet(tmp_path / "results" / f"{result['result_id']}.parquet")
+    assert written["amount"].tolist() == frame["amount"].tolist()
+    assert written["double"].tolist() == (frame["amount"] * 2).tolist()
+    assert written["code"].tolist() == frame["code"].tolist()
+    assert not [name for name in os.listdir(tmp_path / "results") if name.endswith(".tmp")]
+
+
+def test_whole_table_code_runs_once_on_referenced_columns(large_mode):
+    tmp_path, frame, document = large_mode
+    code = "result_df = df[['region', 'sales']].groupby('region', as_index=False)['sales'].sum()"
+    result, _ = _run(code, document)
+
+    assert result["status"] == "success" and result["execution_mode"] == "projected"
+    written = pd.read_parquet(tmp_path / "results" / f"{result['result_id']}.parquet")
+    pd.testing.assert_frame_equal(written, frame.groupby("region", as_index=False)["sales"].sum())
+
+
+def test_code_without_explicit_columns_sees_every_column(large_mode):
+    tmp_path, frame, document = large_mode
+    result, _ = _run("result_df = df.groupby('region').agg('max').reset_index()", document)
+
+    assert result["status"] == "success" and result["execution_mode"] == "projected"
+    written = pd.read_parquet(tmp_path / "results" / f"{result['result_id']}.parquet")
+    pd.testing.assert_frame_equal(written, frame.groupby("region").agg("max").reset_index())
+
+
+@pytest.mark.parametrize("code", [
+    "result_df = df.drop_duplicates(subset=['region'])",
+    "result_df = df.sort_values('sales')",
+    "df['running'] = df['sales'].cummax()\nresult_df = df",
+])
+def test_order_dependent_code_is_not_chunked(large_mode, code):
+    tmp_path, frame, document = large_mode
+    result, _ = _run(code, document)
+
+    assert result["status"] == "success" and result["execution_mode"] == "projected"
+    written = pd.read_parquet(tmp_path / "results" / f"{result['result_id']}.parquet")
+    local = {"df": frame.copy(), "pd": pd}
+    exec(code, {}, local)
+    expected = local["result_df"].reset_index(drop=True)
+    pd.testing.assert_frame_equal(written, expected)
+
+
+def test_row_local_allowlist():
+    columns = ["region", "sales", "notes"]
+    assert is_row_local("result_df = df[df['sales'] > 10]", columns)
+    assert is_row_local("df['double'] = df.sales * 2\ndf.loc[df['sales'] > 3, 'flag'] = 'high'\nresult_df = df", columns)
+    assert is_row_local("df['r'] = df['region'].str.upper().str.strip()\nresult_df = df[['r', 'sales']]", columns)
+    assert is_row_local("result_df = df.assign(x=lambda d: d['sales'] + 1).rename(columns={'x': 'y'})", columns)
+    assert is_row_local("df['n'] = df['notes'].apply(lambda v: len(v))\nresult_df = df.drop(columns=['notes'])", columns)
+
+    assert not is_row_local("result_df = df.drop_duplicates(subset=['sales'])", columns)
+    assert not is_row_local("result_df = df.sort_values('region')", columns)
+    assert not is_row_local("df['m'] = df['sales'].cummax()\nresult_df = df", columns)
+    assert not is_row_local("df['share'] = df['sales'] / df['sales'].sum()\nresult_df = df", columns)
+    assert not is_row_local("df['z'] = df['sales'].apply(lambda v: v / df['sales'].max())\nresult_df = df", columns)
+    assert not is_row_local("result_df = df.apply(lambda c: c.max())", columns)
+    assert not is_row_local("result_df = df.head(10)", columns)
+    assert not is_row_local("result_df = len(df)", columns)
+    assert not is_row_local("import os\nresult_df = df", columns)
+
+
+def test_referenced_columns():
+    columns = ["Region", "Sales", "Units", "unit price"]
+    assert referenced_columns("result_df = df[['Region', \"unit price\"]][df.Sales > 1]", columns) == ["Region", "Sales", "unit price"]
+    assert referenced_columns("result_df = df[df.Sales > 1]", columns) is None
+    assert referenced_columns('result_df = df.groupby("Region").sum().reset_index()', columns) is None
+    assert referenced_columns("result_df = df.iloc[:, 1].sum()", columns) is None
+    assert referenced_columns("result_df = df.describe()", columns) is None
+    assert referenced_columns("result_df = df", columns) is None
@@ -0,0 +1,111 @@
+import asyncio
+import json
+import os
+import sys
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+import pytest
+from app.clients.fal_client import FalClient
+from app.clients.llm_cache import CachedLLMClient, ResponseCache, StreamError
+from app.core.document import ParsedDocument
+from app.streams.document_index import DocumentIndex
+from app.streams.stream_d import StreamDProcessor
+
+
+async def _collect(stream):
+    return [item async for item in stream]
+
+
+def test_fal_stream_yields_deltas_of_cumulative_events(monkeypatch):
+    monkeypatch.setenv("FAL_KEY", "test-key")
+
+    def handler(request):
+        assert request.url.path == "/fal-ai/any-llm/stream"
+        events = ["The term", "The term is five", "The term is five years."]
+        body = "".join(f"data: {json.dumps({'output': output, 'partial': True})}\n\n" for output in events)
+        return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+    client = FalClient()
+    client._http = httpx.AsyncClient(base_url="https://fal.test", transport=httpx.MockTransport(handler))
+    deltas = asyncio.run(_collect(client.stream_completion("sys", "user")))
+    assert deltas == ["The term", " is five", " years."]
+
+
+class StreamingClient:
+    def __init__(self, parts):
+        self.parts = parts
+        self.calls = 0
+
+    async def stream_completion(self, system_prompt, user_prompt, model=""):
+        self.calls += 1
+        for part in self.parts:
+            await asyncio.sleep(0)
+            yield part
+
+    async def get_embeddings(self, texts, model="text-embedding-3-small"):
+        return FalClient._synthetic_embeddings(texts, dim=32)
+
+
+def test_streamed_response_is_cached_and_replayed():
+    client = StreamingClient(["Five", " years."])
+    cached = CachedLLMClient(client, ResponseCache(max_entries=8))
+
+    first = asyncio.run(_collect(cached.stream_completion("sys", "user")))
+    second = asyncio.run(_collect(cached.stream_completion("sys", "user")))
+    assert first == ["Five", " years."]
+    assert second == ["Five years."]
+    assert client.calls == 1
+
+
+class FailingStream(httpx.AsyncByteStream):
+    async def __aiter__(self):
+        yield f"data: {json.dumps({'output': 'The term'})}\n\n".encode()
+        raise httpx.ReadTimeout("stalled")
+
+
+def test_fal_stream_marks_a_mid_stream_failure(monkeypatch):
+    monkeypatch.setenv("FAL_KEY", "test-key")
+    client = FalClient()
+    client._http = httpx.AsyncClient(base_url="https://fal.test", transport=httpx.MockTransport(
+        lambda request: httpx.Response(200, stream=FailingStream(), headers={"content-type": "text/event-stream"})))
+    deltas = asyncio.run(_collect(client.stream_completion("sys", "user")))
+    assert deltas[0] == "The term" and not isinstance(deltas[0], StreamError)
+    assert isinstance(deltas[-1], StreamError) and deltas[-1].startswith("Error:")
+
+
+class RaisingClient(StreamingClient):
+    async def stream_completion(self, system_prompt, user_prompt, model=""):
+        self.calls += 1
+        yield "Five"
+        raise RuntimeError("connection reset")
+
+
+def test_partial_streams_are_not_cached():
+    failing = StreamingClient(["Five", StreamError("Error: Fal.ai API timed out after 30 seconds.")])
+    cached = CachedLLMClient(failing, ResponseCache(max_entries=8))
+    asyncio.run(_collect(cached.stream_completion("sys", "user")))
+    asyncio.run(_collect(cached.stream_completion("sys", "user")))
+    assert failing.calls == 2
+
+    raising = RaisingClient([])
+    cached = CachedLLMClient(raising, ResponseCache(max_entries=8))
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            asyncio.run(_collect(cached.stream_completion("sys", "user")))
+    assert raising.calls == 2
+
+
+def test_stream_d_sends_context_before_tokens(tmp_path):
+    processor = StreamDProcessor()
+    processor._index = DocumentIndex(str(tmp_path))
+    processor.openai = StreamingClient(["The term ", "is five years."])
+    text = "The initial term of this Agreement is five years from the Effective Date, renewable annually."
+    document = ParsedDocument(text.encode(), "contract.txt")
+
+    events = asyncio.run(_collect(processor.stream(document, "What is the term?")))
+    assert [event for event, _ in events] == ["context", "token", "token", "done"]
+    assert events[0][1]["relevant_context_snippets"] == [text]
+    assert events[-1][1]["answer"] == "The term is five years."
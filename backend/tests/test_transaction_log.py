@@ -0,0 +1,55 @@
+import asyncio
+import csv
+import os
+import sys
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.transaction_log import TransactionLogger
+
+
+def _logger(tmp_path, max_records=10):
+    return TransactionLogger(
+        db_path=str(tmp_path / "transactions.db"),
+        csv_path=str(tmp_path / "rq1_data.csv"),
+        max_records=max_records,
+        flush_interval=0.01,
+    )
+
+
+def test_batches_are_capped_and_exported(tmp_path):
+    logger = _logger(tmp_path)
+
+    async def run():
+        await logger.start()
+        for i in range(25):
+            logger.log(f"doc_{i}.pdf", "B", 0.5, 0.005)
+        await logger.stop()
+        return await logger.read_records()
+
+    records = asyncio.run(run())
+    assert [r["document_id"] for r in records] == [f"doc_{i}.pdf" for i in range(15, 25)]
+    assert records[0]["group"] == "Hybrid"
+
+    with open(tmp_path / "rq1_data.csv", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 10
+    assert rows[-1]["document_id"] == "doc_24.pdf"
+
+
+def test_legacy_csv_is_imported(tmp_path):
+    with open(tmp_path / "rq1_data.csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["document_id", "group", "accuracy", "cost", "time"])
+        writer.writerow(["legacy.csv", "Baseline A (LLM)", 95, 0.25, 1.2])
+
+    logger = _logger(tmp_path)
+
+    async def run():
+        logger.log("new.pdf", "A", 0.1, 0.25)
+        await asyncio.sleep(0.05)
+        await logger.stop()
+        return await logger.read_records()
+
+    assert [r["document_id"] for r in asyncio.run(run())] == ["legacy.csv", "new.pdf"]
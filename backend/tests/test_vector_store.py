@@ -0,0 +1,76 @@
+import os
+import sys
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pytest
+from app.streams.bm25 import BM25Index
+from app.streams.retrievers import InMemoryRetriever
+from app.streams.vector_store import MemmapRetriever, quantize
+
+CHUNKS = [f"Clause {i}: the supplier shall deliver item {i} on time." for i in range(200)]
+
+
+def _embeddings(seed=5, n=200, dim=48):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(n, dim)).astype(np.float32), rng.normal(size=(6, dim)).astype(np.float32)
+
+
+def _add_in_batches(store, doc_id, chunks, embeddings, batch=64):
+    for offset in range(0, len(chunks), batch):
+        store.add_chunks(doc_id, "doc.pdf", offset, chunks[offset:offset + batch], embeddings[offset:offset + batch])
+    store.commit_document(doc_id, "doc.pdf", len(chunks), False, BM25Index.build(chunks))
+
+
+def test_quantization_round_trip():
+    vectors, _ = _embeddings()
+    codes, scales = quantize(vectors)
+    assert codes.dtype == np.int8 and scales.dtype == np.float32
+    assert np.abs(codes * scales[:, None] - vectors).max() <= scales.max() / 2 + 1e-6
+
+
+@pytest.mark.parametrize("precision", ["float32", "int8"])
+def test_memmap_rankings_match_exact_search(tmp_path, precision):
+    embeddings, queries = _embeddings()
+    memory = InMemoryRetriever()
+    memory.add("doc", "doc.pdf", CHUNKS, embeddings)
+    # Small blocks exercise the block-wise scan
+    store = MemmapRetriever(str(tmp_path), precision=precision, block_rows=50)
+    _add_in_batches(store, "doc", CHUNKS, embeddings)
+
+    expected = memory.vector_rankings("doc", ["q"] * 6, queries, k=5)
+    assert store.vector_rankings("doc", ["q"] * 6, queries, k=5) == expected
+    texts = ["item 7 delivery"] * 6
+    for mode in ("vector", "bm25", "hybrid"):
+        assert store.search("doc", texts, queries, 3, mode) == memory.search("doc", texts, queries, 3, mode)
+
+
+def test_memmap_persists_and_evicts(tmp_path):
+    embeddings, queries = _embeddings()
+    store = MemmapRetriever(str(tmp_path), max_documents=2)
+    _add_in_batches(store, "doc-1", CHUNKS, embeddings)
+    ranking = store.vector_rankings("doc-1", ["q"], queries[:1], k=3)
+
+    reopened = MemmapRetriever(str(tmp_path), max_documents=2)
+    assert reopened.has("doc-1")
+    assert reopened.vector_rankings("doc-1", ["q"], queries[:1], k=3) == ranking
+    assert reopened.stats()["int8_bytes"] == 200 * (48 + 4)
+
+    with reopened.lease("doc-1"):
+        for doc_id in ("doc-2", "doc-3"):
+            reopened.add(doc_id, "d.pdf", ["text"], np.ones((1, 48), dtype=np.float32))
+        # doc-1 is the least recently used but leased, so it survives the overflow
+        assert reopened.has("doc-1") and reopened.stats()["documents"] == 3
+    reopened.add("doc-4", "d.pdf", ["text"], np.ones((1, 48), dtype=np.float32))
+    assert reopened.stats()["documents"] == 2 and reopened.has("doc-4")
+    reopened.delete("doc-4")
+    assert not reopened.has("doc-4") and not os.path.exists(reopened._directory("doc-4"))
+
+
+def test_memmap_local_embeddings(tmp_path):
+    store = MemmapRetriever(str(tmp_path))
+    store.add("doc", "doc.pdf", CHUNKS[:20])
+    assert store.is_local("doc")
+    assert store.search("doc", ["item 7"], None, 1, "vector") == [[CHUNKS[7]]]